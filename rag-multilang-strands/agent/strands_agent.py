@@ -1,121 +1,569 @@
 
 # agent/strands_agent.py
 
-from config.settings import LLM_MODEL_ID
-from config.bedrock_client import bedrock_runtime, translate_client
-from rag.retriever import retrieve_context, format_context_snippets
+import asyncio
+import functools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from config.settings import CHAT_BATCH_CONCURRENCY, CHAT_EXECUTOR_WORKERS, CHAT_MAX_CONCURRENCY, LLM_MODEL_ID, PROMPT_CACHE
+from config.bedrock_client import bedrock_runtime
 from nlp.language import detect_lang
-from nlp.prompts import SYSTEM_PROMPT, build_rag_prompt
+from rag.retriever import (
+    analyze_queries,
+    analyze_query,
+    format_context_snippets_async,
+    keyword_fast_path,
+    retrieve_context,
+    retrieve_contexts,
+)
+from rag.translation import translate_many_async
+from rag.answer_cache import get_answer_cache
+from rag.index_manager import get_index_manager
+from nlp.prompts import RagPrompt, build_prompt
 import json
-from api.response_parser import parse_response_for_rendering
+from api.response_parser import ResponseParser, parse_response_for_rendering
 
 
 # Default handoff message (in English); will be translated per user language when returned early
 HANDOFF_MESSAGE = "We are connecting you to our human agent who can assist you further. Please stay tuned."
 
+# boto3 and FAISS calls block, so the async pipeline runs them on this pool rather
+# than Starlette's shared threadpool. At most CHAT_MAX_CONCURRENCY chats run at
+# once; the rest wait on the semaphore without holding a thread.
+_executor = ThreadPoolExecutor(max_workers=max(1, CHAT_EXECUTOR_WORKERS), thread_name_prefix="chat")
+_chat_slots = asyncio.Semaphore(max(1, CHAT_MAX_CONCURRENCY))
+_in_flight = 0
+# Recent per-chat latencies in seconds: time to first token (the headline
+# number for streamed chats; equal to the total for blocking ones) and total.
+_latencies = {"ttft": deque(maxlen=1000), "total": deque(maxlen=1000)}
+# Recent per-request prompt sizes: our estimate, the input tokens converse
+# reported (cached prefix included) and how many of those were cache reads.
+_prompt_tokens = {"estimated": deque(maxlen=1000), "input": deque(maxlen=1000), "cache_read": deque(maxlen=1000)}
+# Cleared when the model rejects the cachePoint (see _call_converse)
+_prompt_cache = PROMPT_CACHE
+# HANDOFF_MESSAGE per target language, kept once translated (failures are retried)
+_handoffs: Dict[Tuple[str, str], str] = {}
+# Event loop thread behind the blocking entry points (see _sync_loop)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
 
-def _translate_handoff(msg: str, target_lang: str) -> str:
-    """Translate the handoff message to the user's language via AWS Translate; fallback to original on error."""
-    try:
-        client = translate_client()
-        resp = client.translate_text(Text=msg, SourceLanguageCode="en", TargetLanguageCode=target_lang)
-        return resp.get("TranslatedText", msg)
-    except Exception:
+
+async def _blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+async def _translate_handoff(msg: str, target_lang: str) -> str:
+    """Translate the handoff message to the user's language via AWS Translate (once per language); fallback to original on error."""
+    if target_lang == "en":
         return msg
+    cached = _handoffs.get((msg, target_lang))
+    if cached is not None:
+        return cached
+    translated = (await translate_many_async([("handoff", msg, "en")], target_lang,
+                                             fallback_to_source=False, executor=_executor))[0]
+    if translated is None:
+        return msg
+    _handoffs[(msg, target_lang)] = translated
+    return translated
 
 
-def answer(user_message: str) -> str:
-    """
-    Main entry: retrieve context, apply confidence gate, build strict RAG prompt, and call Bedrock.
+def _converse_request(prompt: RagPrompt, cache: bool) -> dict:
+    # Strict temperature=0. The system block is identical for every request; the
+    # cache point after it lets Bedrock reuse the processed prefix.
+    system = [{"text": prompt.system}]
+    if cache:
+        system.append({"cachePoint": {"type": "default"}})
+    user_content = [{"text": prompt.user}]
+    messages = [{"role": "user", "content": user_content}]
+    return {"modelId": LLM_MODEL_ID, "system": system, "messages": messages, "inferenceConfig": {"temperature": 0}}
 
-    MULTILINGUAL SUPPORT:
-    - Detects user's language
-    - Retrieves context (queries are auto-translated to English for consistent embedding space)
-    - Returns answer in user's language
-    - Falls back to human handoff if confidence is low
 
-    Returns either the model answer (string) or a translated HANDOFF_MESSAGE when retrieval confidence is low.
+def _call_converse(operation: str, prompt: RagPrompt) -> dict:
+    global _prompt_cache
+    call = getattr(bedrock_runtime(), operation)
+    cache = _prompt_cache
+    try:
+        return call(**_converse_request(prompt, cache))
+    except ClientError as e:
+        error = e.response.get("Error", {})
+        if not cache or error.get("Code") != "ValidationException":
+            raise
+        # The wording varies by model; any validation error with a cache point is retried once without it
+        print(f"[WARNING] {LLM_MODEL_ID} rejected a prompt with a cache point ({error.get('Message')}); sending prompts without it")
+        _prompt_cache = False
+        return call(**_converse_request(prompt, False))
+
+
+def _record_prompt_usage(prompt: RagPrompt, usage: Optional[dict]):
+    usage = usage or {}
+    _prompt_tokens["estimated"].append(prompt.tokens)
+    reported = ""
+    if "inputTokens" in usage:
+        # inputTokens leaves out the tokens read from or written to the prompt cache
+        cache_read = usage.get("cacheReadInputTokens", 0)
+        cache_write = usage.get("cacheWriteInputTokens", 0)
+        total = usage["inputTokens"] + cache_read + cache_write
+        _prompt_tokens["input"].append(total)
+        _prompt_tokens["cache_read"].append(cache_read)
+        reported = f", converse input {total} (cache read {cache_read}, cache write {cache_write})"
+    print(f"[DEBUG] Prompt tokens: ~{prompt.tokens} estimated, {prompt.items} context items "
+          f"({prompt.dropped} dropped for the budget){reported}")
+
+
+def _converse(prompt: RagPrompt) -> dict:
+    # Call Bedrock converse
+    resp = _call_converse("converse", prompt)
+    _record_prompt_usage(prompt, resp.get("usage"))
+    return resp
+
+
+def _converse_stream(prompt: RagPrompt, on_text: Callable[[str], None], stop: threading.Event) -> str:
+    # Call Bedrock converse_stream, passing each text delta to `on_text`; returns the full text.
+    resp = _call_converse("converse_stream", prompt)
+    stream = resp["stream"]
+    parts = []
+    usage = None
+    try:
+        for event in stream:
+            if stop.is_set():
+                break
+            text = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+            if text:
+                parts.append(text)
+                on_text(text)
+            elif "metadata" in event:
+                usage = event["metadata"].get("usage")
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    _record_prompt_usage(prompt, usage)
+    return "".join(parts)
+
+
+class _HandoffGate:
+    """
+    Forwards streamed text, except that output which could still turn out to be
+    exactly HANDOFF_MESSAGE is held back: that case is answered with the
+    translated handoff instead of the English original.
     """
-    user_lang = detect_lang(user_message)
-    print(f"[DEBUG] User query language: {user_lang}")
+
+    def __init__(self, on_delta: Callable[[str], None]):
+        self.on_delta = on_delta
+        self.held = ""
+        self.open = False
+
+    def feed(self, text: str):
+        if self.open:
+            self.on_delta(text)
+            return
+        self.held += text
+        if not HANDOFF_MESSAGE.startswith(self.held.lstrip()):
+            self.flush()
+
+    def flush(self):
+        self.open = True
+        if self.held:
+            self.on_delta(self.held)
+            self.held = ""
+
+
+async def _generate_stream(prompt: RagPrompt, on_delta: Callable[[str], None]) -> str:
+    loop = asyncio.get_running_loop()
+    gate = _HandoffGate(on_delta)
+    stop = threading.Event()
+
+    def _on_text(text: str):
+        loop.call_soon_threadsafe(gate.feed, text)
+
+    try:
+        txt = await loop.run_in_executor(_executor, _converse_stream, prompt, _on_text, stop)
+    except asyncio.CancelledError:
+        # Client went away: stop reading the Bedrock stream
+        stop.set()
+        raise
+    if txt.strip() != HANDOFF_MESSAGE:
+        gate.flush()
+    return txt
+
+
+async def _answer(user_message: str, on_delta: Optional[Callable[[str], None]] = None,
+                  lang: Optional[str] = None) -> str:
+    # Language, English translation and query vector come from the query cache
+    # when this question was seen recently; otherwise they are computed once here.
+    # `lang` (the caller's userLang) is the language to answer and hand off in;
+    # the query's own language is always detected, since it is the Translate
+    # source for the English text that is embedded. Short keyword / model-number
+    # queries are served from the BM25 index without translation or embedding
+    # (rag.retriever.keyword_fast_path).
+    keyword_results = await _blocking(keyword_fast_path, user_message)
+    if keyword_results is not None:
+        analysis = None
+        user_lang = lang or detect_lang(user_message)
+        print(f"[DEBUG] Keyword fast path: {len(keyword_results)} BM25 results")
+    else:
+        analysis = await _blocking(analyze_query, user_message)
+        user_lang = lang or analysis.lang
+        print(f"[DEBUG] Query language: {analysis.lang}")
+    print(f"[DEBUG] Reply language: {user_lang}")
     print(f"[DEBUG] User message: {user_message}")
 
+    # A paraphrase of a question answered recently, in this language and against
+    # this index generation, gets the stored answer without retrieval or converse.
+    generation = get_index_manager().generation
+    cached = _cached_answer(analysis, user_lang, generation)
+    if cached is not None:
+        if on_delta is not None:
+            on_delta(cached)
+        return cached
+    return await _generate(user_message, user_lang, analysis, generation, keyword_results, on_delta, answer_lang=lang)
+
+
+def _cached_answer(analysis, user_lang: str, generation: int) -> Optional[str]:
+    if analysis is None:
+        return None
+    cached = get_answer_cache().lookup(analysis.vector, user_lang, generation)
+    if cached is not None:
+        print(f"[DEBUG] Answer cache hit (generation {generation}, {user_lang})")
+    return cached
+
+
+async def _generate(user_message: str, user_lang: str, analysis, generation: int,
+                    results: Optional[list] = None, on_delta: Optional[Callable[[str], None]] = None,
+                    answer_lang: Optional[str] = None) -> str:
+    # Retrieval (unless the caller passes `results`), confidence gate, prompt and converse.
+    # `answer_lang` is set when the caller chose the reply language (userLang).
+    # Early exits return the handoff message in the user's language, translated
+    # when one is taken (and then cached per language), not up front.
+    handoff = functools.partial(_translate_handoff, HANDOFF_MESSAGE, user_lang)
     # 1) Retrieve raw results (text, metadata, score)
-    # NOTE: retriever.py will auto-translate non-English queries to English before embedding
-    results = retrieve_context(user_message)
-    
+    # NOTE: the analysis carries the query translated to English and embedded
+    if results is None:
+        results = await _blocking(retrieve_context, user_message, analysis)
+
     if not results:
         print(f"[DEBUG] No results retrieved, returning handoff message in {user_lang}")
-        return _translate_handoff(HANDOFF_MESSAGE, user_lang)
+        return await handoff()
 
-    # 2) Compute simple confidence metric (max score of returned results)
+    # 2) Compute simple confidence metric (max score of returned results): the
+    # dense similarity (rag.lexical.fuse_rrf gives rows only BM25 found 0.0).
+    # Keyword fast-path rows (no analysis) carry BM25 term coverage instead and
+    # already passed KEYWORD_MIN_COVERAGE in keyword_fast_path; they are not
+    # held to the similarity threshold.
     try:
         max_score = max([s for (_, _, s) in results if isinstance(s, (int, float))])
     except Exception:
         max_score = 0.0
-    
-    print(f"[DEBUG] Retrieval confidence score: {max_score:.4f} (threshold: 0.5)")
+    keyword = analysis is None
+
+    print(f"[DEBUG] Retrieval confidence score: {max_score:.4f} "
+          f"({'BM25 coverage, keyword fast path' if keyword else 'threshold: 0.5'})")
 
     # 3) Confidence gate: if too low, escalate to human (prevent hallucination)
-    if max_score < 0.5:
+    if not keyword and max_score < 0.5:
         print(f"[DEBUG] Confidence too low ({max_score:.4f} < 0.5), returning handoff in {user_lang}")
-        return _translate_handoff(HANDOFF_MESSAGE, user_lang)
+        return await handoff()
 
     print(f"[DEBUG] Confidence sufficient, generating response in {user_lang}")
 
-    # 4) Format context for prompt builder (this will translate snippets to user_lang as needed)
-    context = format_context_snippets(results, user_lang)
+    # 4) Format context for prompt builder (snippets are translated to user_lang concurrently)
+    context = await format_context_snippets_async(results, user_lang, executor=_executor)
     context["confidence_score"] = max_score
 
-    # 5) Build strict RAG prompt
-    prompt = build_rag_prompt(user_query=user_message, context=context, handoff_message=HANDOFF_MESSAGE)
-
-    # 6) Call Bedrock converse with a strict temperature=0
-    client = bedrock_runtime()
-    system = [{"text": SYSTEM_PROMPT}]
-    user_content = [{"text": prompt}]
-    messages = [{"role": "user", "content": user_content}]
+    # 5) Build strict RAG prompt (static system prefix, budgeted context)
+    prompt = build_prompt(user_query=user_message, context=context, handoff_message=HANDOFF_MESSAGE,
+                          answer_lang=answer_lang)
 
-    resp = client.converse(
-        modelId=LLM_MODEL_ID,
-        system=system,
-        messages=messages,
-        inferenceConfig={"temperature": 0}
-    )
+    # 6) Call Bedrock converse (converse_stream when the caller takes deltas)
+    if on_delta is not None:
+        txt = await _generate_stream(prompt, on_delta)
+        if not txt:
+            print("[DEBUG] Empty response stream from Bedrock")
+            return await handoff()
+    else:
+        resp = await _blocking(_converse, prompt)
 
-    try:
-        txt = resp["output"]["message"]["content"][0]["text"]
-    except Exception as e:
-        print(f"[DEBUG] Error getting response from Bedrock: {e}")
-        return _translate_handoff(HANDOFF_MESSAGE, user_lang)
+        try:
+            txt = resp["output"]["message"]["content"][0]["text"]
+        except Exception as e:
+            print(f"[DEBUG] Error getting response from Bedrock: {e}")
+            return await handoff()
 
     # If the model returns the HANDOFF_MESSAGE exactly, translate it and return
     if txt.strip() == HANDOFF_MESSAGE:
         print(f"[DEBUG] Model returned handoff message, translating to {user_lang}")
-        return _translate_handoff(HANDOFF_MESSAGE, user_lang)
+        return await handoff()
 
     # Otherwise return the raw text
     print(f"[DEBUG] Successfully generated response in {user_lang}")
+    if analysis is not None:
+        get_answer_cache().store(analysis.vector, user_lang, generation, txt)
     return txt
 
 
-def answer_with_converse(user_query: str, user_lang: str = "en") -> dict:
+async def answer_async(user_message: str, user_lang: Optional[str] = None) -> str:
+    """
+    Main entry: retrieve context, apply confidence gate, build strict RAG prompt, and call Bedrock.
+
+    MULTILINGUAL SUPPORT:
+    - Detects the query language (the Translate source); answers in `user_lang`
+      if the caller passes one, else in the query language
+    - Retrieves context (queries are auto-translated to English for consistent embedding space)
+    - Returns answer in user's language
+    - Falls back to human handoff if confidence is low
+
+    Blocking AWS / FAISS calls run on the chat executor; snippet translations
+    run concurrently. At most CHAT_MAX_CONCURRENCY
+    calls are in the pipeline at once, the rest wait their turn.
+
+    Returns either the model answer (string) or a translated HANDOFF_MESSAGE when retrieval confidence is low.
+    """
+    global _in_flight
+    async with _chat_slots:
+        _in_flight += 1
+        started = time.perf_counter()
+        try:
+            txt = await _answer(user_message, lang=user_lang)
+            elapsed = time.perf_counter() - started
+            _latencies["ttft"].append(elapsed)
+            _latencies["total"].append(elapsed)
+            return txt
+        finally:
+            _in_flight -= 1
+
+
+async def answer_stream(user_message: str, user_lang: Optional[str] = None) -> AsyncIterator[dict]:
+    """
+    Streaming `answer_with_converse_async`: yields `{"event": "delta", "text": ...}`
+    as the model generates (via converse_stream), then one
+    `{"event": "done", "response": {...}}` with the parsed text and tables.
+    Handoff answers, early or from the model, arrive only in the final event.
+    """
+    global _in_flight
+    async with _chat_slots:
+        _in_flight += 1
+        started = time.perf_counter()
+        first_token = None
+        # Deltas are parsed as they arrive; the final response reuses the result
+        parser = ResponseParser()
+        streamed = []
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        task = asyncio.ensure_future(_answer(user_message, on_delta=queue.put_nowait, lang=user_lang))
+        # Deltas are queued before the task finishes, so `done` always comes last
+        task.add_done_callback(lambda _: queue.put_nowait(done))
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if first_token is None:
+                    first_token = time.perf_counter() - started
+                    print(f"[DEBUG] Time to first token: {first_token * 1000:.0f} ms")
+                parser.feed(item)
+                streamed.append(item)
+                yield {"event": "delta", "text": item}
+            raw = task.result()
+            total = time.perf_counter() - started
+            _latencies["ttft"].append(first_token if first_token is not None else total)
+            _latencies["total"].append(total)
+            if raw and raw == "".join(streamed):
+                parser.close()
+                response = _structure_blocks(parser.blocks)
+            else:
+                # Handoff text replaced (or never streamed) the model output
+                response = _structure(raw)
+            yield {"event": "done", "response": response}
+        finally:
+            if not task.done():
+                task.cancel()
+            _in_flight -= 1
+
+
+def _sync_loop() -> asyncio.AbstractEventLoop:
+    # One event loop thread runs the coroutines of every blocking entry point, so
+    # their chats share _chat_slots (an asyncio primitive bound to one loop) and
+    # the latency stats with each other, whichever thread calls them.
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="chat-loop", daemon=True).start()
+        return _loop
+
+
+def answer(user_message: str, lang: Optional[str] = None) -> str:
+    """
+    Blocking `answer_async` for callers without an event loop (the Streamlit app):
+    the chat holds a CHAT_MAX_CONCURRENCY slot and counts in `get_chat_stats`.
+    """
+    return asyncio.run_coroutine_threadsafe(answer_async(user_message, lang), _sync_loop()).result()
+
+
+def _prepare_batch(queries: List[str], generation: int, lang: Optional[str] = None):
+    # Blocking half of a batch, run on one executor thread: keyword fast path per
+    # query, then one analysis pass (language detection, concurrent translation,
+    # one embedding call) and one FAISS search over the (n, dim) matrix of query
+    # vectors for the rest, minus answer-cache hits. `lang`, if given, is the
+    # language every answer is given in; each query's own language is detected.
+    keyword = [keyword_fast_path(q) for q in queries]
+    dense = [i for i, hits in enumerate(keyword) if hits is None]
+    keyword_rows = [i for i, hits in enumerate(keyword) if hits is not None]
+    keyword_langs = dict(zip(keyword_rows, [lang] * len(keyword_rows) if lang else [detect_lang(queries[i]) for i in keyword_rows]))
+    analyses = dict(zip(dense, analyze_queries([queries[i] for i in dense])))
+    plans = []
+    for i, query in enumerate(queries):
+        analysis = analyses.get(i)
+        user_lang = lang or (analysis.lang if analysis is not None else keyword_langs[i])
+        plans.append({"lang": user_lang, "analysis": analysis, "results": keyword[i],
+                      "cached": _cached_answer(analysis, user_lang, generation)})
+    todo = [i for i in dense if plans[i]["cached"] is None]
+    for i, results in zip(todo, retrieve_contexts([queries[i] for i in todo], [analyses[i] for i in todo])):
+        plans[i]["results"] = results
+    print(f"[DEBUG] Batch of {len(queries)}: {len(queries) - len(dense)} keyword fast path, "
+          f"{len(dense) - len(todo)} answer cache hits, {len(todo)} retrieved")
+    return plans
+
+
+async def answer_batch(queries: List[str], concurrency: int = CHAT_BATCH_CONCURRENCY,
+                       user_lang: Optional[str] = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Answer many queries at once, yielding `(index, raw answer)` in input order.
+    Each query's language is detected; answers are in `user_lang` if given.
+
+    Retrieval is batched (see `_prepare_batch`); generation fans out with at
+    most `concurrency` converse calls of this batch in flight, each also holding
+    a CHAT_MAX_CONCURRENCY slot like a single chat. Answers are yielded as soon
+    as they and all earlier ones are done. A query whose generation fails gets
+    the handoff message instead of failing the batch.
     """
-    Compatibility wrapper used by the FastAPI route. Calls `answer()` to get the
-    raw model response and parses it into structured components:
+    if not queries:
+        return
+    generation = get_index_manager().generation
+    plans = await _blocking(_prepare_batch, queries, generation, user_lang)
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(query: str, plan: dict) -> str:
+        if plan["cached"] is not None:
+            return plan["cached"]
+        global _in_flight
+        async with limit, _chat_slots:
+            # An earlier answer of this batch may have been a paraphrase
+            cached = _cached_answer(plan["analysis"], plan["lang"], generation)
+            if cached is not None:
+                return cached
+            _in_flight += 1
+            started = time.perf_counter()
+            try:
+                txt = await _generate(query, plan["lang"], plan["analysis"], generation, plan["results"],
+                                      answer_lang=user_lang)
+            except Exception as e:
+                print(f"[WARNING] Batch answer failed for {query!r}: {e}")
+                return await _translate_handoff(HANDOFF_MESSAGE, plan["lang"])
+            finally:
+                _in_flight -= 1
+            elapsed = time.perf_counter() - started
+            _latencies["ttft"].append(elapsed)
+            _latencies["total"].append(elapsed)
+            return txt
+
+    # Tasks queue on the semaphore in creation order, so answers tend to finish in input order
+    tasks = [asyncio.ensure_future(_one(q, plan)) for q, plan in zip(queries, plans)]
+    try:
+        for i, task in enumerate(tasks):
+            yield i, await task
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def answer_batch_with_converse(queries: List[str], user_lang: Optional[str] = None) -> AsyncIterator[Tuple[int, dict]]:
+    """Used by the FastAPI batch route: `answer_batch()` with each answer parsed like `answer_with_converse`."""
+    async for i, raw in answer_batch(queries, user_lang=user_lang):
+        yield i, _structure(raw)
+
+
+def answer_many(queries: List[str], concurrency: int = CHAT_BATCH_CONCURRENCY) -> List[str]:
+    """Blocking `answer_batch` for callers without an event loop; answers in input order."""
+    async def _collect():
+        return [txt async for _, txt in answer_batch(queries, concurrency)]
+
+    return asyncio.run_coroutine_threadsafe(_collect(), _sync_loop()).result()
+
+
+def _percentiles(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0, "p50_ms": None, "p95_ms": None}
+
+    def _at(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"count": len(ordered), "p50_ms": _at(0.5), "p95_ms": _at(0.95)}
+
+
+def _token_percentiles(values) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0, "p50": None, "p95": None}
+    return {
+        "count": len(ordered),
+        "p50": ordered[min(len(ordered) - 1, int(0.5 * len(ordered)))],
+        "p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+    }
+
+
+def get_chat_stats() -> dict:
+    return {
+        "in_flight": _in_flight,
+        "max_concurrency": CHAT_MAX_CONCURRENCY,
+        "executor_workers": CHAT_EXECUTOR_WORKERS,
+        "time_to_first_token": _percentiles(_latencies["ttft"]),
+        "total": _percentiles(_latencies["total"]),
+        "prompt_tokens": {
+            "estimated": _token_percentiles(_prompt_tokens["estimated"]),
+            "converse_input": _token_percentiles(_prompt_tokens["input"]),
+            "cache_read": _token_percentiles(_prompt_tokens["cache_read"]),
+            "prompt_cache": _prompt_cache,
+        },
+    }
+
+
+async def answer_with_converse_async(user_query: str, user_lang: Optional[str] = None) -> dict:
+    """Used by the FastAPI route: `answer_async()` parsed like `answer_with_converse`."""
+    return _structure(await answer_async(user_query, user_lang))
+
+
+def answer_with_converse(user_query: str, user_lang: Optional[str] = None) -> dict:
+    """
+    Compatibility wrapper. Calls `answer()` to get the raw model response and
+    parses it into structured components:
       - `text`: combined text blocks
       - `tables`: list of sanitized HTML tables
       - `images`: list of image paths (not implemented here)
 
-    This keeps the API route working while preserving the improved parsing logic.
+    This keeps existing callers working while preserving the improved parsing logic.
     """
-    raw = answer(user_query)
+    return _structure(answer(user_query, lang=user_lang))
 
+
+def _structure(raw: str) -> dict:
     # If answer returned a handoff message (string), keep as text
     if not raw:
         return {"text": "", "tables": [], "images": []}
 
-    blocks = parse_response_for_rendering(raw)
+    return _structure_blocks(parse_response_for_rendering(raw))
+
+
+def _structure_blocks(blocks) -> dict:
     aggregated_text_parts = []
     tables = []
     images = []
@@ -3,8 +3,11 @@
 from fastapi import FastAPI
 from api.routes.chat import router as chat_router
 from api.routes.upload import router as upload_router
+from api.routes.metrics import router as metrics_router
+from api.routes.documents import router as documents_router
 
 app = FastAPI(title="RAG Multilang Chatbot API")
 app.include_router(upload_router, prefix="/api")
 app.include_router(chat_router,  prefix="/api")
-
+app.include_router(metrics_router, prefix="/api")
+app.include_router(documents_router, prefix="/api")
@@ -5,7 +5,11 @@ from typing import List, Optional
 
 class ChatRequest(BaseModel):
     query: str
-    userLang: Optional[str] = "en"
+    userLang: Optional[str] = None  # detected from the query when omitted
+
+class ChatBatchRequest(BaseModel):
+    queries: List[str]
+    userLang: Optional[str] = None  # detected from the query when omitted
 
 class TableBlock(BaseModel):
     html: str
@@ -0,0 +1,122 @@
+
+# api/multipart_stream.py
+"""
+Streaming multipart/form-data receiver for uploads.
+
+Starlette's form parsing spools every file to a temporary file (or memory)
+before the handler runs, and the handler would then copy it again. Here the
+request body is fed chunk by chunk to python-multipart's push parser, and the
+data of each `files` part goes straight into an `UploadWriter`, so every
+upload is written to its final place exactly once, with bounded memory.
+
+Body chunks are collected into pieces of UPLOAD_CHUNK_SIZE bytes; parsing,
+hashing and the file writes of each piece run on the threadpool, so a large
+upload does not block the event loop.
+"""
+
+import os
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from config.settings import UPLOAD_CHUNK_SIZE
+from rag.ingest import UploadWriter
+
+
+class _UploadReceiver:
+    def __init__(self, field: str):
+        self.field = field.encode("latin-1")
+        self.saved: List[Tuple[str, str]] = []
+        self.writer: Optional[UploadWriter] = None
+        self._headers = {}
+        self._name = b""
+        self._value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._name.lower()] = self._value
+        self._name, self._value = b"", b""
+
+    def on_headers_finished(self):
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = params.get(b"filename")
+        if params.get(b"name") == self.field and filename:
+            # Other form fields are ignored
+            self.writer = UploadWriter(os.path.basename(filename.decode("utf-8", "replace")))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.writer is not None:
+            self.writer.write(data[start:end])
+
+    def on_part_end(self):
+        if self.writer is not None:
+            self.saved.append(self.writer.finish())
+            self.writer = None
+
+    def abort(self):
+        # The whole request failed: drop the part being written and the staged files of finished ones
+        if self.writer is not None:
+            self.writer.abort()
+            self.writer = None
+        for path, _ in self.saved:
+            if os.path.exists(path):
+                os.remove(path)
+        self.saved = []
+
+
+async def receive_uploads(request: Request, field: str = "files") -> List[Tuple[str, str]]:
+    """Stream the `field` files of a multipart request to the uploads dir; returns [(path, doc_id)]."""
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload")
+    receiver = _UploadReceiver(field)
+    parser = MultipartParser(boundary, receiver.callbacks())
+
+    def _feed(data: bytes, final: bool = False):
+        parser.write(data)
+        if final:
+            parser.finalize()
+
+    buf = bytearray()
+    try:
+        async for chunk in request.stream():
+            buf += chunk
+            if len(buf) >= UPLOAD_CHUNK_SIZE:
+                await run_in_threadpool(_feed, bytes(buf))
+                buf.clear()
+        await run_in_threadpool(_feed, bytes(buf), True)
+    except BaseException:
+        # A cancelled run_in_threadpool call still waits for its thread, so no write is in flight here
+        receiver.abort()
+        raise
+    if receiver.writer is not None:
+        # Body ended inside a file part
+        receiver.abort()
+        raise HTTPException(status_code=400, detail="Truncated multipart upload")
+    return receiver.saved
@@ -2,189 +2,431 @@
 Response parser: Handles extraction and sanitization of structured content (tables, text) from RAG responses.
 Ensures tables are rendered correctly in Streamlit while preserving text formatting.
 Removes source citations and metadata before rendering.
+
+`ResponseParser` does this incrementally: text is fed chunk by chunk (e.g. the
+deltas of a streamed answer) and each chunk is scanned once, in linear time.
+Citations are dropped as they pass; a text block is complete, and returned,
+as soon as the table after it closes. Content that might still turn into a
+citation or table marker is held back until the next chunk decides it, so
+the blocks and sources are the same however the text is split.
+Tables are sanitized by removing scripts and event handlers, then one
+tokenizer pass over tags and whitespace.
+
+The functions below keep the signatures and output of the original
+multi-pass implementation (api.response_parser_regex).
 """
 
 import re
 from typing import List, Tuple, Dict, Optional
 
 
+# [source: ...] citations. Removal is case-insensitive, but only the
+# lower-case form is reported as a source (as before).
+_CITATION_OPEN = re.compile(r'\[source:', re.IGNORECASE)
+_CITATION = re.compile(r'\[source:\s*([^\]]+)\]')
+_CITATION_OPEN_LEN = len('[source:')
+
+# Table openers and their closing markers
+_TABLE_OPEN = re.compile(r'--TABLE-START--|<table[^>]*>', re.IGNORECASE)
+_TABLE_CLOSE = {
+    '-': re.compile(r'--TABLE-END--', re.IGNORECASE),
+    '<': re.compile(r'</table>', re.IGNORECASE),
+}
+_TABLE_TAG_START = re.compile(r'<table', re.IGNORECASE)
+# Longest proper prefix of an opener that can sit at the end of a chunk
+_MAX_OPEN_PREFIX = len('--TABLE-START--') - 1
+
+# Scripts and quoted event handlers are removed first (a stray '<' in the text
+# must not swallow a script into a "tag"); then one token per match: allowed
+# table tags (with or without attributes), any other tag, whitespace runs.
+_SCRIPT = re.compile(r'<script[^>]*>.*?</script>', re.DOTALL | re.IGNORECASE)
+_SANITIZE_TOKENS = re.compile(
+    r'(?P<keep></?(?:table|tr|th|td|tbody|thead|tfoot|colgroup|col|caption)(?:>|(?P<attrs>\s[^>]*)>))'
+    r'|(?P<tag><[^>]+>)'
+    r'|(?P<space>\s+)',
+    re.IGNORECASE,
+)
+_HANDLER = re.compile(r'on\w+\s*=\s*["\'][^"\']*["\']', re.IGNORECASE)
+_HANDLER_START = re.compile(r'on\w+\s*=', re.IGNORECASE)
+_TAG_NAME = re.compile(r'</?\w+')
+_SPACES = re.compile(r'\s+')
+_BLANK_LINES = re.compile(r'\n\s*\n')
+
+
+class _CitationFilter:
+    """Streams text through with [source: ...] citations removed, collecting sources."""
+
+    def __init__(self):
+        self.sources: List[str] = []
+        self._seen = set()
+        self._buf = ""
+        # Where to resume looking for the ']' of a citation held at the start of _buf
+        self._close_from = 0
+
+    def _record(self, source: str):
+        if source not in self._seen:
+            self._seen.add(source)
+            self.sources.append(source)
+
+    def feed(self, chunk: str, final: bool = False) -> str:
+        buf = self._buf + chunk if self._buf else chunk
+        out = []
+        pos = 0
+        while True:
+            i = buf.find('[', pos)
+            if i < 0:
+                out.append(buf[pos:])
+                pos = len(buf)
+                break
+            out.append(buf[pos:i])
+            if len(buf) - i < _CITATION_OPEN_LEN:
+                # Too short to tell; nothing after this can be a citation either
+                if final:
+                    out.append(buf[i:])
+                    pos = len(buf)
+                else:
+                    pos = i
+                break
+            if not _CITATION_OPEN.match(buf, i):
+                out.append('[')
+                pos = i + 1
+                continue
+            start = i + _CITATION_OPEN_LEN
+            j = buf.find(']', max(start, self._close_from) if i == 0 else start)
+            if j < 0:
+                if final:
+                    # No ']' anywhere after this point: the rest is plain text
+                    out.append(buf[i:])
+                    pos = len(buf)
+                else:
+                    pos = i
+                    self._close_from = len(buf) - i
+                break
+            self._close_from = 0
+            if j == start:
+                # "[source:]" is not a citation
+                out.append('[')
+                pos = i + 1
+                continue
+            if buf.startswith('[source:', i):
+                self._record(buf[start:j].strip())
+            else:
+                # "[Source: ...]" is removed but not reported, unless it hides a
+                # lower-case citation ending at the same ']'
+                m = _CITATION.search(buf, i + 1, j + 1)
+                if m:
+                    self._record(m.group(1).strip())
+            pos = j + 1
+        self._buf = buf[pos:]
+        return "".join(out)
+
+    def close(self) -> str:
+        return self.feed("", final=True)
+
+
+class _BlockSplitter:
+    """
+    Splits citation-free text into ('text', ...) and ('table', ...) blocks:
+    --TABLE-START--...--TABLE-END-- or <table ...>...</table>, leftmost first.
+    """
+
+    def __init__(self):
+        self._text: List[str] = []  # decided text of the current block
+        self._buf = ""              # undecided input (from the hold point or a pending opener)
+        self._scan = 0              # next position in _buf to look for an opener
+        self._pending = None        # (open_end, kind): opener at _buf[0] waiting for its close marker
+        self._content: List[str] = []  # that table's content already searched for the close marker
+        self._no_close = {}         # kind -> no close marker starts at or after this position (final only)
+
+    def _hold(self, pos: int):
+        # Everything before `pos` is plain text of the current block
+        if pos > 0:
+            self._text.append(self._buf[:pos])
+            self._buf = self._buf[pos:]
+        self._scan = 0
+
+    def _spill(self):
+        # Keep only the opener and the tail that could start a close marker
+        open_end, kind = self._pending
+        cut = len(self._buf) - (len(_TABLE_CLOSE[kind].pattern) - 1)
+        if cut > open_end:
+            self._content.append(self._buf[open_end:cut])
+            self._buf = self._buf[:open_end] + self._buf[cut:]
+
+    def _emit(self, blocks, start: int, table_html: str, cut: int):
+        text_before = ("".join(self._text) + self._buf[:start]).strip()
+        self._text = []
+        if text_before:
+            blocks.append(('text', text_before))
+        table_html = table_html.strip()
+        if table_html:
+            # Wrap tag-based tables in proper format
+            if not table_html.startswith('<table'):
+                table_html = f"<table>{table_html}</table>"
+            blocks.append(('table', table_html))
+        self._buf = self._buf[cut:]
+        self._scan = 0
+        self._no_close = {k: v - cut for k, v in self._no_close.items() if v >= cut}
+
+    def _resolve_pending(self, blocks, final: bool) -> bool:
+        """False while the pending table still waits for its close marker."""
+        open_end, kind = self._pending
+        close = _TABLE_CLOSE[kind].search(self._buf, open_end)
+        if close is not None:
+            content = "".join(self._content) + self._buf[open_end:close.start()]
+            self._pending, self._content = None, []
+            self._emit(blocks, 0, content, close.end())
+            return True
+        if final:
+            # Not a table after all; rescan from the character after the opener's start
+            self._buf = self._buf[:open_end] + "".join(self._content) + self._buf[open_end:]
+            self._pending, self._content = None, []
+            self._no_close[kind] = open_end
+            self._scan = 1
+            return True
+        self._spill()
+        return False
+
+    def feed(self, text: str, final: bool = False) -> List[Tuple[str, str]]:
+        self._buf += text
+        blocks: List[Tuple[str, str]] = []
+        if self._pending is not None and not self._resolve_pending(blocks, final):
+            return blocks
+        while True:
+            buf = self._buf
+            m = _TABLE_OPEN.search(buf, self._scan)
+            if not final:
+                # An unfinished "<table ..." (no '>' yet) before the opener found,
+                # or a marker cut off at the end of the chunk, may still match first.
+                limit = m.start() if m else len(buf)
+                last_gt = buf.rfind('>', self._scan, limit)
+                unfinished = _TABLE_TAG_START.search(buf, max(self._scan, last_gt + 1), limit)
+                if unfinished is not None and buf.find('>', unfinished.end()) < 0:
+                    self._hold(unfinished.start())
+                    return blocks
+                if m is None:
+                    self._hold(max(self._scan, len(buf) - _MAX_OPEN_PREFIX))
+                    return blocks
+            if m is None:
+                return blocks
+            kind = m.group(0)[0]
+            if kind in self._no_close and m.end() >= self._no_close[kind]:
+                close = None
+            else:
+                close = _TABLE_CLOSE[kind].search(buf, m.end())
+            if close is not None:
+                self._emit(blocks, m.start(), buf[m.end():close.start()], close.end())
+            elif final:
+                self._no_close[kind] = m.end()
+                self._scan = m.start() + 1
+            else:
+                # Wait for the close marker, with the opener at the start of the buffer
+                self._hold(m.start())
+                self._pending = (m.end() - m.start(), kind)
+                self._spill()
+                return blocks
+
+    def close(self) -> List[Tuple[str, str]]:
+        blocks = self.feed("", final=True)
+        text_after = ("".join(self._text) + self._buf).strip()
+        if text_after:
+            blocks.append(('text', text_after))
+        self._text, self._buf = [], ""
+        return blocks
+
+
+def _sanitize(html: str) -> str:
+    html = _HANDLER.sub('', _SCRIPT.sub('', html))
+    out = []
+    last = ""          # last character written
+    space = False      # whitespace seen since then
+    pos = 0
+
+    def _write(s: str):
+        nonlocal last, space
+        if space and last and not (last == '>' and s[0] == '<'):
+            out.append(' ')
+        space = False
+        out.append(s)
+        last = s[-1]
+
+    for m in _SANITIZE_TOKENS.finditer(html):
+        if m.start() > pos:
+            _write(html[pos:m.start()])
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == 'space':
+            space = True
+        elif kind == 'keep':
+            tag = m.group(0)
+            if m.group('attrs') is not None:
+                tag = _SPACES.sub(' ', tag)
+                if _HANDLER_START.search(tag):
+                    # An unquoted (or unterminated) event handler: keep only the bare tag
+                    tag = _TAG_NAME.match(tag).group(0) + '>'
+            _write(tag)
+        # other tags are dropped
+    if pos < len(html):
+        _write(html[pos:])
+    return "".join(out)
+
+
+def _render(block: Tuple[str, str]) -> Optional[Tuple[str, str]]:
+    if block[0] == 'table':
+        # Sanitize the HTML table
+        safe_html = sanitize_html_table(block[1])
+        return ('table', safe_html) if safe_html else None
+    # Clean up text: remove extra whitespace, preserve structure
+    text = block[1].strip()
+    # Replace multiple newlines with single newline for cleaner rendering
+    text = _BLANK_LINES.sub('\n\n', text)
+    return ('text', text) if text else None
+
+
+class ResponseParser:
+    """
+    Incremental `parse_response_for_rendering`: call `feed(chunk)` as text
+    arrives and `close()` at the end. Each call returns the rendering blocks
+    completed by it; `blocks` and `sources` hold everything so far.
+    """
+
+    def __init__(self):
+        self.blocks: List[Tuple[str, str]] = []
+        self._citations = _CitationFilter()
+        self._splitter = _BlockSplitter()
+        self._has_content = False
+        self._raw_blocks = 0
+        # Citation-free text, kept only until the first block (for the no-blocks fallback)
+        self._cleaned: Optional[List[str]] = []
+        self._closed = False
+
+    @property
+    def sources(self) -> List[str]:
+        return self._citations.sources
+
+    def _take(self, cleaned: str, raw: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        if self._cleaned is not None:
+            self._cleaned.append(cleaned)
+        if raw:
+            self._raw_blocks += len(raw)
+            self._cleaned = None
+        out = [b for b in map(_render, raw) if b is not None]
+        self.blocks.extend(out)
+        return out
+
+    def feed(self, chunk: str) -> List[Tuple[str, str]]:
+        if not self._has_content and chunk.strip():
+            self._has_content = True
+        cleaned = self._citations.feed(chunk)
+        return self._take(cleaned, self._splitter.feed(cleaned))
+
+    def close(self) -> List[Tuple[str, str]]:
+        if self._closed:
+            return []
+        self._closed = True
+        if not self._has_content:
+            self.blocks = [('text', 'No response available.')]
+            return list(self.blocks)
+        cleaned = self._citations.close()
+        raw = self._splitter.feed(cleaned) + self._splitter.close()
+        out = self._take(cleaned, raw)
+        if not self._raw_blocks:
+            # If no tables found, treat entire response as text
+            fallback = _render(('text', "".join(self._cleaned).strip()))
+            if fallback is not None:
+                out.append(fallback)
+                self.blocks.append(fallback)
+        # If we ended up with empty blocks, return a default message
+        if not self.blocks:
+            out.append(('text', 'Could not parse response content.'))
+            self.blocks.append(out[-1])
+        return out
+
+
 def extract_source_citations(response: str) -> Tuple[str, List[str]]:
     """
     Extract source citations from the response.
-    
+
     Looks for patterns like [source: filename.pdf#page] and removes them from the text.
-    
+
     Args:
         response: The full response text
-        
+
     Returns:
         Tuple of (cleaned_response, list_of_sources)
     """
-    sources = []
-    
-    # Match [source: ...] patterns
-    source_pattern = r'\[source:\s*([^\]]+)\]'
-    
-    for match in re.finditer(source_pattern, response):
-        source = match.group(1).strip()
-        if source not in sources:
-            sources.append(source)
-    
-    # Remove all source citations from response
-    cleaned = re.sub(source_pattern, '', response, flags=re.IGNORECASE)
-    
-    return cleaned.strip(), sources
+    citations = _CitationFilter()
+    cleaned = citations.feed(response, final=True)
+    return cleaned.strip(), citations.sources
 
 
 def extract_response_blocks(response: str) -> List[Tuple[str, str]]:
     """
     Extract blocks from the response: ('table', html) or ('text', markdown).
-    
+
     Handles three types of table markers:
     1. --TABLE-START-- and --TABLE-END-- delimiters
     2. Raw <table> HTML tags
     3. Text between other content
-    
+
     Also removes source citations before parsing.
-    
+
     Returns:
         List of tuples: [('text', content), ('table', html), ('text', content), ...]
     """
-    # First, extract and remove source citations
     response, sources = extract_source_citations(response)
-    
-    blocks = []
-    last_end = 0
-    
-    # Find all table markers (both delimiter-based and tag-based)
-    table_pattern = r'--TABLE-START--(.*?)--TABLE-END--|<table[^>]*>(.*?)</table>'
-    
-    for match in re.finditer(table_pattern, response, re.DOTALL | re.IGNORECASE):
-        # Get the table content (group 1 for delimiters, group 2 for tags)
-        table_html = match.group(1) if match.group(1) is not None else match.group(2)
-        table_html = table_html.strip()
-        
-        # Add text before this table
-        text_before = response[last_end:match.start()].strip()
-        if text_before:
-            blocks.append(('text', text_before))
-        
-        # Add the table
-        if table_html:
-            # Wrap tag-based tables in proper format
-            if not table_html.startswith('<table'):
-                table_html = f"<table>{table_html}</table>"
-            blocks.append(('table', table_html))
-        
-        last_end = match.end()
-    
-    # Add remaining text after last table
-    text_after = response[last_end:].strip()
-    if text_after:
-        blocks.append(('text', text_after))
-    
+
+    splitter = _BlockSplitter()
+    blocks = splitter.feed(response, final=True) + splitter.close()
+
     # If no tables found, treat entire response as text
     if not blocks:
         blocks.append(('text', response))
-    
+
     # Store sources with blocks for later reference if needed
     if sources and blocks:
         # Attach sources to the last block
-        blocks[-1] = (blocks[-1][0], blocks[-1][1], sources) if len(blocks[-1]) == 2 else blocks[-1]
-    
-    return blocks
+        blocks[-1] = (blocks[-1][0], blocks[-1][1], sources)
 
+    return blocks
 
 
 def sanitize_html_table(html: str) -> str:
     """
     Sanitize HTML table: ensure valid <table>, <tr>, <th>, <td> tags only.
     Remove dangerous attributes, scripts, and unnecessary whitespace.
-    
+
     Args:
         html: Raw HTML table string
-        
+
     Returns:
         Sanitized HTML table string
     """
-    # Remove any script tags or dangerous content
-    html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-    html = re.sub(r'on\w+\s*=\s*["\'][^"\']*["\']', '', html, flags=re.IGNORECASE)  # remove event handlers
-    
-    # Keep only safe table-related tags
-    allowed_tags = r'</?(?:table|tr|th|td|tbody|thead|tfoot|colgroup|col|caption)[\s>]'
-    
-    def remove_unsafe_tags(text):
-        """Remove all tags except allowed table-related ones."""
-        parts = []
-        last_end = 0
-        for match in re.finditer(r'<[^>]+>', text):
-            tag = match.group(0)
-            # Keep the tag if it's in the allowed list
-            if re.match(allowed_tags, tag, re.IGNORECASE):
-                parts.append(text[last_end:match.start()])
-                parts.append(tag)
-            else:
-                # Skip this tag, keep content
-                parts.append(text[last_end:match.start()])
-            last_end = match.end()
-        parts.append(text[last_end:])
-        return ''.join(parts)
-    
-    html = remove_unsafe_tags(html)
-    
-    # Clean up excess whitespace within and between tags
-    html = re.sub(r'>\s+<', '><', html)  # Remove whitespace between tags
-    html = re.sub(r'\s+', ' ', html)     # Collapse multiple spaces
-    
-    return html.strip()
-
+    return _sanitize(html)
 
 
 def parse_response_for_rendering(response: str) -> List[Tuple[str, str]]:
     """
     Parse response and return a list of blocks ready for Streamlit rendering.
-    
+
     Process:
     1. Extract and remove source citations
     2. Identify tables (both delimited and raw HTML)
     3. Sanitize HTML tables
     4. Preserve text formatting
-    
+
     Each block is: ('text', markdown_content) or ('table', sanitized_html)
-    
+
     Args:
         response: Full RAG response from the model
-        
+
     Returns:
         List of (block_type, content) tuples
     """
     if not response or not response.strip():
         return [('text', 'No response available.')]
-    
-    blocks = extract_response_blocks(response)
-    
-    parsed = []
-    for block in blocks:
-        block_type = block[0]
-        content = block[1]
-        
-        if block_type == 'table':
-            # Sanitize the HTML table
-            safe_html = sanitize_html_table(content)
-            if safe_html:
-                parsed.append(('table', safe_html))
-        else:
-            # Clean up text: remove extra whitespace, preserve structure
-            text = content.strip()
-            # Replace multiple newlines with single newline for cleaner rendering
-            text = re.sub(r'\n\s*\n', '\n\n', text)
-            if text:
-                parsed.append(('text', text))
-    
-    # If we ended up with empty blocks, return a default message
-    if not parsed:
-        parsed.append(('text', 'Could not parse response content.'))
-    
-    return parsed
 
+    parser = ResponseParser()
+    parser.feed(response)
+    parser.close()
+    return parser.blocks
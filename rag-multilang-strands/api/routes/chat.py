@@ -1,19 +1,85 @@
 
 # api/routes/chat.py
-from fastapi import APIRouter
-from api.models import ChatRequest, ChatResponse
-from agent.strands_agent import answer_with_converse
+import json
+
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from api.models import ChatBatchRequest, ChatRequest, ChatResponse
+from agent.strands_agent import answer_batch_with_converse, answer_stream, answer_with_converse_async
+from config.settings import CHAT_BATCH_MAX_QUERIES
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
-def chat(req: ChatRequest):
-    # Get structured answer from Bedrock via Converse
-    result = answer_with_converse(req.query, req.userLang or "en")
 
+def _to_response(result: dict) -> ChatResponse:
     # Normalize into DTO
     return ChatResponse(
         text=result.get("text", ""),
         tables=[{"html": t} if isinstance(t, str) else t for t in result.get("tables", [])],
         images=[{"src": i} if isinstance(i, str) else i for i in result.get("images", [])],
     )
+
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(req: ChatRequest):
+    # Get structured answer from Bedrock via Converse; blocking calls run on the
+    # chat executor, so the event loop stays free for other requests
+    result = await answer_with_converse_async(req.query, req.userLang)
+    return _to_response(result)
+
+
+@router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    # Server-sent events: `delta` events carry {"text": ...} as the model writes,
+    # then one `done` event with the ChatResponse (or `error` with {"detail": ...})
+    async def events():
+        try:
+            async for ev in answer_stream(req.query, req.userLang):
+                if ev["event"] == "delta":
+                    yield _sse("delta", json.dumps({"text": ev["text"]}, ensure_ascii=False))
+                else:
+                    yield _sse("done", json.dumps(jsonable_encoder(_to_response(ev["response"])), ensure_ascii=False))
+        except Exception as e:
+            print(f"[WARNING] Chat stream failed: {e}")
+            yield _sse("error", json.dumps({"detail": str(e)}))
+
+    # no-transform / X-Accel-Buffering keep compressing proxies from buffering the stream
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/chat/batch")
+async def chat_batch(req: ChatBatchRequest):
+    # Server-sent events: one `result` event per query, in request order, with
+    # {"index", "query", "response": ChatResponse}; then `done` with {"count": n}
+    # (or `error` with {"detail": ...})
+    if not req.queries:
+        raise HTTPException(status_code=400, detail="No queries in batch")
+    if len(req.queries) > CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {CHAT_BATCH_MAX_QUERIES} queries per batch")
+
+    async def events():
+        count = 0
+        try:
+            async for i, result in answer_batch_with_converse(req.queries, req.userLang):
+                payload = {"index": i, "query": req.queries[i], "response": jsonable_encoder(_to_response(result))}
+                yield _sse("result", json.dumps(payload, ensure_ascii=False))
+                count += 1
+            yield _sse("done", json.dumps({"count": count}))
+        except Exception as e:
+            print(f"[WARNING] Chat batch failed: {e}")
+            yield _sse("error", json.dumps({"detail": str(e)}))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,19 @@
+
+# api/routes/documents.py
+from fastapi import APIRouter, HTTPException
+from rag.documents import delete_document, list_documents
+from rag.index_manager import get_index_manager
+
+router = APIRouter()
+
+@router.get("/documents")
+def documents():
+    return {"documents": list_documents()}
+
+@router.delete("/documents/{doc_id}")
+def delete(doc_id: str):
+    if not delete_document(doc_id):
+        raise HTTPException(status_code=404, detail=f"Unknown document {doc_id}")
+    # Searches in this process stop returning the document right away
+    get_index_manager().reload()
+    return {"deleted": doc_id}
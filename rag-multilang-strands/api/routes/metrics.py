@@ -0,0 +1,23 @@
+
+# api/routes/metrics.py
+from fastapi import APIRouter
+from rag.query_cache import get_query_cache
+from rag.answer_cache import get_answer_cache
+from rag.embedding_cache import get_embedding_cache
+from rag.ingest import get_ingest_stats
+from agent.strands_agent import get_chat_stats
+
+router = APIRouter()
+
+@router.get("/metrics")
+def metrics():
+    # Cache hit rates and sizes for the query path, answers and ingestion, per-stage ingest
+    # counters, chats currently in the async pipeline
+    embed_cache = get_embedding_cache()
+    return {
+        "query_cache": get_query_cache().stats(),
+        "answer_cache": get_answer_cache().stats(),
+        "embedding_cache": embed_cache.stats() if embed_cache is not None else None,
+        "last_ingest": get_ingest_stats(),
+        "chat": get_chat_stats(),
+    }
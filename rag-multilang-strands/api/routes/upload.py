@@ -1,30 +1,24 @@
 
 # api/routes/upload.py
-from fastapi import APIRouter, UploadFile
-import os
-from typing import List
-from rag.ingest import ingest_uploaded_files
-from rag.embeddings import embed_texts
-from storage.vector import VectorStore
-from config.settings import FAISS_DIR
+from fastapi import APIRouter, HTTPException, Request
+from api.multipart_stream import receive_uploads
+from rag.jobs import get_job, submit_ingest_job
 
 router = APIRouter()
 
-@router.post("/upload")
-async def upload(files: List[UploadFile]):
-    # Save files temporarily and ingest
-    temp_files = []
-    for f in files:
-        data = await f.read()
-        path = os.path.join("data/docs/uploads", f.filename)
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "wb") as out:
-            out.write(data)
-        # Create a file-like object for ingest_uploaded_files
-        from io import BytesIO
-        temp_file = BytesIO(data)
-        temp_file.name = f.filename
-        temp_files.append(temp_file)
-    
-    indexed = ingest_uploaded_files(temp_files)
-    return {"indexed": indexed}
+@router.post("/upload", status_code=202)
+async def upload(request: Request):
+    # Stream the multipart `files` straight to data/docs/uploads, then index them
+    # in a background job; poll /upload/{job_id}
+    saved = await receive_uploads(request, field="files")
+    if not saved:
+        raise HTTPException(status_code=400, detail="No files in upload")
+    job = submit_ingest_job(saved)
+    return job.as_dict()
+
+@router.get("/upload/{job_id}")
+def upload_status(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown upload job {job_id}")
+    return job.as_dict()
@@ -55,7 +55,7 @@ if prompt:
     with st.chat_message("assistant"):
         with st.spinner("Thinking…"):
             try:
-                res = answer(prompt)
+                res = answer(prompt, lang=lang)
             except Exception as e:
                 res = f"Error: {e}"
         
@@ -0,0 +1,111 @@
+# benchmarks/bench_chat.py
+"""
+Concurrent chat throughput and time to first token: the old blocking pipeline
+on a 40-thread pool (Starlette's default threadpool size) vs. the async
+pipeline and the streaming pipeline with every chat started at once, against
+stubbed Translate / Bedrock clients and the TOP_K nearest chunks of the local
+index. Queries are German, so each chat pays for query translation, snippet
+translation and converse. For non-streamed chats the first token arrives with
+the whole answer.
+
+    python -m benchmarks.bench_chat --chats 200 --converse-latency 1.0 --first-token-latency 0.3
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from agent import strands_agent
+from benchmarks.stubs import StubBedrockRuntime, StubTranslate
+from rag import embeddings, retriever, translation
+from rag.embeddings import EmbeddingEngine
+from rag.vectorstore_faiss import FaissStore
+from config.settings import FAISS_DIR, TOP_K
+
+STARLETTE_THREADS = 40
+
+
+def blocking_chat(query: str):
+    # The pre-async route: every step in sequence on the request thread.
+    analysis = retriever.analyze_query(query)
+    results = strands_agent.retrieve_context(query, analysis)
+    context = retriever.format_context_snippets(results, analysis.lang)
+    prompt = strands_agent.build_prompt(user_query=query, context=context, handoff_message=strands_agent.HANDOFF_MESSAGE)
+    resp = strands_agent._converse(prompt)
+    return resp["output"]["message"]["content"][0]["text"], time.perf_counter()
+
+
+# Each chat returns (answer, time its first token reached the caller)
+async def async_chat(query: str):
+    txt = await strands_agent.answer_async(query)
+    return txt, time.perf_counter()
+
+
+async def stream_chat(query: str):
+    first = None
+    async for ev in strands_agent.answer_stream(query):
+        if first is None:
+            first = time.perf_counter()
+        if ev["event"] == "done":
+            return ev["response"]["text"], first
+
+
+async def run_all(chat, queries):
+    return await asyncio.gather(*(chat(q) for q in queries))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chats", type=int, default=200)
+    ap.add_argument("--translate-latency", type=float, default=0.1)
+    ap.add_argument("--embed-latency", type=float, default=0.05)
+    ap.add_argument("--converse-latency", type=float, default=1.0)
+    ap.add_argument("--first-token-latency", type=float, default=0.3)
+    args = ap.parse_args()
+
+    store = FaissStore(dim=1024, persist_dir=FAISS_DIR)
+    corpus = store.segments[0]
+    result_sets = [store.search(corpus.index.reconstruct((q * 97) % corpus.ntotal), TOP_K) for q in range(16)]
+
+    def fake_retrieve(query, analysis=None):
+        return result_sets[hash(query) % len(result_sets)]
+
+    timings = {}
+    for name in ("threadpool", "async", "stream"):
+        # Distinct queries and cold caches so both runs pay for every call
+        queries = [f"Wie groß ist der Akku, Frage {i} ({name})?" for i in range(args.chats)]
+        translation.get_translation_cache().clear()
+        runtime = StubBedrockRuntime(latency=args.embed_latency, converse_latency=args.converse_latency,
+                                     first_token_latency=args.first_token_latency)
+        translate = StubTranslate(latency=args.translate_latency)
+        with mock.patch.object(embeddings, "_engine", EmbeddingEngine(client=runtime)), \
+                mock.patch.object(embeddings, "get_embedding_cache", lambda: None), \
+                mock.patch.object(retriever, "detect_lang", lambda text: "de"), \
+                mock.patch.object(retriever, "translate_client", lambda: translate), \
+                mock.patch.object(translation, "translate_client", lambda: translate), \
+                mock.patch.object(strands_agent, "bedrock_runtime", lambda: runtime), \
+                mock.patch.object(strands_agent, "retrieve_context", fake_retrieve):
+            t0 = time.perf_counter()
+            if name == "threadpool":
+                with ThreadPoolExecutor(max_workers=STARLETTE_THREADS) as pool:
+                    out = list(pool.map(blocking_chat, queries))
+            else:
+                out = asyncio.run(run_all(async_chat if name == "async" else stream_chat, queries))
+            timings[name] = time.perf_counter() - t0
+        answers = [strands_agent._structure(a)["text"] if name != "stream" else a for a, _ in out]
+        assert all(a == answers[0] for a in answers)
+        # Every chat arrives at t0, so queueing for a thread counts against it
+        ttft = sorted(t - t0 for _, t in out)
+        print(
+            f"{name:10} {args.chats} chats {timings[name]:6.2f}s  {args.chats / timings[name]:6.1f} chats/s  "
+            f"first token p50 {statistics.median(ttft) * 1000:6.0f} ms  p95 {ttft[int(0.95 * len(ttft)) - 1] * 1000:6.0f} ms  "
+            f"peak Bedrock calls in flight {runtime.capacity.peak}"
+        )
+    print(f"speedup x{timings['threadpool'] / timings['async']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/bench_chat_batch.py
+"""
+A batch of N questions answered as N single chats (answer_async, at most
+--concurrency at a time, like a client looping over POST /chat with a bounded
+pool) vs. one answer_batch call with the same generation concurrency, against
+stubbed Translate / Bedrock clients and the local index.
+
+Questions are the first words of random chunks of the index, presented as
+German: each needs query translation, embedding, FAISS + BM25 retrieval,
+snippet translation and converse. Query embeddings are the stored vectors of
+those chunks, so retrieval finds them and the confidence gate lets every
+question through to converse; the answer cache is off.
+
+Also times the retrieval stage alone: analyze_query + retrieve_context per
+question on a thread pool vs. analyze_queries + retrieve_contexts (one
+embedding round, one FAISS search over the (N, dim) query matrix).
+
+    python -m benchmarks.bench_chat_batch --queries 100 --concurrency 16 --converse-latency 1.0
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from agent import strands_agent
+from benchmarks.stubs import StubBedrockRuntime, StubTranslate
+from rag import retriever, translation
+from rag.answer_cache import get_answer_cache
+from rag.binary_index import BinaryRerankIndex
+from rag.index_manager import get_index_manager
+from rag.query_cache import get_query_cache
+
+
+def sample_questions(store, n: int, rng: random.Random):
+    rows = [(seg, i) for seg in store.segments for i in range(seg.ntotal)]
+    rng.shuffle(rows)
+    questions, vectors = {}, {}
+    for seg, i in rows:
+        if len(questions) == n:
+            break
+        words = [w for w in seg.meta.get(i)[0].split() if w.isalpha()][:10]
+        if len(words) < 8:
+            continue
+        question = " ".join(words) + f" ({len(questions)})?"
+        questions[question] = None
+        # StubTranslate upper-cases, so the English query is what gets embedded
+        vectors[question.upper()] = seg.index.vectors[i] if isinstance(seg.index, BinaryRerankIndex) else seg.index.reconstruct(i)
+    return list(questions), vectors
+
+
+def reset_caches():
+    get_query_cache().clear()
+    get_answer_cache().clear()
+    translation.get_translation_cache().clear()
+
+
+async def single_chats(questions, concurrency: int):
+    limit = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def _one(q):
+        async with limit:
+            txt = await strands_agent.answer_async(q)
+            return txt, time.perf_counter() - started
+
+    return await asyncio.gather(*(_one(q) for q in questions))
+
+
+async def batch_chat(questions, concurrency: int):
+    started = time.perf_counter()
+    return [(txt, time.perf_counter() - started) async for _, txt in strands_agent.answer_batch(questions, concurrency)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--translate-latency", type=float, default=0.1)
+    ap.add_argument("--embed-latency", type=float, default=0.05)
+    ap.add_argument("--converse-latency", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=23)
+    args = ap.parse_args()
+
+    store = get_index_manager().store()
+    questions, vectors = sample_questions(store, args.queries, random.Random(args.seed))
+    print(f"{len(questions)} questions over {store.ntotal} rows, e.g. {questions[0]!r}")
+
+    def embed_texts(texts, *a, **kw):
+        # One embedding round trip per call (the engine embeds a batch concurrently)
+        time.sleep(args.embed_latency)
+        return [vectors[t].tolist() for t in texts]
+
+    runtime = StubBedrockRuntime(latency=args.embed_latency, converse_latency=args.converse_latency)
+    translate = StubTranslate(latency=args.translate_latency)
+    patches = [mock.patch.object(retriever, "embed_texts", embed_texts),
+               mock.patch.object(retriever, "detect_lang", lambda text: "de"),
+               mock.patch.object(strands_agent, "detect_lang", lambda text: "de"),
+               mock.patch.object(retriever, "translate_client", lambda: translate),
+               mock.patch.object(translation, "translate_client", lambda: translate),
+               mock.patch.object(strands_agent, "bedrock_runtime", lambda: runtime),
+               # Neighbouring chunks are close enough to share answers; measure the pipeline, not the cache
+               mock.patch.object(strands_agent, "_cached_answer", lambda *a: None)]
+    for p in patches:
+        p.start()
+    try:
+        # Retrieval stage alone
+        reset_caches()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            single = list(pool.map(lambda q: retriever.retrieve_context(q, retriever.analyze_query(q)), questions))
+        single_s = time.perf_counter() - t0
+        reset_caches()
+        t0 = time.perf_counter()
+        batched = retriever.retrieve_contexts(questions)
+        batch_s = time.perf_counter() - t0
+        same = sum([m.get("chunk_id") for _, m, _ in a] == [m.get("chunk_id") for _, m, _ in b] for a, b in zip(single, batched))
+        print(f"retrieval  per-query {single_s * 1000:7.0f} ms   batched {batch_s * 1000:7.0f} ms   "
+              f"x{single_s / batch_s:.1f}  identical results {same}/{len(questions)}")
+
+        # End to end
+        timings = {}
+        for name, run in (("single", single_chats), ("batch", batch_chat)):
+            reset_caches()
+            calls = (runtime.calls, translate.calls)
+            runtime.capacity.peak = 0
+            t0 = time.perf_counter()
+            out = asyncio.run(run(questions, args.concurrency))
+            timings[name] = time.perf_counter() - t0
+            handoffs = sum(txt == strands_agent.HANDOFF_MESSAGE for txt, _ in out)
+            first = min(t for _, t in out)
+            print(f"{name:6} {len(questions)} questions {timings[name]:6.2f}s  {len(questions) / timings[name]:6.1f} answers/s  "
+                  f"first answer {first * 1000:6.0f} ms  Translate calls {translate.calls - calls[1]:4d}  "
+                  f"converse calls {runtime.calls - calls[0]:4d}  peak in flight {runtime.capacity.peak}  handoffs {handoffs}")
+        print(f"speedup x{timings['single'] / timings['batch']:.2f}")
+    finally:
+        for p in patches:
+            p.stop()
+
+
+if __name__ == "__main__":
+    main()
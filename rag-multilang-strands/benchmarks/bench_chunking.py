@@ -0,0 +1,182 @@
+# benchmarks/bench_chunking.py
+"""
+Chunking of the documents under DATA_DIR: the character windows of
+rag.utils.chunk_text (CHUNK_SIZE / CHUNK_OVERLAP, what ingest used before)
+vs. the token-budgeted chunks of rag.chunking (what ingest.chunk_block
+produces now).
+
+Reports chunk counts and sizes in estimated tokens, tail fragments (chunks
+under CHUNK_MIN_TOKENS), sentences and table rows cut across chunks, and
+retrieval hit@TOP_K. The queries are sentences of the corpus with their first
+and last words dropped. A query hits if one of the TOP_K chunks contains the
+whole sentence, so the answer arrives intact. BM25 (rag.lexical) runs
+offline. Dense retrieval embeds every chunk and query with Bedrock (through
+the embedding cache), so it only runs with --live.
+
+With --from-index the documents are rebuilt from the rows of the local index
+(a larger corpus than DATA_DIR holds; it has no table blocks).
+
+Finally, peak memory of chunking a generated document fed line by line,
+against chunk_text on the same text as one string.
+
+    python -m benchmarks.bench_chunking --queries 300 [--from-index] [--live] [--stream-mb 20]
+"""
+
+import argparse
+import os
+import random
+import re
+import statistics
+import tracemalloc
+
+import numpy as np
+
+from config.settings import CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS, CHUNK_OVERLAP, CHUNK_SIZE, DATA_DIR, TOP_K
+from rag import ingest
+from rag.chunking import count_tokens, iter_chunks, iter_sentences
+from rag.index_manager import get_index_manager
+from rag.lexical import LexicalIndex, search_lexical
+from rag.utils import chunk_text
+
+_WS = re.compile(r"\s+")
+
+
+def norm(text: str) -> str:
+    return _WS.sub(" ", text).strip()
+
+
+class MemorySegment:
+    """Just enough of rag.segments.Segment for rag.lexical.search_lexical."""
+
+    name = "bench"
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.lexical = LexicalIndex.build(texts)
+        self.meta = self
+
+    def get(self, i):
+        return self.texts[i], {"chunk_id": str(i)}
+
+
+def load_blocks():
+    # Every supported file, indexed or not (ingest._iter_data_files skips indexed ones)
+    blocks = []
+    for root, _, files in os.walk(DATA_DIR):
+        for f in sorted(files):
+            if f.lower().endswith(ingest.SUPPORTED_EXTENSIONS) and not f.startswith(ingest.UPLOAD_TMP_PREFIX):
+                blocks.extend(ingest._parse_file(os.path.join(root, f), f))
+    return [(text, meta) for text, meta in blocks if text.strip()]
+
+
+def blocks_from_index():
+    # The local index holds chunk_text windows in ingest order; consecutive rows
+    # of one source that share the CHUNK_OVERLAP characters are stitched back
+    blocks = []
+    for seg in get_index_manager().store().segments:
+        for i in range(seg.ntotal):
+            text, meta = seg.meta.get(i)
+            prev = blocks[-1] if blocks else None
+            if prev and prev[1].get("source") == meta.get("source") and prev[0][-CHUNK_OVERLAP:] == text[:CHUNK_OVERLAP]:
+                prev[0] += text[CHUNK_OVERLAP:]
+            else:
+                blocks.append([text, meta])
+    return [(text, meta) for text, meta in blocks if text.strip()]
+
+
+def old_chunks(blocks):
+    return [c for text, _ in blocks for c in chunk_text(text, CHUNK_SIZE, CHUNK_OVERLAP) if c.strip()]
+
+
+def new_chunks(blocks):
+    return [c for text, meta in blocks for c in ingest.chunk_block(text, meta)]
+
+
+def sample_queries(blocks, n: int, rng: random.Random):
+    sentences = [norm(s) for text, meta in blocks if "table_html" not in meta for s in iter_sentences(text)]
+    sentences = [s for s in dict.fromkeys(sentences) if 8 <= len(s.split()) <= 60]
+    picked = rng.sample(sentences, min(n, len(sentences)))
+    return [(" ".join(s.split()[2:-2]), s) for s in picked]
+
+
+def split_rows(blocks, chunks) -> str:
+    rows = {norm(r) for text, meta in blocks if "table_html" in meta for r in text.splitlines() if r.strip()}
+    if not rows:
+        return "n/a"
+    cut = 0
+    for c in chunks:
+        lines = [norm(line) for line in c.splitlines() if line.strip()]
+        cut += sum(line not in rows for line in lines if "|" in line)
+    return str(cut)
+
+
+def report(name, chunks, blocks, queries, dense_hits):
+    tokens = sorted(count_tokens(c) for c in chunks)
+    tails = sum(t < CHUNK_MIN_TOKENS for t in tokens)
+    segment = MemorySegment(chunks)
+    normed = [norm(c) for c in chunks]
+    bm25 = sum(any(s in normed[int(m["chunk_id"])] for _, m, _ in search_lexical([segment], q, TOP_K)) for q, s in queries)
+    intact = sum(any(s in c for c in normed) for _, s in queries)
+    dense = f"{dense_hits / len(queries):7.1%}" if dense_hits is not None else f"{'n/a':>7}"
+    print(f"{name:7} {len(chunks):7d} {statistics.mean(tokens):7.0f} {tokens[len(tokens) // 2]:5d} {tokens[-1]:5d} "
+          f"{tails:6d} {split_rows(blocks, chunks):>6} {intact / len(queries):7.1%} {bm25 / len(queries):7.1%} {dense}")
+
+
+def dense_hit_count(chunks, queries):
+    import faiss
+    from rag.embeddings import embed_texts
+    vectors = np.asarray(embed_texts(chunks), dtype="float32")
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    q = np.asarray(embed_texts([q for q, _ in queries]), dtype="float32")
+    _, ids = index.search(q, TOP_K)
+    normed = [norm(c) for c in chunks]
+    return sum(any(s in normed[i] for i in row if i >= 0) for row, (_, s) in zip(ids, queries))
+
+
+def stream_memory(mb: int):
+    sentence = "The Galaxy S25 ships with a 4000 mAh battery and charges to 50 percent in 30 minutes. "
+    n_lines = mb * 1024 * 1024 // (len(sentence) * 4)
+
+    def lines():
+        for i in range(n_lines):
+            yield sentence * 3 + f"Line {i}.\n"
+
+    tracemalloc.start()
+    count = sum(1 for _ in iter_chunks(lines()))
+    streamed = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    tracemalloc.start()
+    text = "".join(lines())
+    count_old = len(chunk_text(text, CHUNK_SIZE, CHUNK_OVERLAP))
+    whole = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{mb} MB document: iter_chunks over lines peak {streamed / 2**10:6.0f} KB ({count} chunks), "
+          f"chunk_text on the string peak {whole / 2**20:6.1f} MB ({count_old} chunks)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--live", action="store_true", help="also measure dense retrieval with Bedrock embeddings")
+    ap.add_argument("--stream-mb", type=int, default=20)
+    ap.add_argument("--from-index", action="store_true", help="use the text of the local index instead of DATA_DIR")
+    ap.add_argument("--seed", type=int, default=24)
+    args = ap.parse_args()
+
+    blocks = blocks_from_index() if args.from_index else load_blocks()
+    queries = sample_queries(blocks, args.queries, random.Random(args.seed))
+    old, new = old_chunks(blocks), new_chunks(blocks)
+    print(f"{len(blocks)} blocks from {'the local index' if args.from_index else DATA_DIR}, {len(queries)} sentence queries; "
+          f"old: {CHUNK_SIZE} chars / {CHUNK_OVERLAP} overlap, new: {CHUNK_MAX_TOKENS} tokens")
+    print(f"{'chunker':7} {'chunks':>7} {'mean':>7} {'p50':>5} {'max':>5} {'tails':>6} {'rowcut':>6} "
+          f"{'intact':>7} {'bm25@' + str(TOP_K):>7} {'dense@' + str(TOP_K):>7}")
+    for name, chunks in (("chars", old), ("tokens", new)):
+        report(name, chunks, blocks, queries, dense_hit_count(chunks, queries) if args.live else None)
+    print(f"chunk count x{len(new) / len(old):.2f} ({len(old) - len(new)} fewer embedding calls and index rows)")
+    if args.stream_mb:
+        stream_memory(args.stream_mb)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_clients.py
+"""
+Per-call client overhead: the previous bedrock_runtime() / translate_client()
+(load .env and build a new boto3 client on every call) vs. the shared clients
+of config.bedrock_client.ClientProvider, against a local HTTP stub of the
+Translate and Bedrock invoke_model endpoints that answers immediately.
+
+Reports calls/s serially and from --threads threads, and how many TCP
+connections the stub accepted. The stub speaks plain HTTP, so the TLS
+handshake a new connection costs against AWS is not even included.
+
+    python -m benchmarks.bench_clients --calls 200 --threads 16
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import boto3
+from dotenv import load_dotenv
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, keep-alive
+    # connections stall on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.endswith("/invoke"):
+            payload = {"embedding": [0.0] * 8}
+        else:
+            text = json.loads(body or b"{}").get("Text", "")
+            payload = {"TranslatedText": text, "SourceLanguageCode": "de", "TargetLanguageCode": "en"}
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def fresh_client(service: str):
+    # The pre-provider implementation, minus the explicit-keys branch
+    load_dotenv()
+    return boto3.client(service, region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"))
+
+
+def call(client_for, i: int):
+    if i % 2:
+        client_for("translate").translate_text(Text=f"Frage {i}", SourceLanguageCode="de", TargetLanguageCode="en")
+    else:
+        resp = client_for("bedrock-runtime").invoke_model(
+            modelId="amazon.titan-embed-text-v2:0", body=json.dumps({"inputText": f"chunk {i}"}),
+            accept="application/json", contentType="application/json",
+        )
+        resp["body"].read()
+
+
+def run(client_for, calls: int, threads: int) -> float:
+    t0 = time.perf_counter()
+    if threads <= 1:
+        for i in range(calls):
+            call(client_for, i)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda i: call(client_for, i), range(calls)))
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--threads", type=int, default=16)
+    args = ap.parse_args()
+
+    server = StubServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["AWS_ENDPOINT_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+
+    from config.bedrock_client import ClientProvider
+
+    call(fresh_client, 0)  # warm boto3's loaders and the service models
+    for threads in (1, args.threads):
+        for name in ("per-call", "shared"):
+            client_for = fresh_client if name == "per-call" else ClientProvider().client
+            before = server.connections
+            elapsed = run(client_for, args.calls, threads)
+            print(
+                f"{name:9} threads={threads:<3} {args.calls} calls {elapsed:6.2f}s  {args.calls / elapsed:7.1f} calls/s  "
+                f"{elapsed / args.calls * 1000:6.2f} ms/call  connections opened {server.connections - before}"
+            )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
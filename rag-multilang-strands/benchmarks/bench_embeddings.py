@@ -0,0 +1,57 @@
+# benchmarks/bench_embeddings.py
+"""
+Embedding throughput: the old serial loop vs. EmbeddingEngine at several
+concurrency limits, against a stubbed Bedrock runtime.
+
+    python -m benchmarks.bench_embeddings --texts 400 --latency 0.05
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.stubs import StubBedrockRuntime
+from rag.embeddings import EmbeddingEngine
+
+
+def serial_embed(client, texts, normalize=True, dimensions=1024):
+    # The pre-engine implementation: one blocking call per text.
+    out = []
+    for t in texts:
+        body = json.dumps({"inputText": t, "dimensions": dimensions, "normalize": normalize})
+        resp = client.invoke_model(modelId="stub", body=body, accept="application/json", contentType="application/json")
+        out.append(json.loads(resp.get("body").read())["embedding"])
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--texts", type=int, default=400)
+    ap.add_argument("--latency", type=float, default=0.05, help="stub round-trip seconds")
+    ap.add_argument("--capacity", type=int, default=0, help="stub throttles above this many in-flight calls (0 = never)")
+    ap.add_argument("--concurrency", default="1,4,8,16,32")
+    args = ap.parse_args()
+
+    texts = [f"chunk {i}: Galaxy S25 specification text" for i in range(args.texts)]
+
+    stub = StubBedrockRuntime(latency=args.latency)
+    t0 = time.perf_counter()
+    reference = serial_embed(stub, texts)
+    serial_s = time.perf_counter() - t0
+    print(f"serial loop          {serial_s:7.2f}s  {len(texts) / serial_s:8.1f} texts/s")
+
+    for c in [int(x) for x in args.concurrency.split(",")]:
+        stub = StubBedrockRuntime(latency=args.latency, capacity=args.capacity)
+        engine = EmbeddingEngine(client=stub, max_concurrency=c, base_delay=0.01, max_delay=0.2)
+        t0 = time.perf_counter()
+        vectors = engine.embed(texts)
+        elapsed = time.perf_counter() - t0
+        assert vectors == reference, "engine must preserve input order"
+        print(
+            f"engine c={c:<3}         {elapsed:7.2f}s  {len(texts) / elapsed:8.1f} texts/s  "
+            f"speedup x{serial_s / elapsed:5.1f}  throttled={stub.capacity.throttled} final_limit={engine.limiter.limit}"
+        )
+
+
+if __name__ == "__main__":
+    main()
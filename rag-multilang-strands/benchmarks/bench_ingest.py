@@ -0,0 +1,101 @@
+# benchmarks/bench_ingest.py
+"""
+Multi-file ingest wall clock: stage-by-stage (parse everything, then embed
+everything, then index) vs. the streaming pipeline, with a stubbed Bedrock
+runtime and a fixed per-file parse cost standing in for pdfplumber. Indexes
+into a temporary directory.
+
+    python -m benchmarks.bench_ingest --files 12 --parse-latency 0.3 --latency 0.05
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from benchmarks.stubs import StubBedrockRuntime
+from rag import embeddings, ingest
+from rag.embeddings import EmbeddingEngine
+from rag.vectorstore_faiss import FaissStore
+from config.settings import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+WORDS = "the galaxy s25 ships with a 4000 mAh battery and 12 GB of memory for fast charging".split()
+
+
+def make_files(directory: str, n_files: int, chunks_per_file: int):
+    # Words like "galaxy3-7" count as three tokens
+    step = max(1, CHUNK_MAX_TOKENS - CHUNK_OVERLAP_TOKENS)
+    files = []
+    for f in range(n_files):
+        words = [f"{WORDS[i % len(WORDS)]}{f}-{i // len(WORDS)}" for i in range(step * chunks_per_file // 3)]
+        path = os.path.join(directory, f"doc{f}.txt")
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(" ".join(words))
+        files.append((path, f"bench-{f}"))
+    return files
+
+
+def staged(files, persist_dir):
+    # The pre-pipeline flow: each stage runs to completion before the next starts.
+    blocks = []
+    for path, doc_id in files:
+        blocks.extend(ingest._parse_file(path, doc_id))
+    ingest._detect_block_langs(blocks)
+    chunks, metas = [], []
+    for text, meta in blocks:
+        for c in ingest.chunk_block(text, meta):
+            chunks.append(c)
+            metas.append(meta)
+    vectors = embeddings.embed_texts(chunks)
+    store = FaissStore(dim=len(vectors[0]), persist_dir=persist_dir)
+    store.add(vectors, chunks, metas)
+    store.save()
+    return len(chunks)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=12)
+    ap.add_argument("--chunks-per-file", type=int, default=40)
+    ap.add_argument("--parse-latency", type=float, default=0.3, help="seconds per file spent in the parser")
+    ap.add_argument("--latency", type=float, default=0.05, help="stub embedding round-trip seconds")
+    args = ap.parse_args()
+
+    docs_dir = tempfile.mkdtemp()
+    files = make_files(docs_dir, args.files, args.chunks_per_file)
+    real_parse = ingest._parse_file
+
+    def slow_parse(path, doc_id):
+        # Stands in for a parser running in the process pool (parsers.parallel),
+        # which the parse threads wait on without holding the GIL.
+        time.sleep(args.parse_latency)
+        return real_parse(path, doc_id)
+
+    results = {}
+    for name, run in (("staged", staged), ("pipeline", None)):
+        # Fresh engine and no disk cache, so both runs pay for every embedding.
+        engine = EmbeddingEngine(client=StubBedrockRuntime(latency=args.latency))
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.object(embeddings, "_engine", engine), \
+                mock.patch.object(embeddings, "get_embedding_cache", lambda: None), \
+                mock.patch.object(ingest, "_parse_file", slow_parse), \
+                mock.patch.object(ingest, "get_embedding_cache", lambda: None), \
+                mock.patch.object(ingest, "FAISS_DIR", os.path.join(tmp, "idx")), \
+                mock.patch.object(ingest, "get_document", lambda *a, **k: None):
+            t0 = time.perf_counter()
+            n = run(files, os.path.join(tmp, "idx")) if run else ingest.run_ingest_pipeline(iter(files))
+            results[name] = time.perf_counter() - t0
+        print(f"{name:9} {n:5d} chunks  {results[name]:6.2f}s")
+        if run is None:
+            for st in ingest.get_ingest_stats():
+                print(f"    {st['stage']:6} in={st['items_in']:5d} busy={st['busy_s']:6.2f}s blocked={st['blocked_s']:6.2f}s")
+
+    shutil.rmtree(docs_dir)
+    parse_total = args.files * args.parse_latency
+    print(f"parse alone {parse_total:.2f}s; speedup x{results['staged'] / results['pipeline']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_language.py
+"""
+Language identification: langdetect.detect (the previous detect_lang) vs. the
+LanguageIdentifier behind nlp.language.detect_lang, on short chat queries
+and on paragraph-sized blocks in ten languages.
+
+Also reports how often the two agree and how often langdetect's answer for a
+query changes with its random seed (the old detect_lang was only stable
+because the seed is pinned).
+
+    python -m benchmarks.bench_language --repeat 20
+"""
+
+import argparse
+import time
+
+from langdetect import DetectorFactory, detect
+
+from nlp.language import detect_lang
+
+SENTENCES = {
+    "en": ["What is the battery capacity of the Galaxy S25?", "How long does it take to charge fully?",
+           "The display uses an adaptive refresh rate between 1 and 120 Hz.", "Which colors are available in Europe?"],
+    "de": ["Wie groß ist der Akku des Galaxy S25?", "Wie lange dauert eine volle Ladung?",
+           "Das Display passt die Bildwiederholrate zwischen 1 und 120 Hz an.", "Welche Farben gibt es in Europa?"],
+    "fr": ["Quelle est la capacité de la batterie du Galaxy S25 ?", "Combien de temps faut-il pour une charge complète ?",
+           "L'écran adapte sa fréquence de rafraîchissement entre 1 et 120 Hz.", "Quelles couleurs sont disponibles en Europe ?"],
+    "es": ["¿Cuál es la capacidad de la batería del Galaxy S25?", "¿Cuánto tarda en cargarse por completo?",
+           "La pantalla ajusta la frecuencia de actualización entre 1 y 120 Hz.", "¿Qué colores están disponibles en Europa?"],
+    "it": ["Qual è la capacità della batteria del Galaxy S25?", "Quanto tempo serve per una ricarica completa?",
+           "Il display regola la frequenza di aggiornamento tra 1 e 120 Hz.", "Quali colori sono disponibili in Europa?"],
+    "pt": ["Qual é a capacidade da bateria do Galaxy S25?", "Quanto tempo demora para carregar totalmente?",
+           "A tela ajusta a taxa de atualização entre 1 e 120 Hz.", "Quais cores estão disponíveis na Europa?"],
+    "ru": ["Какая емкость аккумулятора у Galaxy S25?", "Сколько времени занимает полная зарядка?",
+           "Дисплей меняет частоту обновления от 1 до 120 Гц.", "Какие цвета доступны в Европе?"],
+    "ja": ["Galaxy S25のバッテリー容量はどれくらいですか？", "フル充電にはどのくらい時間がかかりますか？",
+           "ディスプレイのリフレッシュレートは1〜120Hzで変化します。", "ヨーロッパではどの色が買えますか？"],
+    "ko": ["Galaxy S25의 배터리 용량은 얼마입니까?", "완전히 충전하는 데 얼마나 걸리나요?",
+           "디스플레이는 1~120Hz 사이에서 주사율을 조절합니다.", "유럽에서는 어떤 색상을 구입할 수 있나요?"],
+    "zh-cn": ["Galaxy S25的电池容量是多少？", "充满电需要多长时间？",
+              "显示屏的刷新率在1到120赫兹之间调节。", "欧洲有哪些颜色可以买？"],
+}
+
+
+def corpus(blocks_per_lang: int):
+    queries, blocks = [], []
+    for lang, sentences in SENTENCES.items():
+        queries += [(lang, s) for s in sentences]
+        for i in range(blocks_per_lang):
+            # Paragraph-sized blocks: the sentences in rotating order, repeated
+            rotated = sentences[i % 4:] + sentences[:i % 4]
+            blocks.append((lang, " ".join(rotated * (1 + i % 3))))
+    return queries, blocks
+
+
+def langdetect_lang(text: str) -> str:
+    try:
+        return detect(text)
+    except Exception:
+        return "en"
+
+
+def rate(fn, texts, repeat: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(texts)
+    return len(texts) * repeat / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--blocks-per-lang", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    queries, blocks = corpus(args.blocks_per_lang)
+    detect_lang("warm up")
+
+    print(f"{'texts':8} {'n':>5} {'langdetect':>12} {'detect_lang':>12} {'speedup':>8}  "
+          f"{'agree':>6} {'correct old':>11} {'correct new':>11}")
+    for name, items in (("queries", queries), ("blocks", blocks)):
+        texts = [t for _, t in items]
+        old = [langdetect_lang(t) for t in texts]
+        new = [detect_lang(t) for t in texts]
+        old_rate = rate(lambda ts: [langdetect_lang(t) for t in ts], texts, args.repeat)
+        new_rate = rate(lambda ts: [detect_lang(t) for t in ts], texts, args.repeat)
+        agree = sum(a == b for a, b in zip(old, new)) / len(texts)
+        correct_old = sum(a == lang for a, (lang, _) in zip(old, items)) / len(texts)
+        correct_new = sum(a == lang for a, (lang, _) in zip(new, items)) / len(texts)
+        print(f"{name:8} {len(texts):5d} {old_rate:8.0f}/s {new_rate:10.0f}/s "
+              f"{new_rate / old_rate:7.1f}x  {agree:6.1%} {correct_old:11.1%} {correct_new:11.1%}")
+
+    # Seed sensitivity of langdetect on the queries
+    seed = DetectorFactory.seed
+    answers = []
+    for s in range(5):
+        DetectorFactory.seed = s
+        answers.append([langdetect_lang(t) for _, t in queries])
+    DetectorFactory.seed = seed
+    unstable = sum(len(set(a)) > 1 for a in zip(*answers))
+    print(f"langdetect: {unstable}/{len(queries)} queries change language across 5 seeds; detect_lang has no seed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/bench_lexical.py
+"""
+Keyword queries on the local index: dense-only retrieval vs. dense + BM25
+fused by reciprocal rank vs. the BM25 keyword fast path.
+
+Queries are sampled from the corpus: a word with a digit ("s25ultra",
+"512gb", "fov120") that occurs in few rows, plus another word of the same
+chunk. A query hits if one of the TOP_K results contains both words.
+
+Latency per query covers what each path runs on the request: language
+detection, query translation when the words look like another language,
+the embedding call (both stubbed with --translate-latency / --embed-latency
+unless --live), FAISS and BM25 search. Hit rates of the dense and hybrid paths need real
+query embeddings, so they are only reported with --live (Bedrock credentials
+required); with the stub the dense list is noise and only BM25 / fast path
+hit rates mean anything.
+
+    python -m benchmarks.bench_lexical --queries 200 --embed-latency 0.05 [--live]
+"""
+
+import argparse
+import random
+import statistics
+import time
+from unittest import mock
+
+from benchmarks.stubs import StubBedrockRuntime, StubTranslate
+from config.settings import TOP_K
+from rag import embeddings, retriever
+from rag.embeddings import EmbeddingEngine
+from rag.index_manager import get_index_manager
+from rag.lexical import query_words, tokenize
+from rag.query_cache import get_query_cache
+
+
+def sample_queries(store, n: int, rng: random.Random):
+    segments = store.segments
+    rows = [(seg, i) for seg in segments for i in range(seg.ntotal)]
+    max_df = max(2, int(0.05 * len(rows)))
+    indexes = [seg.lexical for seg in segments]
+    queries = []
+    for _ in range(50 * n):
+        if len(queries) == n:
+            break
+        seg, i = rng.choice(rows)
+        words = [w for w in dict.fromkeys(query_words(seg.meta.get(i)[0])) if len(w) <= 20]
+        codes = [w for w in words if any(c.isdigit() for c in w) and any(c.isalpha() for c in w)
+                 and sum(ix.df(w) for ix in indexes) <= max_df]
+        others = [w for w in words if w.isalpha() and len(w) >= 4]
+        if codes and others:
+            queries.append((rng.choice(codes), rng.choice(others)))
+    return queries
+
+
+def is_hit(results, pair) -> bool:
+    return any(all(w in set(tokenize(text)) for w in pair) for text, _, _ in results)
+
+
+def timed(fn, query):
+    t0 = time.perf_counter()
+    out = fn(query)
+    return out, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--embed-latency", type=float, default=0.05)
+    ap.add_argument("--translate-latency", type=float, default=0.1)
+    ap.add_argument("--live", action="store_true", help="embed queries with Bedrock instead of the stub")
+    ap.add_argument("--seed", type=int, default=22)
+    args = ap.parse_args()
+
+    store = get_index_manager().store()
+    t0 = time.perf_counter()
+    for seg in store.segments:
+        seg.lexical
+    print(f"BM25 postings for {store.ntotal} rows ready in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    pairs = sample_queries(store, args.queries, random.Random(args.seed))
+    queries = [" ".join(p) for p in pairs]
+
+    def dense(query):
+        analysis = retriever.analyze_query(query)
+        return store.search(analysis.vector, TOP_K)
+
+    def hybrid(query):
+        return retriever.retrieve_context(query)
+
+    def fast(query):
+        results = retriever.keyword_fast_path(query)
+        return results if results is not None else retriever.retrieve_context(query)
+
+    patches = []
+    if not args.live:
+        runtime = StubBedrockRuntime(latency=args.embed_latency)
+        translate = StubTranslate(latency=args.translate_latency)
+        patches = [mock.patch.object(embeddings, "_engine", EmbeddingEngine(client=runtime)),
+                   mock.patch.object(embeddings, "get_embedding_cache", lambda: None),
+                   mock.patch.object(retriever, "translate_client", lambda: translate)]
+    for p in patches:
+        p.start()
+    try:
+        print(f"{len(queries)} keyword queries, e.g. {queries[:3]}")
+        print(f"{'path':8} {'p50':>9} {'p95':>9} {'hit@' + str(TOP_K):>7}")
+        for name, fn in (("dense", dense), ("hybrid", hybrid), ("fastpath", fast)):
+            get_query_cache().clear()
+            times, hits, fast_served, fast_hits = [], 0, 0, 0
+            for query, pair in zip(queries, pairs):
+                results, elapsed = timed(fn, query)
+                times.append(elapsed)
+                hits += is_hit(results, pair)
+                if name == "fastpath" and retriever.keyword_fast_path(query) is not None:
+                    fast_served += 1
+                    fast_hits += is_hit(results, pair)
+            times.sort()
+            rate = f"{hits / len(queries):6.1%}" if args.live else f"{'n/a':>6}"
+            extra = ""
+            if name == "fastpath":
+                extra = f"  ({fast_served} of {len(queries)} served without embedding, hit@{TOP_K} {fast_hits / max(fast_served, 1):.1%})"
+            print(f"{name:8} {statistics.median(times) * 1000:7.2f}ms {times[int(0.95 * len(times)) - 1] * 1000:7.2f}ms {rate:>7}{extra}")
+        bm25_hits = sum(is_hit(store.search_lexical(q, TOP_K), p) for q, p in zip(queries, pairs))
+        print(f"BM25 alone hit@{TOP_K}: {bm25_hits / len(queries):.1%}")
+    finally:
+        for p in patches:
+            p.stop()
+
+
+if __name__ == "__main__":
+    main()
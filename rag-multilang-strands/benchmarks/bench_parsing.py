@@ -0,0 +1,88 @@
+# benchmarks/bench_parsing.py
+"""
+PDF/DOCX parsing: sequential pdfplumber vs. the page-parallel process pool at
+several pool sizes. A long PDF is built by repeating the pages of a sample
+PDF; many small files are simulated with copies of a sample DOCX. Speedup is
+bounded by the number of cores (`os.cpu_count()` is printed).
+
+    python -m benchmarks.bench_parsing --pages 120 --workers 1,2,4,8
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from parsers.docx_parser import parse_docx_bytes
+from parsers.parallel import parse_docx_parallel, parse_pdf_parallel
+from parsers.pdf_parser import parse_pdf_bytes
+
+SAMPLE_PDF = "data/docs/uploads/Samsung_Galaxy_S25_specifictions.pdf"
+SAMPLE_DOCX = "data/docs/uploads/Business_Requirements_Document.docx"
+
+
+def build_pdf(src: str, pages: int, dest: str):
+    reader = PdfReader(src)
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    with open(dest, "wb") as fh:
+        writer.write(fh)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=120)
+    ap.add_argument("--docx-files", type=int, default=16)
+    ap.add_argument("--workers", default="1,2,4,8")
+    ap.add_argument("--pages-per-task", type=int, default=8)
+    args = ap.parse_args()
+    print(f"cpu_count={os.cpu_count()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "manual.pdf")
+        build_pdf(SAMPLE_PDF, args.pages, pdf_path)
+        with open(pdf_path, "rb") as fh:
+            pdf_bytes = fh.read()
+        docx_paths = []
+        for i in range(args.docx_files):
+            docx_paths.append(os.path.join(tmp, f"doc{i}.docx"))
+            shutil.copy(SAMPLE_DOCX, docx_paths[-1])
+
+        t0 = time.perf_counter()
+        reference = parse_pdf_bytes(pdf_bytes, pdf_path)
+        pdf_serial = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        docx_reference = []
+        for p in docx_paths:
+            with open(p, "rb") as fh:
+                docx_reference.append(parse_docx_bytes(fh.read(), p))
+        docx_serial = time.perf_counter() - t0
+        print(f"sequential   pdf {args.pages} pages {pdf_serial:6.2f}s   {args.docx_files} docx {docx_serial:6.2f}s")
+
+        for n in [int(x) for x in args.workers.split(",")]:
+            with ProcessPoolExecutor(max_workers=n, mp_context=multiprocessing.get_context("spawn")) as pool:
+                # Warm the workers so interpreter start-up is not measured
+                list(pool.map(abs, range(n)))
+                t0 = time.perf_counter()
+                blocks = parse_pdf_parallel(pdf_path, pdf_path, pool=pool, per_task=args.pages_per_task)
+                pdf_s = time.perf_counter() - t0
+                assert blocks == reference, "parallel parse must match sequential output"
+                t0 = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=n) as threads:
+                    docx_blocks = list(threads.map(lambda p: parse_docx_parallel(p, p, pool=pool), docx_paths))
+                docx_s = time.perf_counter() - t0
+                assert docx_blocks == docx_reference
+            print(
+                f"processes={n:<3} pdf {pdf_s:6.2f}s (x{pdf_serial / pdf_s:4.1f})   "
+                f"docx {docx_s:6.2f}s (x{docx_serial / docx_s:4.1f})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/bench_prompt.py
+"""
+Converse input tokens per question: the prompt as the agent sent it before
+(SYSTEM_PROMPT as the system block and again at the top of the user message,
+every retrieved row in full, a table both as translated flat text and as
+HTML) vs. nlp.prompts.build_prompt (rules and handoff message once, in a
+system block that PROMPT_CACHE marks for the prompt cache; rows deduplicated;
+tables once, as HTML; context cut to PROMPT_MAX_TOKENS lowest-ranked first).
+
+Questions are the first words of random rows of the local index, and the
+context is the --fetch best dense rows for the row's stored vector. With
+--from-docs the rows are the chunks of the documents under DATA_DIR (tables
+included) ranked by BM25 instead. Snippets are "translated" by the stub
+(nothing leaves the machine); token counts are rag.chunking estimates.
+
+Reports input tokens (mean / p95 / max), prompts over the budget, context
+items dropped, and the share of the input that is the cacheable system
+prefix. Bedrock only caches a prefix of at least the model's minimum
+(1,024 tokens on Claude Sonnet), so the cache point may not take effect.
+
+    python -m benchmarks.bench_prompt --queries 300 --fetch 8 [--from-docs] [--max-tokens 6000]
+"""
+
+import argparse
+import random
+import statistics
+from unittest import mock
+
+from benchmarks.bench_chat_batch import sample_questions
+from benchmarks.bench_chunking import load_blocks
+from benchmarks.stubs import StubTranslate
+from config.settings import DATA_DIR, PROMPT_MAX_TOKENS
+from nlp.prompts import SYSTEM_PROMPT, build_prompt
+from rag import ingest, retriever, translation
+from rag.chunking import count_tokens
+from rag.index_manager import get_index_manager
+from rag.lexical import LexicalIndex, search_lexical
+
+HANDOFF = "We are connecting you to our human agent who can assist you further. Please stay tuned."
+
+
+class DocSegment:
+    """Chunks of DATA_DIR with their block metadata, searchable by rag.lexical.search_lexical."""
+
+    name = "bench"
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.lexical = LexicalIndex.build(text for text, _ in chunks)
+        self.meta = self
+
+    def get(self, i):
+        return self.chunks[i]
+
+
+def legacy_context(results) -> dict:
+    # rag.retriever.format_context_snippets before prompt assembly: every row, tables twice
+    blocks, tables = [], []
+    for txt, meta, _ in results:
+        if txt.strip():
+            blocks.append(f"[source: {meta.get('source')}] {txt.upper()}")
+        if "table_html" in meta:
+            if "plain_text" in meta:
+                blocks.append(f"[table: {meta.get('source')}] {meta['plain_text'].upper()}")
+            tables.append(meta["table_html"])
+    return {"ctx_text": "\n\n".join(blocks), "tables": tables, "images": []}
+
+
+def legacy_tokens(user_query: str, context: dict) -> int:
+    # The former build_rag_prompt, plus SYSTEM_PROMPT sent again as the system block
+    parts = [SYSTEM_PROMPT.strip(), f"\n[QUESTION]\n{user_query}", f"\n[HANDOFF_MESSAGE]\n{HANDOFF}", "\n[CONTEXT_TEXT]",
+             context["ctx_text"] or "NO_TEXT_AVAILABLE"]
+    if context["tables"]:
+        parts.append("\n[CONTEXT_TABLES]")
+        for t in context["tables"]:
+            parts.extend(["--TABLE-START--", t, "--TABLE-END--"])
+    parts.append("\n[INSTRUCTIONS]\n- Use ONLY the CONTEXT to answer.\n- If the CONTEXT lacks the answer, output exactly "
+                 "the HANDOFF_MESSAGE above and nothing else.\n- If deriving an answer from a table, return valid HTML table markup only.")
+    return count_tokens(SYSTEM_PROMPT) + count_tokens("\n".join(parts))
+
+
+def index_cases(n: int, fetch: int, rng: random.Random):
+    store = get_index_manager().store()
+    questions, vectors = sample_questions(store, n, rng)
+    return [(q, store.search(vectors[q.upper()], fetch)) for q in questions]
+
+
+def doc_cases(n: int, fetch: int, rng: random.Random):
+    chunks = [(c, dict(meta)) for text, meta in load_blocks() for c in ingest.chunk_block(text, meta)]
+    segment = DocSegment(chunks)
+    picked = [rng.randrange(len(chunks)) for _ in range(n)]
+    questions = [" ".join(chunks[i][0].split()[:10]) + "?" for i in picked]
+    return [(q, search_lexical([segment], q, fetch)) for q in questions]
+
+
+def summary(values) -> str:
+    values = sorted(values)
+    return f"{statistics.mean(values):7.0f} {values[int(0.95 * len(values)) - 1]:6d} {values[-1]:6d}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--fetch", type=int, default=8, help="context rows per question")
+    ap.add_argument("--max-tokens", type=int, default=PROMPT_MAX_TOKENS)
+    ap.add_argument("--from-docs", action="store_true", help="chunks of DATA_DIR ranked by BM25 instead of the local index")
+    ap.add_argument("--seed", type=int, default=25)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = doc_cases(args.queries, args.fetch, rng) if args.from_docs else index_cases(args.queries, args.fetch, rng)
+    translate = StubTranslate(latency=0)
+    rows = tables = 0
+    old, new, system_share = [], [], []
+    kept = dropped = over_old = over_new = 0
+    with mock.patch.object(translation, "translate_client", lambda: translate):
+        for question, results in cases:
+            rows += len(results)
+            tables += sum("table_html" in m for _, m, _ in results)
+            old.append(legacy_tokens(question, legacy_context(results)))
+            prompt = build_prompt(question, retriever.format_context_snippets(results, "de"), HANDOFF, args.max_tokens)
+            new.append(prompt.tokens)
+            system_share.append(prompt.system_tokens / prompt.tokens)
+            kept += prompt.items
+            dropped += prompt.dropped
+            over_old += args.max_tokens > 0 and old[-1] > args.max_tokens
+            over_new += args.max_tokens > 0 and prompt.tokens > args.max_tokens
+
+    source = DATA_DIR if args.from_docs else "the local index"
+    print(f"{len(cases)} questions over {source}, {rows / len(cases):.1f} rows each ({tables} table rows), "
+          f"budget {args.max_tokens} tokens")
+    print(f"{'prompt':8} {'mean':>7} {'p95':>6} {'max':>6} {'over':>5}")
+    print(f"{'before':8} {summary(old)} {over_old:5d}")
+    print(f"{'budgeted':8} {summary(new)} {over_new:5d}")
+    print(f"input tokens x{sum(new) / sum(old):.2f} ({1 - sum(new) / sum(old):.1%} fewer), "
+          f"{kept / len(cases):.1f} distinct context items kept per prompt, {dropped} dropped for the budget")
+    system_tokens = build_prompt("", {}, HANDOFF).system_tokens
+    print(f"cacheable system prefix ~{system_tokens} tokens, {statistics.mean(system_share):.1%} of the input on average"
+          f"{'' if system_tokens >= 1024 else ' (under the 1,024-token minimum for caching on Claude Sonnet)'}")
+
+
+if __name__ == "__main__":
+    main()
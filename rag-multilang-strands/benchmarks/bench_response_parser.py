@@ -0,0 +1,81 @@
+# benchmarks/bench_response_parser.py
+"""
+Response parsing: the multi-pass regex parser (api.response_parser_regex) vs.
+the single-pass incremental parser (api.response_parser), on answers built
+from the test_response_parsing.py cases at several sizes.
+
+"whole" parses the finished answer once. "stream" parses a streamed answer
+after every delta of --delta characters: the regex parser has to re-parse
+everything received so far each time, the incremental one is fed the delta.
+
+    python -m benchmarks.bench_response_parser --sizes 2,16,128 --delta 8
+"""
+
+import argparse
+import time
+
+from api import response_parser as new
+from api import response_parser_regex as old
+from test_response_parsing import test_response_1, test_response_2, test_response_3
+
+
+def make_response(kib: int) -> str:
+    parts = []
+    size = 0
+    cases = (test_response_1, test_response_2, test_response_3)
+    while size < kib * 1024:
+        parts.append(cases[len(parts) % 3])
+        size += len(parts[-1]) + 2
+    return "\n\n".join(parts)
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def stream_regex(text: str, delta: int):
+    for end in range(delta, len(text) + delta, delta):
+        old.parse_response_for_rendering(text[:end])
+
+
+def stream_incremental(text: str, delta: int):
+    parser = new.ResponseParser()
+    for start in range(0, len(text), delta):
+        parser.feed(text[start:start + delta])
+    parser.close()
+    return parser.blocks
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="2,16,128", help="answer sizes in KiB")
+    ap.add_argument("--delta", type=int, default=8, help="characters per streamed delta")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--max-stream-kib", type=int, default=16, help="skip the quadratic regex stream run above this size")
+    args = ap.parse_args()
+
+    print(f"{'size':>8} {'whole regex':>12} {'whole new':>10} {'x':>5}   {'stream regex':>13} {'stream new':>11} {'x':>6}")
+    for kib in [int(s) for s in args.sizes.split(",")]:
+        text = make_response(kib)
+        assert new.parse_response_for_rendering(text) == old.parse_response_for_rendering(text)
+        assert stream_incremental(text, args.delta) == old.parse_response_for_rendering(text)
+        whole_old = best_of(lambda: old.parse_response_for_rendering(text), args.repeat)
+        whole_new = best_of(lambda: new.parse_response_for_rendering(text), args.repeat)
+        stream_new = best_of(lambda: stream_incremental(text, args.delta), args.repeat)
+        if kib <= args.max_stream_kib:
+            stream_old = best_of(lambda: stream_regex(text, args.delta), 1)
+            stream_cols = f"{stream_old * 1000:11.1f}ms {stream_new * 1000:9.2f}ms {stream_old / stream_new:5.0f}x"
+        else:
+            stream_cols = f"{'-':>13} {stream_new * 1000:9.2f}ms {'-':>6}"
+        print(
+            f"{kib:6d}Ki {whole_old * 1000:10.2f}ms {whole_new * 1000:8.2f}ms {whole_old / whole_new:4.1f}x   {stream_cols}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_translation.py
+"""
+Context-formatting latency: the old per-fragment snippet translation vs. the
+masked single-call, concurrent path, on the TOP_K nearest chunks of the local
+index, against a stubbed Translate client.
+
+    python -m benchmarks.bench_translation --latency 0.1 --top-k 4
+"""
+
+import argparse
+import re
+import time
+from unittest import mock
+
+from benchmarks.stubs import StubTranslate
+from rag import retriever, translation
+from rag.vectorstore_faiss import FaissStore
+from config.settings import FAISS_DIR
+
+
+def fragment_translate(client, text, source_lang, target_lang):
+    # The pre-engine implementation: one Translate call per text fragment between numbers.
+    parts = re.split(r'(\d+(?:\.\d+)?|\$\d+(?:\.\d+)?|\d+\$)', text)
+    out = []
+    for part in parts:
+        if re.match(r'\d+(?:\.\d+)?|\$\d+(?:\.\d+)?|\d+\$', part) or not part.strip():
+            out.append(part)
+        else:
+            out.append(client.translate_text(Text=part, SourceLanguageCode=source_lang, TargetLanguageCode=target_lang)["TranslatedText"])
+    return "".join(out)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--latency", type=float, default=0.1)
+    ap.add_argument("--top-k", type=int, default=4)
+    ap.add_argument("--queries", type=int, default=5)
+    args = ap.parse_args()
+
+    store = FaissStore(dim=1024, persist_dir=FAISS_DIR)
+    corpus = store.segments[0]
+    result_sets = []
+    for q in range(args.queries):
+        vec = corpus.index.reconstruct((q * 97) % corpus.ntotal)
+        result_sets.append(store.search(vec, args.top_k))
+
+    stub = StubTranslate(latency=args.latency)
+    t0 = time.perf_counter()
+    for results in result_sets:
+        for txt, meta, _ in results:
+            if txt.strip():
+                fragment_translate(stub, txt, meta.get("lang", "en"), "de")
+            if "table_html" in meta and "plain_text" in meta:
+                fragment_translate(stub, meta["plain_text"], meta.get("lang", "en"), "de")
+    old_s = time.perf_counter() - t0
+    print(f"per-fragment   {old_s / args.queries:6.2f}s/query  {stub.calls / args.queries:6.1f} calls/query")
+
+    stub = StubTranslate(latency=args.latency)
+    translation.get_translation_cache().clear()
+    with mock.patch.object(translation, "translate_client", lambda: stub):
+        t0 = time.perf_counter()
+        for results in result_sets:
+            retriever.format_context_snippets(results, "de")
+        new_s = time.perf_counter() - t0
+        print(f"masked+conc.   {new_s / args.queries:6.2f}s/query  {stub.calls / args.queries:6.1f} calls/query  speedup x{old_s / new_s:.1f}")
+
+        t0 = time.perf_counter()
+        for results in result_sets:
+            retriever.format_context_snippets(results, "de")
+        warm_s = time.perf_counter() - t0
+        print(f"cached         {warm_s / args.queries:6.3f}s/query")
+
+
+if __name__ == "__main__":
+    main()
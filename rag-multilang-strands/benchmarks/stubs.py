@@ -0,0 +1,156 @@
+# benchmarks/stubs.py
+"""
+In-process stand-ins for the AWS clients used by the app. They mimic the
+response shapes of boto3's bedrock-runtime / translate clients, add a fixed
+round-trip latency and optionally throttle above a concurrency capacity, so
+benchmarks measure our client-side behaviour without touching AWS.
+"""
+
+import hashlib
+import io
+import json
+import threading
+import time
+from typing import List
+
+import numpy as np
+from botocore.exceptions import ClientError
+
+
+STUB_ANSWER = (
+    "The Galaxy S25 has a 4000 mAh battery.\n\n"
+    "<table><tr><th>Model</th><th>Battery</th></tr><tr><td>Galaxy S25</td><td>4000 mAh</td></tr></table>"
+)
+
+
+def fake_embedding(text: str, dimensions: int = 1024) -> List[float]:
+    """Deterministic unit vector derived from the text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dimensions).astype("float32")
+    v /= np.linalg.norm(v)
+    return v.tolist()
+
+
+class _Capacity:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def enter(self, operation: str):
+        with self._lock:
+            self.calls += 1
+            if self.capacity and self.in_flight >= self.capacity:
+                self.throttled += 1
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, operation)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class StubBedrockRuntime:
+    """
+    invoke_model (Titan embeddings) with `latency` seconds per call and converse
+    taking `converse_latency` seconds; converse_stream sends its first token after
+    `first_token_latency` and the rest spread over the remaining time. capacity 0 = unlimited.
+    """
+
+    def __init__(self, latency: float = 0.05, capacity: int = 0, dimensions: int = 1024,
+                 converse_latency: float = 1.0, first_token_latency: float = 0.3):
+        self.latency = latency
+        self.converse_latency = converse_latency
+        self.first_token_latency = first_token_latency
+        self.dimensions = dimensions
+        self.capacity = _Capacity(capacity)
+        self._cached_prefixes = set()
+
+    @property
+    def calls(self) -> int:
+        return self.capacity.calls
+
+    def invoke_model(self, modelId: str, body: str, accept: str = None, contentType: str = None):
+        self.capacity.enter("InvokeModel")
+        try:
+            time.sleep(self.latency)
+            req = json.loads(body)
+            vec = fake_embedding(req["inputText"], req.get("dimensions", self.dimensions))
+            return {"body": io.BytesIO(json.dumps({"embedding": vec}).encode("utf-8"))}
+        finally:
+            self.capacity.leave()
+
+    def _usage(self, messages: list, system: list, output_tokens: int) -> dict:
+        # About 4 characters per token. A system block followed by a cachePoint is
+        # written to the cache the first time and read from it afterwards.
+        system = system or []
+        prefix = "".join(block.get("text", "") for block in system)
+        prefix_tokens = len(prefix) // 4
+        usage = {"inputTokens": len(json.dumps(messages)) // 4 + prefix_tokens, "outputTokens": output_tokens}
+        if any("cachePoint" in block for block in system):
+            usage["inputTokens"] -= prefix_tokens
+            key = "cacheReadInputTokens" if prefix in self._cached_prefixes else "cacheWriteInputTokens"
+            usage[key] = prefix_tokens
+            self._cached_prefixes.add(prefix)
+        return usage
+
+    def converse(self, modelId: str, messages: list, system: list = None, inferenceConfig: dict = None, **kwargs):
+        self.capacity.enter("Converse")
+        try:
+            time.sleep(self.converse_latency)
+            return {
+                "output": {"message": {"role": "assistant", "content": [{"text": STUB_ANSWER}]}},
+                "stopReason": "end_turn",
+                "usage": self._usage(messages, system, len(STUB_ANSWER) // 4),
+            }
+        finally:
+            self.capacity.leave()
+
+    def converse_stream(self, modelId: str, messages: list, system: list = None, inferenceConfig: dict = None, **kwargs):
+        self.capacity.enter("ConverseStream")
+        tokens = [STUB_ANSWER[i:i + 8] for i in range(0, len(STUB_ANSWER), 8)]
+        gap = max(0.0, self.converse_latency - self.first_token_latency) / max(1, len(tokens) - 1)
+
+        def _events():
+            try:
+                yield {"messageStart": {"role": "assistant"}}
+                time.sleep(self.first_token_latency)
+                for i, tok in enumerate(tokens):
+                    if i:
+                        time.sleep(gap)
+                    yield {"contentBlockDelta": {"delta": {"text": tok}, "contentBlockIndex": 0}}
+                yield {"contentBlockStop": {"contentBlockIndex": 0}}
+                yield {"messageStop": {"stopReason": "end_turn"}}
+                yield {"metadata": {"usage": self._usage(messages, system, len(tokens))}}
+            finally:
+                self.capacity.leave()
+
+        return {"stream": _events()}
+
+
+class StubTranslate:
+    """translate_text with `latency` seconds per call; 'translates' by upper-casing."""
+
+    def __init__(self, latency: float = 0.1, capacity: int = 0):
+        self.latency = latency
+        self.capacity = _Capacity(capacity)
+
+    @property
+    def calls(self) -> int:
+        return self.capacity.calls
+
+    def translate_text(self, Text: str, SourceLanguageCode: str, TargetLanguageCode: str, **kwargs):
+        self.capacity.enter("TranslateText")
+        try:
+            time.sleep(self.latency)
+            return {
+                "TranslatedText": Text.upper(),
+                "SourceLanguageCode": SourceLanguageCode,
+                "TargetLanguageCode": TargetLanguageCode,
+            }
+        finally:
+            self.capacity.leave()
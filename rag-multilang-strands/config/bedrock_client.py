@@ -1,37 +1,159 @@
 
-import boto3
+# config/bedrock_client.py
+"""
+Shared boto3 clients.
+
+Configuration (.env, region, credentials) is resolved once per process and
+each service gets one client, built on first use and shared by every thread
+(boto3 clients are thread-safe; sessions are not, so creation is locked). A
+client keeps up to AWS_MAX_POOL_CONNECTIONS pooled keep-alive connections, so
+embedding batches, query / snippet translations and converse calls reuse TLS
+connections instead of resolving endpoints and handshaking per call.
+
+Clients retry with botocore's AWS_RETRY_MODE / AWS_MAX_ATTEMPTS, except the
+one `embedding_runtime` returns: the embedding engine retries throttled calls
+itself and shrinks its concurrency on them, so botocore must pass the first
+ThrottlingException through.
+
+Keys from the environment or .env are wrapped in refreshable credentials that
+are re-read every AWS_CREDENTIALS_REFRESH seconds, so rotated keys are picked
+up without rebuilding clients. Without keys, boto3's default chain is used,
+whose role / SSO / instance providers refresh on their own.
+"""
+
+import datetime
 import os
-from dotenv import load_dotenv
-from config.settings import AWS_REGION
+import threading
+from typing import Dict, Optional
+
+import boto3
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+from dotenv import dotenv_values, load_dotenv
+
+from config.settings import (
+    AWS_CONNECT_TIMEOUT,
+    AWS_CREDENTIALS_REFRESH,
+    AWS_MAX_ATTEMPTS,
+    AWS_MAX_POOL_CONNECTIONS,
+    AWS_READ_TIMEOUT,
+    AWS_REGION,
+    AWS_RETRY_MODE,
+)
+
+_CREDENTIAL_VARS = ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN")
+
+
+class _EnvCredentialProvider(CredentialProvider):
+    """Keys from the process environment or .env, re-read every `refresh_interval` seconds."""
+
+    METHOD = "env-refreshing"
+    CANONICAL_NAME = "Environment"
+
+    def __init__(self, process_vars, refresh_interval: float):
+        super().__init__()
+        # Variables set before .env was loaded keep precedence over the file
+        self._process_vars = set(process_vars)
+        self._refresh_interval = refresh_interval
+        self._last: Optional[dict] = None
+
+    def _read(self) -> Optional[dict]:
+        file_values = dotenv_values()
+        values = {}
+        for var in _CREDENTIAL_VARS:
+            values[var] = os.getenv(var) if var in self._process_vars else (file_values.get(var) or os.getenv(var))
+        if not (values["AWS_ACCESS_KEY_ID"] and values["AWS_SECRET_ACCESS_KEY"]):
+            return None
+        return {
+            "access_key": values["AWS_ACCESS_KEY_ID"],
+            "secret_key": values["AWS_SECRET_ACCESS_KEY"],
+            "token": values["AWS_SESSION_TOKEN"] or None,
+            "expiry_time": self._expiry(),
+        }
+
+    def _expiry(self) -> str:
+        expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=self._refresh_interval)
+        return expiry.isoformat()
+
+    def _refresh(self) -> dict:
+        metadata = self._read()
+        if metadata is None:
+            # Keys removed meanwhile: keep signing with the last ones
+            print("[WARNING] AWS credentials disappeared from the environment; keeping the previous ones")
+            metadata = dict(self._last, expiry_time=self._expiry())
+        self._last = metadata
+        return metadata
+
+    def load(self) -> Optional[RefreshableCredentials]:
+        metadata = self._read()
+        if metadata is None:
+            return None
+        self._last = metadata
+        # Refresh exactly at expiry, not botocore's default 15 / 10 minutes before it
+        return RefreshableCredentials.create_from_metadata(
+            metadata, refresh_using=self._refresh, method=self.METHOD, advisory_timeout=0, mandatory_timeout=0
+        )
+
+
+class ClientProvider:
+    def __init__(self):
+        process_vars = [v for v in _CREDENTIAL_VARS if v in os.environ]
+        load_dotenv()
+        self.region = os.getenv("AWS_DEFAULT_REGION", AWS_REGION)
+        self.config = Config(
+            region_name=self.region,
+            max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+            connect_timeout=AWS_CONNECT_TIMEOUT,
+            read_timeout=AWS_READ_TIMEOUT,
+            retries={"mode": AWS_RETRY_MODE, "total_max_attempts": AWS_MAX_ATTEMPTS},
+            tcp_keepalive=True,
+        )
+        core = botocore.session.get_session()
+        if AWS_CREDENTIALS_REFRESH > 0:
+            core.get_component("credential_provider").insert_before(
+                "env", _EnvCredentialProvider(process_vars, AWS_CREDENTIALS_REFRESH)
+            )
+        self._session = boto3.Session(botocore_session=core, region_name=self.region)
+        self._clients: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def client(self, service: str, retries: bool = True):
+        """Shared client for `service`; with `retries=False`, one without botocore retries (single attempt)."""
+        key = service if retries else f"{service}:no-retries"
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    config = self.config
+                    if not retries:
+                        config = config.merge(Config(retries={"mode": AWS_RETRY_MODE, "total_max_attempts": 1}))
+                    client = self._clients[key] = self._session.client(service, config=config)
+        return client
+
+
+_provider: Optional[ClientProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_client_provider() -> ClientProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = ClientProvider()
+    return _provider
+
 
 def bedrock_runtime():
-    load_dotenv()
-    aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    aws_session_token = os.getenv("AWS_SESSION_TOKEN")
-    region = os.getenv("AWS_DEFAULT_REGION", AWS_REGION)
+    return get_client_provider().client("bedrock-runtime")
+
 
-    session_args = {"region_name": region}
-    if aws_access_key and aws_secret_key:
-        session_args["aws_access_key_id"] = aws_access_key
-        session_args["aws_secret_access_key"] = aws_secret_key
-        if aws_session_token:
-            session_args["aws_session_token"] = aws_session_token
+def embedding_runtime():
+    # Throttles reach rag.embeddings' limiter, which retries and backs off
+    return get_client_provider().client("bedrock-runtime", retries=False)
 
-    return boto3.client("bedrock-runtime", **session_args)
 
 def translate_client():
-    load_dotenv()
-    aws_access_key = os.getenv("AWS_ACCESS_KEY_ID")
-    aws_secret_key = os.getenv("AWS_SECRET_ACCESS_KEY")
-    aws_session_token = os.getenv("AWS_SESSION_TOKEN")
-    region = os.getenv("AWS_DEFAULT_REGION", AWS_REGION)
-
-    session_args = {"region_name": region}
-    if aws_access_key and aws_secret_key:
-        session_args["aws_access_key_id"] = aws_access_key
-        session_args["aws_secret_access_key"] = aws_secret_key
-        if aws_session_token:
-            session_args["aws_session_token"] = aws_session_token
-
-    return boto3.client("translate", **session_args)
+    return get_client_provider().client("translate")
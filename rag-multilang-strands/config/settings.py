@@ -2,6 +2,17 @@ import os
 
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 
+# Shared boto3 clients (config.bedrock_client): pooled connections per client,
+# timeouts, botocore retry mode / attempts (not for embeddings, which retry
+# throttles themselves, see EMBED_MAX_RETRIES), and how often keys from the
+# environment or .env are re-read (0 = read once).
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", "128"))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "10"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "120"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "standard")
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "3"))
+AWS_CREDENTIALS_REFRESH = float(os.getenv("AWS_CREDENTIALS_REFRESH", "300"))
+
 # Choose your LLM model (ensure access in Bedrock for your region)
 LLM_MODEL_ID = os.getenv("LLM_MODEL_ID", "anthropic.claude-3-5-sonnet-20240620-v1:0")
 
@@ -12,4 +23,143 @@ DATA_DIR = os.getenv("DATA_DIR", "data/docs")
 FAISS_DIR = os.getenv("FAISS_DIR", "storage/faiss_index")
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "800"))
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "100"))
+
+# Ingest chunking (rag.chunking): whole sentences packed up to CHUNK_MAX_TOKENS
+# estimated tokens, about CHUNK_OVERLAP_TOKENS of whole sentences repeated
+# between neighbours, and a last chunk with fewer than CHUNK_MIN_TOKENS new
+# tokens merged into the one before. EMBED_MAX_TOKENS is the embedding model's
+# input limit (Titan v2: 8192); no chunk exceeds it. CHUNK_SIZE / CHUNK_OVERLAP
+# are the character windows of the older rag.utils.chunk_text.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "48"))
+EMBED_MAX_TOKENS = int(os.getenv("EMBED_MAX_TOKENS", "8192"))
 TOP_K = int(os.getenv("TOP_K", "4"))
+
+# Seconds between checks of the published index generation by the long-lived
+# index manager (rag.index_manager). New snapshots load in the background.
+INDEX_RELOAD_INTERVAL = float(os.getenv("INDEX_RELOAD_INTERVAL", "2.0"))
+
+# Embedding engine: max concurrent Bedrock invoke_model calls and retries per
+# text on throttling (the engine halves its concurrency when throttled).
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "8"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+
+# On-disk embedding cache keyed by (text, model, dims, normalize); set the path
+# to an empty string to disable it. Least recently used rows are evicted above
+# EMBED_CACHE_MAX_ENTRIES. A hit refreshes a row's last-used time only when it
+# is older than EMBED_CACHE_TOUCH_INTERVAL seconds, so most hits write nothing.
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "storage/embed_cache.sqlite")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "500000"))
+EMBED_CACHE_TOUCH_INTERVAL = float(os.getenv("EMBED_CACHE_TOUCH_INTERVAL", "3600"))
+
+# Query-path cache: normalized query -> (language, English translation, query vector)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+
+# Semantic answer cache (rag.answer_cache): a chat whose query vector has cosine
+# similarity >= ANSWER_CACHE_THRESHOLD to one answered before, in the same
+# language and index generation, gets the stored answer. 0 entries disables it.
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "5000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+# Language identification (nlp.language): text with fewer than LANG_MIN_LETTERS
+# Latin letters is LANG_DEFAULT; below LANG_SHORT_TEXT_LETTERS letters only the
+# LANG_SHORT_TEXT_LANGS compete (empty: all), and text that is mostly product
+# names must score LANG_SHORT_TEXT_MARGIN nats per n-gram above LANG_DEFAULT.
+LANG_DEFAULT = os.getenv("LANG_DEFAULT", "en")
+LANG_MIN_LETTERS = int(os.getenv("LANG_MIN_LETTERS", "3"))
+LANG_SHORT_TEXT_LETTERS = int(os.getenv("LANG_SHORT_TEXT_LETTERS", "20"))
+LANG_SHORT_TEXT_LANGS = [l.strip() for l in os.getenv("LANG_SHORT_TEXT_LANGS", "en,de,fr,es,it,pt").split(",") if l.strip()]
+LANG_SHORT_TEXT_MARGIN = float(os.getenv("LANG_SHORT_TEXT_MARGIN", "0.3"))
+
+# Context snippet translation: concurrent Translate calls per request and a cache
+# of translated snippets keyed by (snippet id, source lang, target lang).
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "8"))
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "20000"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", "86400"))
+
+# Async chat pipeline (agent.strands_agent.answer_async): chats admitted at once
+# per worker (the rest wait on the event loop, holding no thread), and threads
+# running the blocking AWS / FAISS calls for all of them.
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "256"))
+CHAT_EXECUTOR_WORKERS = int(os.getenv("CHAT_EXECUTOR_WORKERS", "128"))
+
+# Batch chat (agent.strands_agent.answer_batch, POST /chat/batch): most queries
+# accepted per batch, and how many of a batch's answers are generated at once
+# (each also takes a CHAT_MAX_CONCURRENCY slot while it does).
+CHAT_BATCH_MAX_QUERIES = int(os.getenv("CHAT_BATCH_MAX_QUERIES", "100"))
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "16"))
+
+# Prompt assembly (nlp.prompts.build_prompt): estimated input tokens per converse
+# request (system prefix, question and context); the lowest-ranked context is
+# left out to stay within it (0 = no limit). PROMPT_CACHE=1 puts a converse
+# cachePoint after the static system prefix; a model that rejects it gets
+# prompts without one from then on. Off by default: not every LLM_MODEL_ID
+# supports prompt caching, and Bedrock only caches prefixes above the model's
+# minimum (1,024 tokens for Claude Sonnet models), which the current system
+# prompt (~440 tokens) does not reach.
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "6000"))
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "0").lower() in ("1", "true", "yes")
+
+# Comma-separated language codes to pre-translate chunks into at ingest time
+# (e.g. "de,fr,ja"). Retrieval uses the stored translation and only falls back
+# to live translation for other languages. Empty disables the stage.
+PRETRANSLATE_LANGS = [l.strip() for l in os.getenv("PRETRANSLATE_LANGS", "").split(",") if l.strip()]
+
+# Segmented index persistence: each save writes a new segment; once there are
+# more than SEGMENT_MAX_COUNT, the SEGMENT_MERGE_FACTOR smallest are merged in
+# the background. Replaced segments are deleted after SEGMENT_RETIRE_GRACE seconds.
+SEGMENT_MAX_COUNT = int(os.getenv("SEGMENT_MAX_COUNT", "8"))
+SEGMENT_MERGE_FACTOR = int(os.getenv("SEGMENT_MERGE_FACTOR", "4"))
+SEGMENT_RETIRE_GRACE = float(os.getenv("SEGMENT_RETIRE_GRACE", "60"))
+# A segment is rewritten without its deleted/replaced rows once this fraction
+# of it is tombstoned.
+SEGMENT_TOMBSTONE_RATIO = float(os.getenv("SEGMENT_TOMBSTONE_RATIO", "0.2"))
+
+# Vector index structure per segment: flat | hnsw | ivf_flat | ivf_pq | binary |
+# binary_hnsw (see rag.index_factory). Segments below ANN_MIN_ROWS vectors always use flat.
+INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "5000"))
+INDEX_TRAIN_SAMPLE = int(os.getenv("INDEX_TRAIN_SAMPLE", "50000"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = ~4*sqrt(n)
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "64"))
+PQ_NBITS = int(os.getenv("PQ_NBITS", "8"))
+
+# Hybrid retrieval (rag.lexical): the dense and BM25 lists, HYBRID_FETCH_K rows
+# each, are fused by reciprocal rank with constant RRF_K (HYBRID_FETCH_K=0 keeps
+# dense-only search). Queries of at most KEYWORD_MAX_WORDS words, one with a
+# digit, all in the index vocabulary, are answered from BM25 alone (no
+# translation or embedding) if the best row covers KEYWORD_MIN_COVERAGE of the
+# query terms (KEYWORD_MAX_WORDS=0 disables this fast path).
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+KEYWORD_MAX_WORDS = int(os.getenv("KEYWORD_MAX_WORDS", "6"))
+KEYWORD_MIN_COVERAGE = float(os.getenv("KEYWORD_MIN_COVERAGE", "0.8"))
+
+# Binary indexes fetch TOP_K * BINARY_RERANK_FACTOR Hamming candidates and
+# re-rank them by exact inner product.
+BINARY_RERANK_FACTOR = int(os.getenv("BINARY_RERANK_FACTOR", "10"))
+
+# Ingest pipeline (rag.ingest.run_ingest_pipeline): bounded queue size between
+# stages, parser threads, chunks per embedding batch and concurrent batches.
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", "4"))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "32"))
+INGEST_EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+# Uploads are streamed to disk (and hashed) in pieces of this many bytes.
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Upload jobs (rag.jobs): concurrent ingest jobs, and how many to remember.
+INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", "1"))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))
+
+# PDF/DOCX parsing in a process pool (parsers.parallel): PARSE_PROCESSES
+# workers (0 = one per CPU, 1 = parse in-process), PDFs split into tasks of
+# PARSE_PAGES_PER_TASK pages.
+PARSE_PROCESSES = int(os.getenv("PARSE_PROCESSES", "0"))
+PARSE_PAGES_PER_TASK = int(os.getenv("PARSE_PAGES_PER_TASK", "8"))
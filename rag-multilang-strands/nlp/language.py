@@ -1,8 +1,214 @@
-from langdetect import detect, DetectorFactory
+
+# nlp/language.py
+"""
+Language identification for queries and ingested blocks.
+
+langdetect's `detect` samples random n-grams of the text in 7 trials of up to
+1000 Bayesian updates each, which costs milliseconds per call and flips
+between languages on short text unless the seed is pinned. `LanguageIdentifier`
+keeps langdetect's profiles (loaded once, at import) but scores every 1-3 gram
+of the text at once: the profiles become a float32 matrix of
+log(p(ngram | lang) + smoothing) and a text's score is the sum of its n-gram
+rows, the deterministic expectation of langdetect's random walk. Text
+extraction follows langdetect's rules (URL/e-mail removal, character
+normalization, dropping all-caps words and Latin runs in non-Latin text) with
+the n-grams of each word memoized.
+
+Short text gets two heuristics on top:
+- a dominant script used by a single profile language (Hangul, kana, Thai,
+  Greek, ...) decides without scoring;
+- Latin text with fewer than LANG_MIN_LETTERS letters (e.g. "ok", "S25") is
+  LANG_DEFAULT; below LANG_SHORT_TEXT_LETTERS letters only the
+  LANG_SHORT_TEXT_LANGS compete (a few words carry too little evidence to
+  tell Portuguese from Galician or German from Latvian), and text that is
+  mostly product names ("Galaxy S25 Ultra", "price S25 Ultra") stays
+  LANG_DEFAULT unless another language beats it by LANG_SHORT_TEXT_MARGIN
+  nats per n-gram. Short questions around a product name ("Was kostet das
+  S25 Ultra?") are scored like any other short text.
+"""
+
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langdetect import DetectorFactory
+from langdetect import detector_factory
+from langdetect.detector import Detector
+from langdetect.utils.ngram import NGram
+
+from config.settings import (
+    LANG_DEFAULT, LANG_MIN_LETTERS, LANG_SHORT_TEXT_LANGS, LANG_SHORT_TEXT_LETTERS, LANG_SHORT_TEXT_MARGIN,
+)
+
 DetectorFactory.seed = 0
 
+# Characters scored per text, as in langdetect
+_MAX_TEXT_LENGTH = 10000
+_WORD_CACHE_SIZE = 200000
+
+# Scripts that only one profile language is written in
+_SCRIPTS = [
+    ("ko", "\uac00-\ud7af\u1100-\u11ff\u3130-\u318f"),
+    ("ja", "\u3040-\u30ff"),
+    ("th", "\u0e00-\u0e7f"),
+    ("el", "\u0370-\u03ff"),
+    ("he", "\u0590-\u05ff"),
+    ("bn", "\u0980-\u09ff"),
+    ("pa", "\u0a00-\u0a7f"),
+    ("gu", "\u0a80-\u0aff"),
+    ("ta", "\u0b80-\u0bff"),
+    ("te", "\u0c00-\u0c7f"),
+    ("kn", "\u0c80-\u0cff"),
+    ("ml", "\u0d00-\u0d7f"),
+]
+_SCRIPT_RE = re.compile("|".join(f"([{chars}])" for _, chars in _SCRIPTS))
+_HAN_RE = re.compile("[\u4e00-\u9fff]")
+_LETTER_RE = re.compile(r"[^\W\d_]")
+_LATIN_RE = re.compile("[A-z]")
+_WORD_RE = re.compile(r"[^\W_]+")
+# langdetect's "non-Latin": U+0300 and above, except Latin Extended Additional
+_NON_LATIN_RE = re.compile("[\u0300-\u1dff\u1f00-\U0010ffff]")
+
+
+def _is_product_text(text: str) -> bool:
+    # At least half the words are product tokens: words with a digit ("S25",
+    # "512GB") and capitalized words next to one ("Galaxy S25 Ultra")
+    words = _WORD_RE.findall(text)
+    digits = [any(ch.isdigit() for ch in w) for w in words]
+    product = 0
+    for i, word in enumerate(words):
+        near = (i > 0 and digits[i - 1]) or (i + 1 < len(words) and digits[i + 1])
+        product += digits[i] or (word[:1].isupper() and near)
+    return 2 * product >= len(words)
+
+
+class _NormalizeTable(dict):
+    """str.translate table applying NGram.normalize, filled on first use of each character."""
+
+    def __missing__(self, code: int) -> str:
+        ch = NGram.normalize(chr(code))
+        self[code] = ch
+        return ch
+
+
+class LanguageIdentifier:
+    def __init__(self):
+        detector_factory.init_factory()
+        factory = detector_factory._factory
+        self.langs: List[str] = list(factory.langlist)
+        grams = list(factory.word_lang_prob_map)
+        self._rows: Dict[str, int] = {g: i for i, g in enumerate(grams)}
+        probs = np.asarray([factory.word_lang_prob_map[g] for g in grams], dtype="float64")
+        # langdetect multiplies by (p + alpha / BASE_FREQ) per sampled n-gram
+        smoothing = Detector.ALPHA_DEFAULT / Detector.BASE_FREQ
+        self._log_probs = np.log(probs + smoothing).astype("float32")
+        self._lang_index = {lang: i for i, lang in enumerate(self.langs)}
+        short = [self._lang_index[l] for l in LANG_SHORT_TEXT_LANGS + [LANG_DEFAULT] if l in self._lang_index]
+        self._short_langs = sorted(set(short)) if LANG_SHORT_TEXT_LANGS else list(range(len(self.langs)))
+        self._normalize = _NormalizeTable()
+        self._words: Dict[Tuple[str, bool], List[int]] = {}
+        self._lock = threading.Lock()
+
+    def _word_rows(self, word: str, trailing: bool) -> List[int]:
+        # Rows of the n-grams langdetect's NGram buffer yields for " word" (+ " ")
+        key = (word, trailing)
+        rows = self._words.get(key)
+        if rows is not None:
+            return rows
+        padded = " " + word + (" " if trailing else "")
+        rows = []
+        capital = False
+        for i in range(1, len(padded)):
+            ch = padded[i]
+            if not ch.isupper():
+                capital = False
+            elif padded[i - 1].isupper():
+                capital = True
+            if capital:
+                continue
+            for n in range(1, min(i + 1, 3) + 1):
+                gram = padded[i - n + 1:i + 1]
+                row = self._rows.get(gram) if gram != " " else None
+                if row is not None:
+                    rows.append(row)
+        with self._lock:
+            if len(self._words) >= _WORD_CACHE_SIZE:
+                self._words.clear()
+            self._words[key] = rows
+        return rows
+
+    def _ngram_rows(self, text: str) -> List[int]:
+        text = Detector.URL_RE.sub(" ", text)
+        text = Detector.MAIL_RE.sub(" ", text)
+        text = NGram.normalize_vi(text)
+        if len(_LATIN_RE.findall(text)) * 2 < len(_NON_LATIN_RE.findall(text)):
+            text = _LATIN_RE.sub("", text)
+        words = text.translate(self._normalize).split(" ")
+        rows: List[int] = []
+        last = len(words) - 1
+        for i, word in enumerate(words):
+            if word:
+                rows.extend(self._word_rows(word, i < last))
+        return rows
+
+    def _script_lang(self, text: str, letters: int) -> Optional[str]:
+        counts = [0] * len(_SCRIPTS)
+        for m in _SCRIPT_RE.finditer(text):
+            counts[m.lastindex - 1] += 1
+        best = max(range(len(_SCRIPTS)), key=counts.__getitem__)
+        if not counts[best]:
+            return None
+        if _SCRIPTS[best][0] == "ja":
+            # Kana marks Japanese; the kanji around it count towards it
+            counts[best] += len(_HAN_RE.findall(text))
+        return _SCRIPTS[best][0] if 2 * counts[best] >= letters else None
+
+    def _pick_short(self, text: str, scores: np.ndarray) -> str:
+        # `scores` per n-gram; only the short-text languages compete
+        best = max(self._short_langs, key=scores.__getitem__)
+        default = self._lang_index.get(LANG_DEFAULT)
+        if default is not None and _is_product_text(text) and scores[best] - scores[default] < LANG_SHORT_TEXT_MARGIN:
+            return LANG_DEFAULT
+        return self.langs[best]
+
+    def _prepare(self, text: str) -> Tuple[Optional[str], List[int], int, bool]:
+        # (decided language or None, n-gram rows, letter count, is Latin text)
+        text = text[:_MAX_TEXT_LENGTH]
+        letters = len(_LETTER_RE.findall(text))
+        if not letters:
+            return LANG_DEFAULT, [], 0, False
+        script = self._script_lang(text, letters)
+        if script is not None:
+            return script, [], letters, False
+        latin = len(_LATIN_RE.findall(text)) * 2 >= letters
+        if latin and letters < LANG_MIN_LETTERS:
+            return LANG_DEFAULT, [], letters, latin
+        rows = self._ngram_rows(text)
+        if not rows:
+            return LANG_DEFAULT, [], letters, latin
+        return None, rows, letters, latin
+
+    def detect(self, text: str) -> str:
+        lang, rows, letters, latin = self._prepare(text)
+        if lang is not None:
+            return lang
+        scores = self._log_probs[rows].sum(axis=0)
+        if latin and letters < LANG_SHORT_TEXT_LETTERS:
+            return self._pick_short(text, scores / len(rows))
+        return self.langs[int(np.argmax(scores))]
+
+
+_identifier = LanguageIdentifier()
+
+
+def get_language_identifier() -> LanguageIdentifier:
+    return _identifier
+
+
 def detect_lang(text: str) -> str:
     try:
-        return detect(text)
+        return _identifier.detect(text)
     except Exception:
-        return "en"
+        return LANG_DEFAULT
+
@@ -1,3 +1,30 @@
+
+# nlp/prompts.py
+"""
+Prompt assembly for converse.
+
+`build_prompt` splits a RAG prompt in two. The system part is static: the
+rules (SYSTEM_PROMPT) and the handoff message. The agent sends it as the
+converse system block (followed by a cache point with PROMPT_CACHE on, so a
+model that supports prompt caching can reuse the processed prefix). The user part holds the question, the
+context and a short reminder of the instructions.
+
+Context arrives as ranked items (rag.retriever puts them in context["items"],
+with repeated rows already dropped and each table once, as HTML). Items are
+added best first; one that would take the estimated input tokens (system and
+user) over PROMPT_MAX_TOKENS is left out, so the lowest-ranked context is
+the first to go. Token counts use the same estimate as chunking
+(rag.chunking.count_tokens); the model's own count comes back in the
+converse usage.
+"""
+
+from typing import List, NamedTuple, Optional
+
+from config.settings import PROMPT_MAX_TOKENS
+from rag.chunking import count_tokens
+
+DEFAULT_HANDOFF_MESSAGE = "We are connecting you to our human agent who can assist you further. Please stay tuned."
+
 SYSTEM_PROMPT = """
 You are an enterprise-grade Retrieval-Augmented Generation (RAG) assistant.
 
@@ -32,53 +59,139 @@ ABSOLUTELY FORBIDDEN:
 - Adding explanations, examples, or steps that are not present in the CONTEXT.
 """
 
-def build_rag_prompt(
+_INSTRUCTIONS = (
+    "[INSTRUCTIONS]\n- Use ONLY the CONTEXT to answer.\n"
+    "- If the CONTEXT lacks the answer, output exactly the HANDOFF_MESSAGE above and nothing else.\n"
+    "- If deriving an answer from a table, return valid HTML table markup only."
+)
+
+# Context truncated below this many tokens is not worth sending
+_MIN_ITEM_TOKENS = 32
+
+
+class RagPrompt(NamedTuple):
+    system: str         # static prefix: rules and handoff message
+    user: str           # question, context and instructions
+    tokens: int         # estimated input tokens (system + user)
+    system_tokens: int  # estimated tokens of `system`
+    items: int          # context items included
+    dropped: int        # context items left out to fit the budget
+
+
+def system_prompt(handoff_message: str = DEFAULT_HANDOFF_MESSAGE) -> str:
+    """The static part of every RAG prompt, sent as the converse system block."""
+    return f"{SYSTEM_PROMPT.strip()}\n\n[HANDOFF_MESSAGE]\n{handoff_message}"
+
+
+def _context_items(context: dict) -> List[dict]:
+    items = context.get("items")
+    if items is not None:
+        return items
+    # Contexts assembled without ranked items: the text as one item, then the tables
+    ctx_text = context.get("ctx_text", "").strip()
+    items = [{"kind": "text", "source": None, "text": ctx_text}] if ctx_text else []
+    return items + [{"kind": "table", "source": None, "text": t} for t in context.get("tables", [])]
+
+
+def _render_item(item: dict) -> str:
+    source = item.get("source")
+    if item["kind"] == "table":
+        label = f" [source: {source}]" if source else ""
+        return f"--TABLE-START--{label}\n{item['text']}\n--TABLE-END--"
+    return f"[source: {source}] {item['text']}" if source else item["text"]
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    words = text.split(" ")
+    kept, size = [], 0
+    for word in words:
+        size += count_tokens(word)
+        if size > max_tokens:
+            break
+        kept.append(word)
+    return " ".join(kept) + " ..."
+
+
+def _render_user(user_query: str, texts: List[str], tables: List[str], images: List[str], confidence,
+                 answer_lang: Optional[str] = None) -> str:
+    parts = [f"[QUESTION]\n{user_query}"]
+    if answer_lang:
+        # The caller chose the reply language; it overrides the language of the QUESTION
+        parts.append(f"[ANSWER_LANGUAGE]\n{answer_lang}")
+    parts.append("[CONTEXT_TEXT]\n" + ("\n\n".join(texts) if texts else "NO_TEXT_AVAILABLE"))
+    if tables:
+        parts.append("[CONTEXT_TABLES]\n" + "\n".join(tables))
+    if images:
+        parts.append("[CONTEXT_IMAGES]\n" + "\n".join(images))
+    # Include optional metadata for retrieval auditing (not a source of new facts)
+    if confidence is not None:
+        parts.append(f"[RETRIEVAL_CONFIDENCE]\n{confidence}")
+    # Strong instruction hierarchy reminder for the LLM
+    parts.append(_INSTRUCTIONS)
+    if answer_lang:
+        parts[-1] += "\n- Respond in the ANSWER_LANGUAGE above (ISO 639-1 code), not the language of the QUESTION."
+    return "\n\n".join(parts)
+
+
+def build_prompt(
     user_query: str,
     context: dict,
-    handoff_message: str = "We are connecting you to our human agent who can assist you further. Please stay tuned."
-) -> str:
+    handoff_message: str = DEFAULT_HANDOFF_MESSAGE,
+    max_tokens: int = PROMPT_MAX_TOKENS,
+    answer_lang: Optional[str] = None,
+) -> RagPrompt:
     """
     Builds a strict RAG prompt enforcing:
     - Multilingual responses
     - Format preservation (tables)
     - Zero hallucination
     - Human handoff on insufficient context
+    within `max_tokens` estimated input tokens (0 = no limit). `answer_lang`
+    asks for the reply in that language instead of the question's.
     """
-
-    ctx_text = context.get("ctx_text", "").strip()
-    tables = context.get("tables", [])
+    system = system_prompt(handoff_message)
+    system_tokens = count_tokens(system)
     images = context.get("images", [])
     confidence = context.get("confidence_score")
+    items = _context_items(context)
+
+    # Everything but the context counts first; each item also pays for its separator
+    budget = max_tokens - system_tokens - count_tokens(_render_user(user_query, [], [], images, confidence, answer_lang))
+    texts, tables = [], []
+    kept = 0
+    for item in items:
+        rendered = _render_item(item)
+        cost = count_tokens(rendered) + 2
+        if max_tokens > 0 and cost > budget:
+            if kept == 0 and item["kind"] == "text" and budget >= _MIN_ITEM_TOKENS:
+                # The best text does not fit whole: send it cut to the budget
+                texts.append(_truncate(rendered, budget - 4))
+                kept += 1
+                budget = 0
+            continue
+        budget -= cost
+        kept += 1
+        (tables if item["kind"] == "table" else texts).append(rendered)
+
+    user = _render_user(user_query, texts, tables, images, confidence, answer_lang)
+    return RagPrompt(
+        system=system,
+        user=user,
+        tokens=system_tokens + count_tokens(user),
+        system_tokens=system_tokens,
+        items=kept,
+        dropped=len(items) - kept,
+    )
 
-    prompt_parts = [
-      SYSTEM_PROMPT.strip(),
-      f"\n[QUESTION]\n{user_query}",
-      f"\n[HANDOFF_MESSAGE]\n{handoff_message}",
-      "\n[CONTEXT_TEXT]"
-    ]
-
-    prompt_parts.append(ctx_text if ctx_text else "NO_TEXT_AVAILABLE")
-
-    if tables:
-      prompt_parts.append("\n[CONTEXT_TABLES]")
-      # tables are expected to be valid HTML strings (<table>...)
-      for t in tables:
-        # ensure small separator so model can see boundaries
-        prompt_parts.append("--TABLE-START--")
-        prompt_parts.append(t)
-        prompt_parts.append("--TABLE-END--")
-
-    if images:
-      prompt_parts.append("\n[CONTEXT_IMAGES]")
-      for img in images:
-        prompt_parts.append(img)
-
-    # Include optional metadata for retrieval auditing (not a source of new facts)
-    if confidence is not None:
-      prompt_parts.append(f"\n[RETRIEVAL_CONFIDENCE]\n{confidence}")
-
-    # Strong instruction hierarchy reminder for the LLM
-    prompt_parts.append("\n[INSTRUCTIONS]\n- Use ONLY the CONTEXT to answer.\n- If the CONTEXT lacks the answer, output exactly the HANDOFF_MESSAGE above and nothing else.\n- If deriving an answer from a table, return valid HTML table markup only.")
-
-    return "\n".join(prompt_parts)
 
+def build_rag_prompt(
+    user_query: str,
+    context: dict,
+    handoff_message: str = DEFAULT_HANDOFF_MESSAGE,
+) -> str:
+    """
+    User message of `build_prompt` (question, budgeted context, instructions).
+    The rules and the handoff message are not repeated in it: send
+    `system_prompt(handoff_message)` as the system block.
+    """
+    return build_prompt(user_query, context, handoff_message).user
@@ -16,4 +16,5 @@ def flatten_table_text(headers: List[str], rows: List[List[str]]) -> str:
     parts = []
     parts.append(" | ".join(headers))
     for r in rows:
-        parts.append(" | ".join(r))
\ No newline at end of file
+        parts.append(" | ".join(r))
+    return "\n".join(parts)
@@ -0,0 +1,95 @@
+
+# parsers/parallel.py
+"""
+Process-pool parsing. pdfplumber's text/table extraction is pure Python and
+holds the GIL, so threads do not help; instead PDFs are split into page
+ranges of PARSE_PAGES_PER_TASK pages that worker processes parse in parallel
+(each opens the file from its path, so only the path and page numbers are
+sent to the worker), and the blocks are merged back in page order. DOCX files
+cannot be split, but each one runs in the pool too, so several uploads are
+parsed at once.
+
+PARSE_PROCESSES=1 parses in the calling process.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from config.settings import PARSE_PAGES_PER_TASK, PARSE_PROCESSES
+from parsers.docx_parser import parse_docx_file
+from parsers.pdf_parser import parse_pdf_pages, pdf_page_count
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def parse_processes() -> int:
+    return PARSE_PROCESSES if PARSE_PROCESSES > 0 else (os.cpu_count() or 1)
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Process-wide parser pool (None when parsing in-process)."""
+    global _pool
+    if parse_processes() <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the API process runs many threads, and a forked
+                # child could inherit a lock held by one of them
+                _pool = ProcessPoolExecutor(max_workers=parse_processes(), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+def page_ranges(n_pages: int, per_task: int = PARSE_PAGES_PER_TASK) -> List[range]:
+    per_task = max(1, per_task)
+    return [range(start, min(start + per_task, n_pages)) for start in range(0, n_pages, per_task)]
+
+
+def parse_pdf_parallel(path: str, fname: str, pool: Optional[ProcessPoolExecutor] = None,
+                       per_task: int = PARSE_PAGES_PER_TASK) -> List[Dict[str, Any]]:
+    """
+    Parse the PDF at `path` in page ranges across `pool`; same blocks, in the
+    same order, as parse_pdf_bytes. Unlike parse_pdf_bytes, a file that cannot
+    be parsed (corrupt, encrypted) raises, so ingestion records it as failed.
+    """
+    pool = pool or get_parse_pool()
+    try:
+        if pool is None:
+            return parse_pdf_pages(path, fname)
+        ranges = page_ranges(pdf_page_count(path), per_task)
+        if len(ranges) <= 1:
+            # One task: skip the round trip through the pool
+            return parse_pdf_pages(path, fname)
+        futures = [pool.submit(parse_pdf_pages, path, fname, r.start, r.stop) for r in ranges]
+        out: List[Dict[str, Any]] = []
+        for f in futures:
+            out.extend(f.result())
+        return out
+    except BrokenProcessPool as e:
+        print(f"[WARNING] Parser pool failed ({e}); parsing {fname} in-process.")
+        _reset_pool()
+        return parse_pdf_pages(path, fname)
+
+
+def parse_docx_parallel(path: str, fname: str, pool: Optional[ProcessPoolExecutor] = None) -> List[Dict[str, Any]]:
+    """Parse the DOCX at `path` in a pool worker (whole file per task)."""
+    pool = pool or get_parse_pool()
+    if pool is None:
+        return parse_docx_file(path, fname)
+    try:
+        return pool.submit(parse_docx_file, path, fname).result()
+    except BrokenProcessPool as e:
+        print(f"[WARNING] Parser pool failed ({e}); parsing {fname} in-process.")
+        _reset_pool()
+        return parse_docx_file(path, fname)
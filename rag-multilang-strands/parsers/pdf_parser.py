@@ -1,31 +1,64 @@
 
+import contextlib
 import io
-from typing import List, Dict, Any
+import mmap
+from typing import List, Dict, Any, Optional, Union
 import pdfplumber
 from parsers.common import table_to_html, flatten_table_text
 
-def parse_pdf_bytes(pdf_bytes: bytes, fname: str) -> List[Dict[str, Any]]:
+PdfSource = Union[bytes, str]
+
+@contextlib.contextmanager
+def _open(src: PdfSource):
+    # Raw bytes, or a path on disk (lets worker processes open the file themselves).
+    # Files are memory-mapped, so pages are read from the page cache on demand
+    # instead of being copied into the process.
+    if isinstance(src, (bytes, bytearray)):
+        with pdfplumber.open(io.BytesIO(src)) as pdf:
+            yield pdf
+        return
+    with open(src, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm, pdfplumber.open(mm) as pdf:
+        yield pdf
+
+def _page_blocks(page, pi: int, fname: str) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    text = page.extract_text() or ""
+    if text.strip():
+        out.append({"plain_text": text, "source": f"{fname}#p{pi}"})
+
+    tables = page.extract_tables() or []
+    for t in tables:
+        if not t or len(t) < 2:
+            continue
+        headers = [str(c or "").strip() for c in t[0]]
+        rows = [[str(c or "").strip() for c in row] for row in t[1:]]
+        html = table_to_html(headers, rows)
+        flat = flatten_table_text(headers, rows)
+        out.append({
+            "table_html": html,
+            "plain_text": flat,
+            "source": f"{fname}#p{pi}"
+        })
+    return out
+
+def pdf_page_count(src: PdfSource) -> int:
+    with _open(src) as pdf:
+        return len(pdf.pages)
+
+def parse_pdf_pages(src: PdfSource, fname: str, start: int = 0, end: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Blocks of pages [start, end) (0-based), in page order."""
     out: List[Dict[str, Any]] = []
+    with _open(src) as pdf:
+        pages = pdf.pages[start:end]
+        for pi, page in enumerate(pages, start=start + 1):
+            out.extend(_page_blocks(page, pi, fname))
+            # Drop pdfminer's per-page layout cache; long manuals otherwise keep every page in memory
+            page.flush_cache()
+    return out
+
+def parse_pdf_bytes(pdf_bytes: bytes, fname: str) -> List[Dict[str, Any]]:
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for pi, page in enumerate(pdf.pages, start=1):
-                text = page.extract_text() or ""
-                if text.strip():
-                    out.append({"plain_text": text, "source": f"{fname}#p{pi}"})
-
-                tables = page.extract_tables() or []
-                for t in tables:
-                    if not t or len(t) < 2:
-                        continue
-                    headers = [str(c or "").strip() for c in t[0]]
-                    rows = [[str(c or "").strip() for c in row] for row in t[1:]]
-                    html = table_to_html(headers, rows)
-                    flat = flatten_table_text(headers, rows)
-                    out.append({
-                        "table_html": html,
-                        "plain_text": flat,
-                        "source": f"{fname}#p{pi}"
-                    })
+        return parse_pdf_pages(pdf_bytes, fname)
     except Exception as e:
         print(f"[parse_pdf_bytes] Error parsing PDF {fname}: {e}")
-    return out
+        return []
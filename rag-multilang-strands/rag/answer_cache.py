@@ -0,0 +1,172 @@
+
+# rag/answer_cache.py
+"""
+Semantic answer cache for the chat path.
+
+Paraphrased questions embed close to each other, so an answer generated for
+one can be served for the next without another converse call. Entries are
+grouped by (user language, index generation); a lookup compares the query
+vector with every cached query vector of its group and returns the stored
+answer of the nearest one if their cosine similarity is at least
+ANSWER_CACHE_THRESHOLD. Entries expire after ANSWER_CACHE_TTL seconds, the
+least recently used are evicted beyond ANSWER_CACHE_SIZE, and the groups of
+older generations are dropped when the index manager swaps in a new one
+(i.e. after every ingest or delete).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import ANSWER_CACHE_SIZE, ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL
+
+
+class _Group:
+    """Query vectors of one (lang, generation) group, one row per entry."""
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((16, dim), dtype="float32")
+        self.ids: List[int] = []
+        self.rows: Dict[int, int] = {}
+
+    def add(self, entry_id: int, vec: np.ndarray):
+        n = len(self.ids)
+        if n == len(self.vectors):
+            grown = np.empty((2 * n, self.vectors.shape[1]), dtype="float32")
+            grown[:n] = self.vectors
+            self.vectors = grown
+        self.vectors[n] = vec
+        self.ids.append(entry_id)
+        self.rows[entry_id] = n
+
+    def remove(self, entry_id: int):
+        row = self.rows.pop(entry_id)
+        last = len(self.ids) - 1
+        if row != last:
+            # Move the last row into the hole
+            moved = self.ids[last]
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.ids.pop()
+
+    def nearest(self, vec: np.ndarray) -> Tuple[Optional[int], float]:
+        n = len(self.ids)
+        if n == 0:
+            return None, -1.0
+        scores = self.vectors[:n] @ vec
+        best = int(np.argmax(scores))
+        return self.ids[best], float(scores[best])
+
+
+class SemanticAnswerCache:
+    def __init__(self, max_size: int, ttl: float, threshold: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()  # id -> (group key, expires_at, answer)
+        self._groups: Dict[Hashable, _Group] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vec) -> Optional[np.ndarray]:
+        v = np.asarray(vec, dtype="float32").ravel()
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 else None
+
+    def _drop(self, entry_id: int):
+        key, _, _ = self._entries.pop(entry_id)
+        group = self._groups[key]
+        group.remove(entry_id)
+        if not group.ids:
+            del self._groups[key]
+
+    def lookup(self, vec, lang: str, generation: int) -> Optional[str]:
+        """Answer cached for the nearest query vector with similarity >= threshold, else None."""
+        if self.max_size <= 0:
+            return None
+        v = self._unit(vec)
+        with self._lock:
+            group = self._groups.get((lang, generation))
+            while v is not None and group is not None:
+                entry_id, score = group.nearest(v)
+                if entry_id is None or score < self.threshold:
+                    break
+                _, expires_at, answer = self._entries[entry_id]
+                if expires_at < time.monotonic():
+                    # Expired: forget it and try the next nearest
+                    self._drop(entry_id)
+                    group = self._groups.get((lang, generation))
+                    continue
+                self._entries.move_to_end(entry_id)
+                self.hits += 1
+                return answer
+            self.misses += 1
+            return None
+
+    def store(self, vec, lang: str, generation: int, answer: str):
+        if self.max_size <= 0:
+            return
+        v = self._unit(vec)
+        if v is None:
+            return
+        key = (lang, generation)
+        with self._lock:
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = _Group(len(v))
+            else:
+                # Same question again (e.g. two concurrent misses): replace, don't duplicate
+                entry_id, score = group.nearest(v)
+                if entry_id is not None and score >= 1.0 - 1e-6:
+                    self._drop(entry_id)
+                    group = self._groups.setdefault(key, _Group(len(v)))
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, time.monotonic() + self.ttl, answer)
+            group.add(entry_id, v)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, keep_generation: Optional[int] = None):
+        """Drop every entry (or every entry not answered from `keep_generation`)."""
+        with self._lock:
+            stale = [i for i, (key, _, _) in self._entries.items() if key[1] != keep_generation]
+            for entry_id in stale:
+                self._drop(entry_id)
+            self.invalidated += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "invalidated": self.invalidated,
+            }
+
+
+_answer_cache = SemanticAnswerCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD)
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    return _answer_cache
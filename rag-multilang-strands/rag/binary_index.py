@@ -0,0 +1,103 @@
+
+# rag/binary_index.py
+"""
+Two-stage binary search for FAISS segments (INDEX_TYPE=binary / binary_hnsw).
+
+Stage one keeps only the sign bit of every dimension (1024 dims -> 128 bytes
+per vector, 32x less than float32) in a `faiss.IndexBinaryFlat` or
+`faiss.IndexBinaryHNSW` and pulls `k * BINARY_RERANK_FACTOR` candidates by
+Hamming distance. Stage two re-scores those candidates by exact inner product
+against the segment's float vectors, read from a memory-mapped `vectors.f32`,
+so only the pages of the candidates are touched and the float matrix never has
+to be resident.
+
+The object returned by `load_binary_index` / `build_binary_index` exposes the
+small part of the `faiss.Index` API the segments use (`d`, `ntotal`,
+`search`), and returns real inner-product scores, so segments of different
+types still merge on one scale.
+"""
+
+import os
+
+import faiss
+import numpy as np
+
+from config.settings import BINARY_RERANK_FACTOR, HNSW_EF_SEARCH, HNSW_M
+
+BINARY_INDEX_FILE = "faiss.bindex"
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Sign-quantize float vectors into packed bit codes (n x dim/8 uint8)."""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+class BinaryRerankIndex:
+    def __init__(self, binary: faiss.IndexBinary, vectors: np.ndarray, rerank_factor: int = BINARY_RERANK_FACTOR):
+        self.binary = binary
+        self.vectors = vectors  # float32 (ntotal x d); usually a read-only np.memmap
+        self.rerank_factor = rerank_factor
+
+    @property
+    def d(self) -> int:
+        return self.binary.d
+
+    @property
+    def ntotal(self) -> int:
+        return self.binary.ntotal
+
+    def is_hnsw(self) -> bool:
+        return isinstance(self.binary, faiss.IndexBinaryHNSW)
+
+    def search(self, queries: np.ndarray, k: int):
+        """Hamming candidates, re-ranked by inner product. Same return shape as faiss: (scores, ids)."""
+        queries = np.ascontiguousarray(queries, dtype="float32").reshape(-1, self.d)
+        nq = queries.shape[0]
+        scores = np.full((nq, k), -np.inf, dtype="float32")
+        ids = np.full((nq, k), -1, dtype="int64")
+        n_cand = min(self.ntotal, max(k, k * self.rerank_factor))
+        if n_cand == 0:
+            return scores, ids
+        _, cands = self.binary.search(binarize(queries), n_cand)
+        for qi in range(nq):
+            cand = cands[qi][cands[qi] >= 0]
+            if not len(cand):
+                continue
+            # Sorted reads keep the memmap access sequential-ish.
+            cand = np.sort(cand)
+            exact = self.vectors[cand] @ queries[qi]
+            top = np.argsort(-exact)[:k]
+            scores[qi, :len(top)] = exact[top]
+            ids[qi, :len(top)] = cand[top]
+        return scores, ids
+
+    def memory_bytes(self) -> int:
+        """Resident size of the first stage (the float vectors stay on disk)."""
+        return len(faiss.serialize_index_binary(self.binary))
+
+
+def build_binary_index(vectors: np.ndarray, hnsw: bool = False) -> BinaryRerankIndex:
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    dim = vectors.shape[1]
+    if dim % 8:
+        raise ValueError(f"Binary indexes need a dimension divisible by 8 (got {dim})")
+    if hnsw:
+        binary = faiss.IndexBinaryHNSW(dim, HNSW_M)
+        binary.hnsw.efSearch = HNSW_EF_SEARCH
+    else:
+        binary = faiss.IndexBinaryFlat(dim)
+    binary.add(binarize(vectors))
+    return BinaryRerankIndex(binary, vectors)
+
+
+def write_binary_index(index: BinaryRerankIndex, path: str):
+    """Write the binary stage into segment dir `path` (vectors.f32 is written by the segment)."""
+    faiss.write_index_binary(index.binary, os.path.join(path, BINARY_INDEX_FILE))
+
+
+def load_binary_index(path: str, vectors_file: str) -> BinaryRerankIndex:
+    binary = faiss.read_index_binary(os.path.join(path, BINARY_INDEX_FILE))
+    if binary.ntotal == 0:
+        return BinaryRerankIndex(binary, np.zeros((0, binary.d), dtype="float32"))
+    vectors = np.memmap(os.path.join(path, vectors_file), dtype="float32", mode="r", shape=(binary.ntotal, binary.d))
+    return BinaryRerankIndex(binary, vectors)
@@ -0,0 +1,193 @@
+
+# rag/chunking.py
+"""
+Token-budgeted chunking for ingest.
+
+`iter_chunks` packs whole sentences into chunks of at most CHUNK_MAX_TOKENS
+estimated tokens. Consecutive chunks repeat the last sentences of the
+previous chunk (up to CHUNK_OVERLAP_TOKENS). A final chunk that would add
+fewer than CHUNK_MIN_TOKENS new tokens is merged into the previous one
+instead of costing its own embedding call and TOP_K slot. Sentences longer
+than the budget are cut at line ends, then between words. Table text (a
+header line plus one line per row, see parsers.common.flatten_table_text)
+is split between rows only, and every piece repeats the header.
+
+Chunks are produced lazily from a string or from an iterable of text pieces
+(lines of a large file, for instance). Only the current chunk, the previous
+one and an unfinished sentence are held, whatever the document size.
+
+Token counts are estimates (`count_tokens`): the embedding model's
+tokenizer is not available locally. The estimate errs on the high side for
+English and counts CJK characters one each, so chunks stay below
+EMBED_MAX_TOKENS, the model's input limit.
+"""
+
+import re
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from config.settings import CHUNK_MAX_TOKENS, CHUNK_MIN_TOKENS, CHUNK_OVERLAP_TOKENS, EMBED_MAX_TOKENS
+
+# A CJK / kana / hangul character, a run of other letters and digits, or one symbol
+_CJK = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN = re.compile(rf"[{_CJK}]|[^\W_{_CJK}]+|[^\w\s]|_")
+# Sentence ends (Latin punctuation needs following whitespace, CJK does not) and blank lines
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)\]]*\s+|[。！？]+[」』”’)\]]*\s*|\n\s*\n\s*")
+_LINE = re.compile(r"[^\n]*\n|[^\n]+")
+_WORD = re.compile(r"\S+\s*|\s+")
+
+# Text without a sentence end is cut at its last line end once it reaches this
+# many characters per budget token, so a run-on stream cannot grow the buffer
+_MAX_PENDING_CHARS_PER_TOKEN = 8
+
+
+def count_tokens(text: str) -> int:
+    """Estimated embedding-model tokens of `text`: words count one per started 8 characters."""
+    return sum(1 + (len(t) - 1) // 8 for t in _TOKEN.findall(text))
+
+
+def iter_sentences(text: Union[str, Iterable[str]], max_pending: int = 0) -> Iterator[str]:
+    """
+    Sentences (with their trailing whitespace) of `text`, a string or an
+    iterable of pieces; a blank line also ends a sentence. With `max_pending`,
+    text without a sentence end is yielded at its last line end (or whole)
+    once it is that long.
+    """
+    pieces = [text] if isinstance(text, str) else text
+    buf = ""
+    for piece in pieces:
+        buf += piece
+        start = 0
+        for m in _SENTENCE_END.finditer(buf):
+            if m.end() == len(buf):
+                # The whitespace may continue in the next piece
+                break
+            yield buf[start:m.end()]
+            start = m.end()
+        buf = buf[start:]
+        if max_pending and len(buf) >= max_pending:
+            cut = buf.rfind("\n") + 1 or len(buf)
+            yield buf[:cut]
+            buf = buf[cut:]
+    if buf.strip():
+        yield buf
+
+
+def _split_long(unit: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    # A unit over budget, cut at line ends, then between words, then inside a word
+    parts: List[Tuple[str, int]] = []
+    for line in _LINE.findall(unit):
+        n = count_tokens(line)
+        if n <= max_tokens:
+            parts.append((line, n))
+            continue
+        for word in _WORD.findall(line):
+            n = count_tokens(word)
+            if n <= max_tokens:
+                parts.append((word, n))
+                continue
+            step = max(1, len(word) * max_tokens // n)
+            parts.extend((word[i:i + step], count_tokens(word[i:i + step])) for i in range(0, len(word), step))
+    piece, size = "", 0
+    for text, n in parts:
+        if piece and size + n > max_tokens:
+            yield piece, size
+            piece, size = "", 0
+        piece += text
+        size += n
+    if piece:
+        yield piece, size
+
+
+def _units(sentences: Iterable[str], max_tokens: int) -> Iterator[Tuple[str, int]]:
+    for sentence in sentences:
+        n = count_tokens(sentence)
+        if n == 0:
+            continue
+        if n <= max_tokens:
+            yield sentence, n
+        else:
+            yield from _split_long(sentence, max_tokens)
+
+
+def _join(units: List[Tuple[str, int]]) -> str:
+    return "".join(u for u, _ in units).strip()
+
+
+def _budgets(max_tokens: int, overlap_tokens: int, min_tokens: int) -> Tuple[int, int, int]:
+    # A merged tail may exceed max_tokens by up to min_tokens; both stay under the model limit
+    min_tokens = max(0, min(min_tokens, max_tokens // 2))
+    max_tokens = max(1, min(max_tokens, EMBED_MAX_TOKENS - min_tokens))
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    return max_tokens, overlap_tokens, min_tokens
+
+
+def iter_chunks(
+    text: Union[str, Iterable[str]],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    min_tokens: int = CHUNK_MIN_TOKENS,
+    table: bool = False,
+) -> Iterator[str]:
+    """Chunks of `text` (a string or an iterable of pieces), see the module docstring."""
+    max_tokens, overlap_tokens, min_tokens = _budgets(max_tokens, overlap_tokens, min_tokens)
+    if table:
+        yield from _iter_table_chunks(text if isinstance(text, str) else "".join(text), max_tokens)
+        return
+
+    sentences = iter_sentences(text, max_pending=max_tokens * _MAX_PENDING_CHARS_PER_TOKEN)
+    chunk: List[Tuple[str, int]] = []
+    size = 0
+    carried = 0  # units at the start of `chunk` repeated from the previous chunk
+    previous: List[Tuple[str, int]] = []
+    for unit, n in _units(sentences, max_tokens):
+        if size + n > max_tokens and len(chunk) > carried:
+            if previous:
+                yield _join(previous)
+            previous = chunk
+            # Carry whole trailing sentences, as many as fit the overlap and leave room for `unit`
+            chunk, size = [], 0
+            for u in reversed(previous):
+                if size + u[1] > overlap_tokens or size + u[1] + n > max_tokens:
+                    break
+                chunk.insert(0, u)
+                size += u[1]
+            carried = len(chunk)
+        chunk.append((unit, n))
+        size += n
+
+    fresh = chunk[carried:]
+    if previous and fresh and sum(n for _, n in fresh) < min_tokens:
+        # Too little new text for a chunk of its own: extend the previous one
+        yield _join(previous + fresh)
+        return
+    if previous:
+        yield _join(previous)
+    if fresh:
+        yield _join(chunk)
+
+
+def _iter_table_chunks(text: str, max_tokens: int) -> Iterator[str]:
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return
+    header, rows = lines[0], lines[1:]
+    header_tokens = count_tokens(header) + 1
+    if header_tokens + sum(count_tokens(r) + 1 for r in rows) <= max_tokens:
+        yield "\n".join(lines)
+        return
+    batch: List[str] = []
+    size = header_tokens
+    for row in rows:
+        n = count_tokens(row) + 1
+        if batch and size + n > max_tokens:
+            yield "\n".join([header] + batch)
+            batch, size = [], header_tokens
+        if header_tokens + n > EMBED_MAX_TOKENS:
+            # A row beyond the model's input limit is the one case that gets cut
+            for piece, _ in _split_long(row, max(1, max_tokens - header_tokens)):
+                yield "\n".join([header, piece.strip()])
+            continue
+        batch.append(row)
+        size += n
+    if batch:
+        yield "\n".join([header] + batch)
@@ -0,0 +1,158 @@
+
+# rag/documents.py
+"""
+Document registry on top of the segmented index.
+
+A document is identified by the hash of its file bytes (`document_id`), which
+ingest stamps on every chunk as `doc_id`. The registry itself lives in the
+index manifest (see rag.segments), so it is updated atomically with the
+segments it points into:
+
+  - ingesting a file whose id is already registered is a no-op;
+  - ingesting a new version of a file (same source path, new content)
+    tombstones the old version's chunks in the same commit;
+  - `delete_document` tombstones a document's chunks; compaction removes them.
+
+Chunks indexed before the registry existed carry no `doc_id`;
+`python -m rag.documents backfill` registers them per source file.
+"""
+
+import hashlib
+import os
+import sys
+from typing import Dict, List, Optional
+
+from config.settings import FAISS_DIR, SEGMENT_TOMBSTONE_RATIO, UPLOAD_CHUNK_SIZE
+from rag.segments import (
+    Segment,
+    compact_in_background,
+    dead_fraction,
+    document_source,
+    manifest_lock,
+    publish_generation,
+    read_manifest,
+    tombstone_document,
+    write_manifest,
+)
+
+
+def document_hasher():
+    """Incremental hasher for streamed content; finish with `document_id_of`."""
+    return hashlib.sha256()
+
+
+def document_id_of(hasher) -> str:
+    return hasher.hexdigest()[:24]
+
+
+def document_id(data: bytes) -> str:
+    """Content hash identifying a document (same bytes -> same id, whatever the file name)."""
+    h = document_hasher()
+    h.update(data)
+    return document_id_of(h)
+
+
+def file_document_id(path: str) -> str:
+    """`document_id` of a file on disk, read in UPLOAD_CHUNK_SIZE pieces."""
+    h = document_hasher()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(UPLOAD_CHUNK_SIZE), b""):
+            h.update(block)
+    return document_id_of(h)
+
+
+def list_documents(persist_dir: str = FAISS_DIR) -> List[dict]:
+    docs = read_manifest(persist_dir).get("documents") or {}
+    return [
+        {"doc_id": doc_id, "source": d["source"], "chunks": d["chunks"], "added": d["added"]}
+        for doc_id, d in sorted(docs.items(), key=lambda item: item[1]["added"])
+    ]
+
+
+def get_document(doc_id: str, persist_dir: str = FAISS_DIR) -> Optional[dict]:
+    return (read_manifest(persist_dir).get("documents") or {}).get(doc_id)
+
+
+def delete_document(doc_id: str, persist_dir: str = FAISS_DIR) -> bool:
+    """
+    Tombstone every chunk of `doc_id` and publish a new generation. Returns
+    False if the document is not registered. Segments that end up mostly dead
+    are rewritten in the background.
+    """
+    with manifest_lock(persist_dir):
+        manifest = read_manifest(persist_dir)
+        doc = tombstone_document(manifest, doc_id)
+        if doc is None:
+            return False
+        write_manifest(persist_dir, manifest)
+        generation = publish_generation(persist_dir)
+    print(f"[DEBUG] Deleted document {doc_id} ({doc['source']}, {doc['chunks']} chunks; generation {generation})")
+    if any(dead_fraction(manifest, name) >= SEGMENT_TOMBSTONE_RATIO for name, _, _ in doc["locations"]):
+        compact_in_background(persist_dir)
+    return True
+
+
+def _backfill_id(source: str, cache: Dict[str, str]) -> str:
+    if source not in cache:
+        if source and os.path.isfile(source):
+            cache[source] = file_document_id(source)
+        else:
+            cache[source] = "src-" + hashlib.sha256(source.encode("utf-8")).hexdigest()[:20]
+    return cache[source]
+
+
+def backfill_registry(persist_dir: str = FAISS_DIR) -> int:
+    """
+    Register chunks that no document owns yet, grouped by source file (id =
+    hash of the file if it still exists). Returns the number of documents added.
+    """
+    with manifest_lock(persist_dir):
+        manifest = read_manifest(persist_dir)
+        registry = manifest.setdefault("documents", {})
+        owned = {(name, row) for d in registry.values() for name, start, count in d["locations"]
+                 for row in range(start, start + count)}
+        dead = {(name, row) for name, ranges in (manifest.get("tombstones") or {}).items()
+                for start, count in ranges for row in range(start, start + count)}
+        ids: Dict[str, str] = {}
+        added: Dict[str, dict] = {}
+        for entry in manifest["segments"]:
+            seg = Segment(persist_dir, entry["name"])
+            for row in range(seg.ntotal):
+                if (seg.name, row) in owned or (seg.name, row) in dead:
+                    continue
+                _, meta = seg.meta.get(row)
+                source = document_source(meta)
+                doc_id = meta.get("doc_id") or _backfill_id(source, ids)
+                doc = added.setdefault(doc_id, {"source": source, "chunks": 0, "added": entry.get("created", 0.0), "locations": []})
+                doc["chunks"] += 1
+                last = doc["locations"][-1] if doc["locations"] else None
+                if last is not None and last[0] == seg.name and last[1] + last[2] == row:
+                    last[2] += 1
+                else:
+                    doc["locations"].append([seg.name, row, 1])
+        if not added:
+            return 0
+        for doc_id, doc in added.items():
+            if doc_id in registry:
+                registry[doc_id]["chunks"] += doc["chunks"]
+                registry[doc_id]["locations"].extend(doc["locations"])
+            else:
+                registry[doc_id] = doc
+        write_manifest(persist_dir, manifest)
+        publish_generation(persist_dir)
+    print(f"[DEBUG] Registered {len(added)} existing documents")
+    return len(added)
+
+
+if __name__ == "__main__":
+    usage = "usage: python -m rag.documents list | delete <doc_id> | backfill"
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "list":
+        for d in list_documents():
+            print(f"{d['doc_id']}  {d['chunks']:6d}  {d['source']}")
+    elif cmd == "delete" and len(sys.argv) > 2:
+        print("deleted" if delete_document(sys.argv[2]) else "not found")
+    elif cmd == "backfill":
+        backfill_registry()
+    else:
+        print(usage)
@@ -0,0 +1,150 @@
+
+# rag/embedding_cache.py
+"""
+Content-addressed, on-disk embedding cache (SQLite).
+
+Keys are a SHA-256 of (text, model id, dimensions, normalize), so an unchanged
+chunk re-indexed with the same embedding settings is served from disk instead
+of Bedrock. Vectors are stored as float32 blobs. The table is bounded by
+`max_entries`; when it overflows the least recently used rows are evicted.
+
+Recency is approximate: a hit only rewrites `last_used` when the stored time
+is older than `touch_interval`, so repeated lookups of hot keys (every chat
+query) are reads only. The row count is counted once at open and then kept
+in memory.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config.settings import EMBED_CACHE_MAX_ENTRIES, EMBED_CACHE_PATH, EMBED_CACHE_TOUCH_INTERVAL
+
+# SQLite caps the number of bound parameters per statement; stay well below it.
+_SQL_BATCH = 500
+
+
+def cache_key(text: str, model_id: str, dimensions: int, normalize: bool) -> bytes:
+    h = hashlib.sha256()
+    h.update(f"{model_id}\x00{dimensions}\x00{int(bool(normalize))}\x00".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+                 touch_interval: float = EMBED_CACHE_TOUCH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key BLOB PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """Return {key: vector} for the keys present; counts hits and misses."""
+        found: Dict[bytes, List[float]] = {}
+        unique = list(dict.fromkeys(keys))
+        now = time.time()
+        stale = []
+        with self._lock:
+            for start in range(0, len(unique), _SQL_BATCH):
+                batch = unique[start:start + _SQL_BATCH]
+                marks = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector, last_used FROM embeddings WHERE key IN ({marks})", batch
+                ).fetchall()
+                for key, blob, last_used in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32").tolist()
+                    if now - last_used >= self.touch_interval:
+                        stale.append((now, key))
+            if stale:
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?", stale)
+                self._conn.commit()
+            hits = sum(1 for k in keys if k in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: Dict[bytes, List[float]]):
+        if not items:
+            return
+        now = time.time()
+        rows = [(k, np.asarray(v, dtype="float32").tobytes(), now) for k, v in items.items()]
+        keys = list(items)
+        with self._lock:
+            existing = 0
+            for start in range(0, len(keys), _SQL_BATCH):
+                batch = keys[start:start + _SQL_BATCH]
+                marks = ",".join("?" * len(batch))
+                existing += self._conn.execute(f"SELECT COUNT(*) FROM embeddings WHERE key IN ({marks})", batch).fetchone()[0]
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._count += len(rows) - existing
+            self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        if self.max_entries <= 0:
+            return
+        overflow = self._count - self.max_entries
+        if overflow <= 0:
+            return
+        # Trim an extra 5% so we are not evicting on every single insert.
+        to_drop = overflow + self.max_entries // 20
+        dropped = self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (to_drop,),
+        ).rowcount
+        self.evictions += dropped
+        # Recount now and then: another process may share the file
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._count
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Return the process-wide cache, or None when EMBED_CACHE_PATH is empty (disabled)."""
+    global _cache
+    if not EMBED_CACHE_PATH:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache(EMBED_CACHE_PATH)
+    return _cache
@@ -1,16 +1,199 @@
 import json
-from typing import List
-from config.bedrock_client import bedrock_runtime
-from config.settings import EMBEDDING_MODEL_ID
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from botocore.exceptions import ClientError
+from config.bedrock_client import embedding_runtime
+from config.settings import EMBEDDING_MODEL_ID, EMBED_CONCURRENCY, EMBED_MAX_RETRIES
+from rag.embedding_cache import cache_key, get_embedding_cache
 
 DEFAULT_DIM = 1024
 
-def embed_texts(texts: List[str], normalize: bool = True, dimensions: int = DEFAULT_DIM) -> List[List[float]]:
-    client = bedrock_runtime()
-    embeddings = []
-    for t in texts:
-        body = json.dumps({"inputText": t, "dimensions": dimensions, "normalize": normalize})
-        resp = client.invoke_model(modelId=EMBEDDING_MODEL_ID, body=body, accept="application/json", contentType="application/json")
-        payload = json.loads(resp.get("body").read())
-        embeddings.append(payload["embedding"])
-    return embeddings
+# Bedrock error codes that mean "slow down" rather than "this request is bad".
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _is_throttle(exc: Exception) -> bool:
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES
+    return False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: halve on throttling, grow by one after a full
+    window of successes. Callers block in `acquire()` while the limit is reached.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.throttles = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit // 2)
+                self.throttles += 1
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+class EmbeddingEngine:
+    """
+    Embeds texts with bounded parallelism over a thread pool.
+
+    Titan v2 takes one `inputText` per `invoke_model`, so throughput comes from
+    keeping up to `max_concurrency` requests in flight. Results keep input order.
+    Throttled calls are retried with full-jitter exponential backoff and shrink
+    the concurrency limit; sustained success grows it back. The default client
+    has botocore retries off, so every throttle reaches this loop.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        model_id: str = EMBEDDING_MODEL_ID,
+        max_concurrency: int = EMBED_CONCURRENCY,
+        max_retries: int = EMBED_MAX_RETRIES,
+        base_delay: float = 0.25,
+        max_delay: float = 8.0,
+    ):
+        self._client = client
+        self.model_id = model_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = AdaptiveLimiter(self.max_concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="embed")
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = embedding_runtime()
+        return self._client
+
+    def _invoke(self, text: str, normalize: bool, dimensions: int) -> List[float]:
+        body = json.dumps({"inputText": text, "dimensions": dimensions, "normalize": normalize})
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            throttled = False
+            try:
+                resp = self.client.invoke_model(modelId=self.model_id, body=body, accept="application/json", contentType="application/json")
+                payload = json.loads(resp.get("body").read())
+                return payload["embedding"]
+            except Exception as e:
+                throttled = _is_throttle(e)
+                if not throttled or attempt >= self.max_retries:
+                    raise
+            finally:
+                self.limiter.release(throttled=throttled)
+            # Throttled: back off outside the limiter so other work can proceed.
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+            attempt += 1
+            time.sleep(delay)
+
+    def embed(
+        self,
+        texts: List[str],
+        normalize: bool = True,
+        dimensions: int = DEFAULT_DIM,
+        progress: Optional[ProgressCallback] = None,
+    ) -> List[List[float]]:
+        total = len(texts)
+        if total == 0:
+            return []
+        results: List[Optional[List[float]]] = [None] * total
+        done = 0
+        done_lock = threading.Lock()
+
+        def _task(i: int):
+            nonlocal done
+            results[i] = self._invoke(texts[i], normalize, dimensions)
+            if progress is not None:
+                with done_lock:
+                    done += 1
+                    progress(done, total)
+
+        futures = [self._pool.submit(_task, i) for i in range(total)]
+        try:
+            for fut in futures:
+                fut.result()
+        except Exception:
+            for fut in futures:
+                fut.cancel()
+            raise
+        return results
+
+
+_engine: Optional[EmbeddingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """Return the process-wide engine so the learned concurrency limit carries across calls."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
+
+
+def embed_texts(
+    texts: List[str],
+    normalize: bool = True,
+    dimensions: int = DEFAULT_DIM,
+    progress: Optional[ProgressCallback] = None,
+) -> List[List[float]]:
+    """
+    Embed `texts` in order. Vectors already in the on-disk embedding cache are
+    not re-requested; only the misses (deduplicated) go to Bedrock.
+    """
+    engine = get_embedding_engine()
+    cache = get_embedding_cache()
+    if cache is None:
+        return engine.embed(texts, normalize=normalize, dimensions=dimensions, progress=progress)
+
+    keys = [cache_key(t, engine.model_id, dimensions, normalize) for t in texts]
+    found = cache.get_many(keys)
+    missing = {}
+    for k, t in zip(keys, texts):
+        if k not in found and k not in missing:
+            missing[k] = t
+    if missing:
+        miss_keys = list(missing)
+        vectors = engine.embed([missing[k] for k in miss_keys], normalize=normalize, dimensions=dimensions, progress=progress)
+        fresh = dict(zip(miss_keys, vectors))
+        cache.put_many(fresh)
+        found.update(fresh)
+    elif progress is not None:
+        progress(len(texts), len(texts))
+    return [found[k] for k in keys]
@@ -0,0 +1,235 @@
+
+# rag/index_factory.py
+"""
+Index factory for FAISS segments.
+
+INDEX_TYPE selects the structure used for segments with at least
+ANN_MIN_ROWS vectors (smaller ones, e.g. a fresh upload, stay exact Flat until
+compaction merges them):
+
+  flat      exact inner-product scan (IndexFlatIP)
+  hnsw      graph index; search breadth via HNSW_EF_SEARCH
+  ivf_flat  inverted lists over full vectors; IVF_NLIST lists, IVF_NPROBE probed
+  ivf_pq    inverted lists over product-quantized codes (PQ_M bytes per vector)
+  binary    1-bit codes, Hamming search + exact re-rank from mmapped vectors
+            (rag.binary_index); binary_hnsw does the first stage with HNSW
+
+IVF variants are trained on a random sample of at most INDEX_TRAIN_SAMPLE
+vectors at build time. `apply_search_params` sets nprobe / efSearch on a loaded
+index; it is applied to every segment as it is opened.
+
+`python -m rag.index_factory report` measures recall@k against the exact flat
+index, per-query latency and in-memory index size, on the vectors of the local
+index.
+"""
+
+import argparse
+import math
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+from config.settings import (
+    ANN_MIN_ROWS,
+    BINARY_RERANK_FACTOR,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+    INDEX_TRAIN_SAMPLE,
+    INDEX_TYPE,
+    IVF_NLIST,
+    IVF_NPROBE,
+    PQ_M,
+    PQ_NBITS,
+)
+from rag.binary_index import BinaryRerankIndex, build_binary_index
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "binary", "binary_hnsw")
+
+
+def _auto_nlist(n: int) -> int:
+    # ~4*sqrt(n) lists, but keep >= 39 training points per list (FAISS's k-means minimum).
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def _training_sample(vectors: np.ndarray, limit: int) -> np.ndarray:
+    if len(vectors) <= limit:
+        return vectors
+    rng = np.random.default_rng(0)
+    return vectors[rng.choice(len(vectors), size=limit, replace=False)]
+
+
+def resolve_index_type(n: int, kind: str = INDEX_TYPE, min_rows: int = ANN_MIN_ROWS) -> str:
+    """Index type actually built for `n` vectors (falls back to flat when too small)."""
+    kind = (kind or "flat").lower()
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown INDEX_TYPE {kind!r}; expected one of {', '.join(INDEX_TYPES)}")
+    if kind == "flat" or n < min_rows:
+        return "flat"
+    if kind in ("ivf_flat", "ivf_pq") and n < 39:
+        return "flat"
+    if kind == "ivf_pq" and n < 39 * 2 ** PQ_NBITS:
+        # PQ codebooks need ~39 training points per centroid.
+        return "ivf_flat"
+    return kind
+
+
+def build_index(vectors: np.ndarray, kind: str = INDEX_TYPE, nlist: int = IVF_NLIST, min_rows: int = ANN_MIN_ROWS):
+    """
+    Build (and train, if needed) an inner-product index of `kind` holding
+    `vectors`. Binary kinds return a BinaryRerankIndex rather than a faiss.Index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+    kind = resolve_index_type(n, kind, min_rows)
+    if kind in ("binary", "binary_hnsw"):
+        index = build_binary_index(vectors, hnsw=kind == "binary_hnsw")
+        apply_search_params(index)
+        return index
+    if kind == "flat":
+        index = faiss.IndexFlatIP(dim)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        nlist = nlist or _auto_nlist(n)
+        if kind == "ivf_flat":
+            spec = f"IVF{nlist},Flat"
+        else:
+            m = PQ_M if dim % PQ_M == 0 else math.gcd(dim, PQ_M)
+            spec = f"IVF{nlist},PQ{m}x{PQ_NBITS}"
+        index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+        index.train(_training_sample(vectors, INDEX_TRAIN_SAMPLE))
+    index.add(vectors)
+    apply_search_params(index)
+    return index
+
+
+def apply_search_params(index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH, rerank_factor: int = BINARY_RERANK_FACTOR):
+    """Set query-time knobs on whichever of them the index (or the index it wraps) has."""
+    if isinstance(index, BinaryRerankIndex):
+        index.rerank_factor = rerank_factor
+        if index.is_hnsw():
+            index.binary.hnsw.efSearch = ef_search
+        return
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw = faiss.downcast_index(index)
+    if hasattr(hnsw, "hnsw"):
+        hnsw.hnsw.efSearch = ef_search
+
+
+def index_type_of(index) -> str:
+    if isinstance(index, BinaryRerankIndex):
+        return "binary_hnsw" if index.is_hnsw() else "binary"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivf_pq" if "PQ" in type(ivf).__name__ else "ivf_flat"
+    if hasattr(faiss.downcast_index(index), "hnsw"):
+        return "hnsw"
+    return "flat"
+
+
+def recall_at_k(queries: np.ndarray, base: np.ndarray, truth_scores: np.ndarray, found: np.ndarray, k: int) -> float:
+    """
+    Fraction of returned ids whose exact score reaches the k-th exact score.
+    Comparing scores rather than ids keeps duplicate chunks (identical vectors)
+    from counting as misses.
+    """
+    kth = truth_scores[:, k - 1:k] - 1e-5
+    ids = found[:, :k]
+    scores = np.einsum("qd,qkd->qk", queries, base[np.clip(ids, 0, None)])
+    hits = (ids >= 0) & (scores >= kth)
+    return float(hits.sum()) / float(ids.shape[0] * k)
+
+
+def index_memory_bytes(index) -> int:
+    """In-memory size of an index (for binary kinds, the first stage only)."""
+    if isinstance(index, BinaryRerankIndex):
+        return index.memory_bytes()
+    return len(faiss.serialize_index(index))
+
+
+def recall_report(
+    vectors: np.ndarray,
+    k: int = 4,
+    n_queries: int = 200,
+    sweeps: Optional[Dict[str, List[int]]] = None,
+) -> List[dict]:
+    """
+    Hold out `n_queries` corpus vectors as queries, index the rest with every
+    index type and report recall@k (vs. exact search) and mean latency per
+    query for each search-parameter setting.
+    """
+    sweeps = sweeps or {"nprobe": [1, 4, 16, 64], "efSearch": [16, 32, 64, 128], "rerank": [1, 4, 10, 20]}
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(vectors))
+    n_queries = min(n_queries, max(1, len(vectors) // 5))
+    queries, base = vectors[order[:n_queries]], vectors[order[n_queries:]]
+
+    exact = faiss.IndexFlatIP(base.shape[1])
+    exact.add(base)
+    t0 = time.perf_counter()
+    truth_scores, _ = exact.search(queries, k)
+    flat_ms = (time.perf_counter() - t0) * 1000 / n_queries
+
+    rows = [{
+        "index": "flat", "param": "-", "value": "-", "recall": 1.0, "ms_per_query": flat_ms, "build_s": 0.0,
+        "mem_bytes": index_memory_bytes(exact),
+    }]
+    for kind in ("hnsw", "ivf_flat", "ivf_pq", "binary", "binary_hnsw"):
+        # Ignore ANN_MIN_ROWS here so small corpora can still be evaluated.
+        if resolve_index_type(len(base), kind, min_rows=0) != kind:
+            rows.append({"index": kind, "param": "skipped", "value": f"too few vectors ({len(base)})"})
+            continue
+        t0 = time.perf_counter()
+        index = build_index(base, kind, min_rows=0)
+        build_s = time.perf_counter() - t0
+        param = {"hnsw": "efSearch", "binary": "rerank", "binary_hnsw": "rerank"}.get(kind, "nprobe")
+        mem_bytes = index_memory_bytes(index)
+        for value in sweeps[param]:
+            apply_search_params(index, nprobe=value, ef_search=value, rerank_factor=value)
+            t0 = time.perf_counter()
+            _, found = index.search(queries, k)
+            ms = (time.perf_counter() - t0) * 1000 / n_queries
+            rows.append({
+                "index": kind, "param": param, "value": value,
+                "recall": recall_at_k(queries, base, truth_scores, found, k), "ms_per_query": ms, "build_s": build_s,
+                "mem_bytes": mem_bytes,
+            })
+    return rows
+
+
+def _print_report(rows: List[dict], k: int):
+    print(f"{'index':11} {'param':9} {'value':>6} {'recall@' + str(k):>9} {'ms/query':>9} {'build s':>8} {'mem KiB':>9}")
+    for r in rows:
+        if "recall" not in r:
+            print(f"{r['index']:11} {r['param']:9} {r['value']}")
+            continue
+        print(
+            f"{r['index']:11} {r['param']:9} {str(r['value']):>6} {r['recall']:9.3f} "
+            f"{r['ms_per_query']:9.3f} {r['build_s']:8.2f} {r['mem_bytes'] / 1024:9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    from config.settings import FAISS_DIR
+    from rag.segments import load_segments, read_manifest
+
+    ap = argparse.ArgumentParser(description="FAISS index trade-off tools")
+    ap.add_argument("command", choices=["report"])
+    ap.add_argument("--dir", default=FAISS_DIR)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+
+    segments = load_segments(args.dir, read_manifest(args.dir))
+    if not segments:
+        raise SystemExit(f"No index found in {args.dir}")
+    corpus = np.concatenate([seg.vectors() for seg in segments])
+    print(f"Corpus: {corpus.shape[0]} vectors x {corpus.shape[1]} dims from {args.dir}")
+    _print_report(recall_report(corpus, k=args.k, n_queries=args.queries), args.k)
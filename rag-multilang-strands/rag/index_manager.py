@@ -0,0 +1,126 @@
+
+# rag/index_manager.py
+"""
+Process-wide owner of the FAISS index used on the query path.
+
+The index is loaded once and served from memory. Ingest publishes a new
+generation (see `rag.segments.publish_generation`) after every save;
+the manager notices the bump with a cheap stat/read of the generation file and
+loads the new snapshot in a background thread. Searches keep using the current
+snapshot until the new one is fully loaded, then the reference is swapped and
+answers cached for older generations are dropped.
+"""
+
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from config.settings import FAISS_DIR, INDEX_RELOAD_INTERVAL
+from rag.answer_cache import get_answer_cache
+from rag.embeddings import DEFAULT_DIM
+from rag.vectorstore_faiss import FaissStore, read_generation
+
+
+class IndexManager:
+    def __init__(self, persist_dir: str, dim: int = DEFAULT_DIM, reload_interval: float = INDEX_RELOAD_INTERVAL):
+        self.persist_dir = persist_dir
+        self.dim = dim
+        self.reload_interval = reload_interval
+        self._store: Optional[FaissStore] = None
+        self._init_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._last_check = 0.0
+
+    @property
+    def generation(self) -> int:
+        """Generation of the snapshot currently being served (-1 before first load)."""
+        store = self._store
+        return store.generation if store is not None else -1
+
+    def store(self) -> FaissStore:
+        """
+        Return the current snapshot. Never blocks on a reload; only the very
+        first call waits for the initial load.
+        """
+        store = self._store
+        if store is None:
+            with self._init_lock:
+                if self._store is None:
+                    self._store = self._load()
+                    self._last_check = time.monotonic()
+                return self._store
+        self._maybe_reload_async(store)
+        return store
+
+    def search(self, query_vec: List[float], top_k: int) -> List[Tuple[str, dict, float]]:
+        return self.store().search(query_vec, top_k)
+
+    def search_many(self, query_vecs, top_k: int) -> List[List[Tuple[str, dict, float]]]:
+        return self.store().search_many(query_vecs, top_k)
+
+    def search_lexical(self, query: str, top_k: int) -> List[Tuple[str, dict, float]]:
+        return self.store().search_lexical(query, top_k)
+
+    def reload(self) -> bool:
+        """
+        Synchronously load the published generation if it differs from the one
+        being served. In-flight searches keep their snapshot. Returns True if
+        a new snapshot was swapped in. A manager that has not served a search
+        yet has nothing to refresh; its first search loads the latest files.
+        """
+        if self._store is None:
+            return False
+        with self._reload_lock:
+            return self._reload_locked()
+
+    def _load(self) -> FaissStore:
+        # Segments are immutable, so the new snapshot shares every segment the
+        # current one already has open and only reads the new ones.
+        store = FaissStore(dim=self.dim, persist_dir=self.persist_dir, reuse=self._store).load()
+        print(f"[DEBUG] Loaded FAISS index generation {store.generation} ({store.ntotal} vectors in {len(store.segments)} segments)")
+        return store
+
+    def _reload_locked(self) -> bool:
+        self._last_check = time.monotonic()
+        if self._store is not None and read_generation(self.persist_dir) == self._store.generation:
+            return False
+        try:
+            new_store = self._load()
+        except Exception as e:
+            print(f"[WARNING] FAISS index reload failed: {e}. Keeping generation {self.generation}.")
+            return False
+        self._store = new_store
+        get_answer_cache().invalidate(keep_generation=new_store.generation)
+        return True
+
+    def _maybe_reload_async(self, store: FaissStore):
+        if time.monotonic() - self._last_check < self.reload_interval:
+            return
+        self._last_check = time.monotonic()
+        if read_generation(self.persist_dir) == store.generation:
+            return
+        # Only one reload at a time; everyone else keeps serving the old snapshot.
+        if not self._reload_lock.acquire(blocking=False):
+            return
+
+        def _run():
+            try:
+                self._reload_locked()
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=_run, name="faiss-index-reload", daemon=True).start()
+
+
+_manager: Optional[IndexManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_index_manager() -> IndexManager:
+    """Return the process-wide IndexManager for FAISS_DIR."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = IndexManager(FAISS_DIR)
+    return _manager
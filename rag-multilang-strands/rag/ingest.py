@@ -1,15 +1,28 @@
 
 # rag/ingest.py
 import os
-from typing import List, Tuple
+import time
+import uuid
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
 from io import BytesIO
-from langdetect import detect
-from rag.utils import chunk_text
-from rag.embeddings import embed_texts
+from nlp.language import detect_lang
+from rag.chunking import iter_chunks
+from rag.embeddings import DEFAULT_DIM, embed_texts
+from rag.embedding_cache import get_embedding_cache
+from rag.translation import snippet_id, translate_many
 from rag.vectorstore_faiss import FaissStore
-from parsers.pdf_parser import parse_pdf_bytes
-from parsers.docx_parser import parse_docx_bytes
-from config.settings import DATA_DIR, FAISS_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+from rag.index_manager import get_index_manager
+from rag.documents import document_hasher, document_id_of, file_document_id, get_document
+from rag.pipeline import Pipeline
+from parsers.parallel import parse_docx_parallel, parse_pdf_parallel
+from config.settings import (
+    DATA_DIR, FAISS_DIR, PRETRANSLATE_LANGS,
+    INGEST_QUEUE_SIZE, INGEST_PARSE_WORKERS, INGEST_EMBED_BATCH, INGEST_EMBED_WORKERS, UPLOAD_CHUNK_SIZE,
+)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt", ".md")
+# Language ID scores the first 10000 characters of a text (nlp.language)
+_LANG_SAMPLE_CHARS = 10000
 
 # Parsers
 def read_txt(path: str) -> str:
@@ -19,6 +32,21 @@ def read_txt(path: str) -> str:
 def read_md(path: str) -> str:
     return read_txt(path)
 
+def _iter_lines(path: str) -> Iterator[str]:
+    # Lines of a text file, read as the chunker consumes them
+    with open(path, "r", encoding="utf-8") as fh:
+        yield from fh
+
+def _text_head(path: str) -> str:
+    # Decode the whole file in UPLOAD_CHUNK_SIZE pieces, so a file that is not
+    # UTF-8 fails here (in the parse stage) rather than midway through chunking;
+    # returns its first _LANG_SAMPLE_CHARS characters for language ID
+    with open(path, "r", encoding="utf-8") as fh:
+        head = fh.read(_LANG_SAMPLE_CHARS)
+        while fh.read(UPLOAD_CHUNK_SIZE):
+            pass
+    return head
+
 def read_pdf_bytes(b: bytes) -> str:
     from PyPDF2 import PdfReader
     reader = PdfReader(BytesIO(b))
@@ -42,132 +70,303 @@ def read_docx(path: str) -> str:
     with open(path, "rb") as fh:
         return read_docx_bytes(fh.read())
 
-# Load existing documents from DATA_DIR
-def load_documents() -> List[Tuple[str, dict]]:
-    docs = []
+# Parse one file into (text, metadata) blocks; language is filled in later. With
+# `stream`, a .txt/.md file is one block whose text is an iterator over its lines
+# (for iter_chunks), so the file is never held in memory whole; its language is
+# set here, from the head of the file.
+def _parse_file(path: str, doc_id: str, stream: bool = False) -> List[Tuple[Union[str, Iterator[str]], dict]]:
+    # A staged upload is read from its own file but indexed under its final name
+    name = upload_dest(path)
+    low = name.lower()
+    # PDF/DOCX are parsed from the saved file in the parser process pool
+    if low.endswith(".pdf"):
+        blocks = parse_pdf_parallel(path, name)
+    elif low.endswith(".docx"):
+        blocks = parse_docx_parallel(path, name)
+    elif low.endswith((".txt", ".md")):
+        meta = {"source": name, "file": name, "doc_id": doc_id}
+        if not stream:
+            return [(read_txt(path), meta)]
+        meta["lang"] = detect_lang(_text_head(path))
+        return [(_iter_lines(path), meta)]
+    else:
+        # Skip unsupported types (UI restricts types already)
+        return []
+    out = []
+    for block in blocks:
+        # "source" is per block (path#p3 for a PDF page); the registry keys on "file"
+        block["doc_id"] = doc_id
+        block["file"] = name
+        if "plain_text" in block and block["plain_text"] is not None:
+            out.append((block["plain_text"], block))
+        else:
+            # For tables, etc., add with empty text for now
+            out.append(("", block))
+    return out
+
+def _detect_block_langs(blocks: List[Tuple[str, dict]]):
+    # Empty (e.g. table) blocks get LANG_DEFAULT; streamed text blocks have theirs
+    for text, meta in blocks:
+        if "lang" not in meta:
+            meta["lang"] = detect_lang(text)
+
+def chunk_block(text: Union[str, Iterable[str]], meta: dict) -> Iterator[str]:
+    # Token-budgeted chunks of one parsed block (rag.chunking); tables split between rows only
+    return iter_chunks(text, table="table_html" in meta)
+
+def _iter_data_files():
+    # (path, doc_id) for every supported file under DATA_DIR not indexed yet
     for root, _, files in os.walk(DATA_DIR):
         for f in files:
             path = os.path.join(root, f)
-            low = f.lower()
-            try:
-                if low.endswith(".pdf"):
-                    with open(path, "rb") as fh:
-                        blocks = parse_pdf_bytes(fh.read(), path)
-                elif low.endswith(".docx"):
-                    with open(path, "rb") as fh:
-                        blocks = parse_docx_bytes(fh.read(), path)
-                elif low.endswith(".txt"):
-                    content = read_txt(path)
-                    lang = detect(content) if content.strip() else "en"
-                    docs.append((content, {"source": path, "lang": lang}))
-                    continue
-                elif low.endswith(".md"):
-                    content = read_md(path)
-                    lang = detect(content) if content.strip() else "en"
-                    docs.append((content, {"source": path, "lang": lang}))
-                    continue
-                else:
-                    continue
-                
-                for block in blocks:
-                    if "plain_text" in block and block["plain_text"] is not None:
-                        lang = detect(block["plain_text"]) if block["plain_text"].strip() else "en"
-                        block["lang"] = lang
-                        docs.append((block["plain_text"], block))
-                    else:
-                        # For tables, etc., add with empty text for now
-                        docs.append(("", block))
-            except Exception as e:
-                print(f"Failed to parse {path}: {e}")
+            if not f.lower().endswith(SUPPORTED_EXTENSIONS) or f.startswith(UPLOAD_TMP_PREFIX):
+                continue
+            doc_id = file_document_id(path)
+            if get_document(doc_id, FAISS_DIR):
+                print(f"[DEBUG] Skipping {path}: already indexed as {doc_id}")
+                continue
+            yield path, doc_id
+
+# Load existing documents from DATA_DIR
+def load_documents() -> List[Tuple[str, dict]]:
+    docs = []
+    for path, doc_id in _iter_data_files():
+        try:
+            blocks = _parse_file(path, doc_id)
+        except Exception as e:
+            print(f"Failed to parse {path}: {e}")
+            continue
+        _detect_block_langs(blocks)
+        docs.extend(blocks)
     return docs
 
-def _index_chunks(chunks: List[str], metas: List[dict]) -> int:
-    if not chunks:
-        return 0
-    # Filter out empty chunks to avoid embedding errors
-    valid_indices = [i for i, c in enumerate(chunks) if c.strip()]
-    if not valid_indices:
+def pretranslate_chunks(chunks: List[str], metas: List[dict], langs: List[str]) -> List[dict]:
+    """
+    Translate each chunk into every language in `langs` and return metadata
+    copies carrying {"translations": {lang: {"text": ...}}}. Languages equal to
+    the chunk's own language and failed translations are left out, so the
+    retriever falls back to live translation for them. Table chunks are
+    skipped: their table reaches the prompt as the original HTML.
+    """
+    out = [dict(m, translations=dict(m.get("translations") or {})) for m in metas]
+    for lang in langs:
+        jobs, targets = [], []
+        for i, (txt, meta) in enumerate(zip(chunks, metas)):
+            source_lang = meta.get("lang", "en")
+            if source_lang == lang or "table_html" in meta:
+                continue
+            jobs.append((snippet_id(txt), txt, source_lang))
+            targets.append((i, "text"))
+        if not jobs:
+            continue
+        translated = translate_many(jobs, lang, fallback_to_source=False)
+        for (i, field), value in zip(targets, translated):
+            if value is not None:
+                out[i]["translations"].setdefault(lang, {})[field] = value
+        print(f"[DEBUG] Pre-translated {len(jobs)} snippets into {lang}")
+    for m in out:
+        if not m["translations"]:
+            del m["translations"]
+    return out
+
+_last_ingest_stats: List[dict] = []
+
+def get_ingest_stats() -> List[dict]:
+    """Per-stage counters of the most recent ingest run."""
+    return _last_ingest_stats
+
+# progress(doc_id, event, value): "parsing", "parsed" (block count), "indexed"
+# (chunks added, may repeat), "skipped" (reason), "failed" (error message).
+# Keyed by doc_id: uploads of the same file name in different batches share a
+# saved path but not (unless identical) a doc_id.
+IngestProgress = Callable[[str, str, Any], None]
+
+def _no_progress(doc_id: str, event: str, value: Any = None):
+    pass
+
+def run_ingest_pipeline(files: Iterable[Tuple[str, str]], progress: Optional[IngestProgress] = None) -> int:
+    """
+    Parse + detect language, chunk, embed and index `(path, doc_id)` files as overlapping stages connected by bounded queues, so embedding
+    starts with the first file's first chunks and parsing continues while
+    Bedrock calls are in flight. All chunks are saved as one new segment at
+    the end. Returns the number of chunks indexed.
+    """
+    global _last_ingest_stats
+    progress = progress or _no_progress
+    store = FaissStore(dim=DEFAULT_DIM, persist_dir=FAISS_DIR)
+    batch: List[Tuple[str, dict, str]] = []
+    indexed = [0]
+
+    def parse(item, emit):
+        path, doc_id = item
+        progress(doc_id, "parsing", None)
+        try:
+            blocks = _parse_file(path, doc_id, stream=True)
+        except Exception as e:
+            print(f"Failed to parse {path}: {e}")
+            progress(doc_id, "failed", str(e))
+            return
+        _detect_block_langs(blocks)
+        progress(doc_id, "parsed", len(blocks))
+        for text, meta in blocks:
+            emit((text, meta, doc_id))
+
+    def chunk(item, emit):
+        text, meta, doc_id = item
+        # Empty blocks yield no chunks, so nothing blank is embedded
+        for c in chunk_block(text, meta):
+            emit((c, meta, doc_id))
+
+    def collect(item, emit):
+        batch.append(item)
+        if len(batch) >= INGEST_EMBED_BATCH:
+            emit(batch[:])
+            batch.clear()
+
+    def flush(emit):
+        if batch:
+            emit(batch[:])
+            batch.clear()
+
+    def embed(items, emit):
+        texts = [t for t, _, _ in items]
+        emit((embed_texts(texts), texts, [m for _, m, _ in items], [d for _, _, d in items]))
+
+    def index(item, emit):
+        vectors, texts, metas, doc_ids = item
+        if PRETRANSLATE_LANGS:
+            metas = pretranslate_chunks(texts, metas, PRETRANSLATE_LANGS)
+        store.add(vectors, texts, metas)
+        indexed[0] += len(texts)
+        per_file = {}
+        for d in doc_ids:
+            per_file[d] = per_file.get(d, 0) + 1
+        for d, n in per_file.items():
+            progress(d, "indexed", n)
+        emit(len(texts))
+
+    pipeline = (
+        Pipeline(queue_size=INGEST_QUEUE_SIZE)
+        .stage("parse", parse, workers=INGEST_PARSE_WORKERS)
+        .stage("chunk", chunk)
+        .stage("batch", collect, flush=flush)
+        .stage("embed", embed, workers=INGEST_EMBED_WORKERS)
+        .stage("index", index)
+    )
+    t0 = time.perf_counter()
+    stats = pipeline.run(files)
+    _last_ingest_stats = [st.as_dict() for st in stats]
+    for st in _last_ingest_stats:
+        print(f"[DEBUG] Ingest stage {st}")
+    if not indexed[0]:
         return 0
-    valid_chunks = [chunks[i] for i in valid_indices]
-    valid_metas = [metas[i] for i in valid_indices]
-    vectors = embed_texts(valid_chunks)
-    store = FaissStore(dim=len(vectors[0]), persist_dir=FAISS_DIR)
-    store.add(vectors, valid_chunks, valid_metas)
+    cache = get_embedding_cache()
+    if cache is not None:
+        print(f"[DEBUG] Embedding cache: {cache.stats()}")
     store.save()
-    return len(valid_chunks)
+    print(f"[DEBUG] Indexed {indexed[0]} chunks in {time.perf_counter() - t0:.2f}s")
+    # Make the new generation visible to in-process searches right away;
+    # other processes pick it up from the generation file.
+    get_index_manager().reload()
+    return indexed[0]
 
 # CLI build index from DATA_DIR
 def build_index():
-    docs = load_documents()
-    all_chunks, metas = [], []
-    for content, meta in docs:
-        cks = chunk_text(content, CHUNK_SIZE, CHUNK_OVERLAP)
-        all_chunks.extend(cks)
-        metas.extend([meta] * len(cks))
-    if not all_chunks:
+    if not run_ingest_pipeline(_iter_data_files()):
         print(f"No documents found in {DATA_DIR}. Add files and re-run.")
-        return
-    _index_chunks(all_chunks, metas)
 
-# UI helper: ingest uploaded Streamlit files
-def ingest_uploaded_files(files) -> int:
+UPLOAD_TMP_PREFIX = ".upload-"
+
+def upload_dest(path: str) -> str:
+    """Final path of a staged upload (see UploadWriter); any other path is returned as is."""
+    folder, name = os.path.split(path)
+    if not name.startswith(UPLOAD_TMP_PREFIX):
+        return path
+    return os.path.join(folder, name[len(UPLOAD_TMP_PREFIX):].split("-", 1)[1])
+
+def publish_uploads(saved: List[Tuple[str, str]]):
+    """Move staged uploads to their final names under DATA_DIR/uploads."""
+    for path, _ in saved:
+        dest = upload_dest(path)
+        if dest != path and os.path.exists(path):
+            os.replace(path, dest)
+
+class UploadWriter:
     """
-    Save uploaded files under data/docs/uploads and index them.
-    Returns number of chunks indexed.
+    Streams one uploaded file into DATA_DIR/uploads, hashing it on the way, so
+    the bytes are written once and never held in memory as a whole. Data goes
+    to a unique staging name that is kept by `finish()`: the file is parsed
+    from there and only moved to uploads/<name> once it has been ingested
+    (`publish_uploads`), so a second upload with the same name can neither
+    replace the bytes a queued job is about to read nor an interrupted upload
+    the previous version of the file.
     """
-    upload_dir = os.path.join(DATA_DIR, "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-
-    all_chunks, metas = [], []
-    for f in files:
-        filename = f.name
-        dest = os.path.join(upload_dir, filename)
-        # Persist file
-        with open(dest, "wb") as out:
-            out.write(f.read())
-        # Parse
-        low = filename.lower()
-        try:
-            if low.endswith(".pdf"):
-                with open(dest, "rb") as fh:
-                    blocks = parse_pdf_bytes(fh.read(), dest)
-            elif low.endswith(".docx"):
-                with open(dest, "rb") as fh:
-                    blocks = parse_docx_bytes(fh.read(), dest)
-            elif low.endswith(".txt"):
-                content = read_txt(dest)
-                lang = detect(content) if content.strip() else "en"
-                cks = chunk_text(content, CHUNK_SIZE, CHUNK_OVERLAP)
-                all_chunks.extend(cks)
-                metas.extend([{"source": dest, "lang": lang}] * len(cks))
-                continue
-            elif low.endswith(".md"):
-                content = read_md(dest)
-                lang = detect(content) if content.strip() else "en"
-                cks = chunk_text(content, CHUNK_SIZE, CHUNK_OVERLAP)
-                all_chunks.extend(cks)
-                metas.extend([{"source": dest, "lang": lang}] * len(cks))
-                continue
-            else:
-                # Skip unsupported types (UI restricts types already)
+
+    def __init__(self, filename: str):
+        upload_dir = os.path.join(DATA_DIR, "uploads")
+        os.makedirs(upload_dir, exist_ok=True)
+        self.dest = os.path.join(upload_dir, os.path.basename(filename))
+        self._tmp = os.path.join(upload_dir, f"{UPLOAD_TMP_PREFIX}{uuid.uuid4().hex}-{os.path.basename(filename)}")
+        self._fh = open(self._tmp, "wb", buffering=UPLOAD_CHUNK_SIZE)
+        self._hasher = document_hasher()
+        self.size = 0
+
+    def write(self, data: bytes):
+        self._hasher.update(data)
+        self._fh.write(data)
+        self.size += len(data)
+
+    def finish(self) -> Tuple[str, str]:
+        """Close the staged file; returns (staged path, doc_id)."""
+        self._fh.close()
+        return self._tmp, document_id_of(self._hasher)
+
+    def abort(self):
+        self._fh.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+def save_upload(src, filename: str) -> Tuple[str, str]:
+    """Copy file-like `src` into the uploads dir in UPLOAD_CHUNK_SIZE pieces; returns (staged path, doc_id)."""
+    writer = UploadWriter(filename)
+    try:
+        for block in iter(lambda: src.read(UPLOAD_CHUNK_SIZE), b""):
+            writer.write(block)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+def ingest_saved_files(saved: List[Tuple[str, str]], progress: Optional[IngestProgress] = None) -> int:
+    """
+    Index already-saved `(path, doc_id)` uploads, then move them to their
+    final names. Files already indexed with identical content are skipped; a
+    changed file replaces its previous version. Returns number of chunks
+    indexed.
+    """
+    progress = progress or _no_progress
+
+    def _pending():
+        for path, doc_id in saved:
+            if get_document(doc_id, FAISS_DIR):
+                print(f"[DEBUG] Skipping {os.path.basename(upload_dest(path))}: already indexed as {doc_id}")
+                progress(doc_id, "skipped", f"already indexed as {doc_id}")
                 continue
-            
-            for block in blocks:
-                if "plain_text" in block and block["plain_text"] is not None:
-                    lang = detect(block["plain_text"]) if block["plain_text"].strip() else "en"
-                    block["lang"] = lang
-                    cks = chunk_text(block["plain_text"], CHUNK_SIZE, CHUNK_OVERLAP)
-                    all_chunks.extend(cks)
-                    metas.extend([block] * len(cks))
-                else:
-                    # For tables, store without chunking
-                    all_chunks.append("")  # Empty text for embedding
-                    metas.append(block)
-        except Exception as e:
-            print(f"Failed to parse uploaded {filename}: {e}")
-            continue
+            yield path, doc_id
+
+    try:
+        return run_ingest_pipeline(_pending(), progress)
+    finally:
+        publish_uploads(saved)
 
-    return _index_chunks(all_chunks, metas)
+# UI helper: ingest uploaded Streamlit files
+def ingest_uploaded_files(files, progress: Optional[IngestProgress] = None) -> int:
+    """
+    Save uploaded files under data/docs/uploads and index them.
+    Returns number of chunks indexed (see `ingest_saved_files`).
+    `progress` receives per-file events keyed by doc_id.
+    """
+    return ingest_saved_files([save_upload(f, f.name) for f in files], progress)
 
 if __name__ == "__main__":
     build_index()
@@ -0,0 +1,115 @@
+
+# rag/jobs.py
+"""
+Background ingestion jobs for the upload API.
+
+`submit_ingest_job` registers a job for a batch of saved uploads and runs
+`ingest_saved_files` on a small worker pool, so the request returns at once
+and the event loop never blocks on parsing or embedding. Per-file status
+(queued -> parsing -> indexing -> done / skipped / failed), chunk counts and
+errors are updated from the ingest progress events (keyed by doc_id, so
+same-named uploads stay apart) and read back with `get_job`. Finished jobs are kept in memory, newest INGEST_JOB_HISTORY only.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional, Tuple
+
+from config.settings import INGEST_JOB_HISTORY, INGEST_JOB_WORKERS
+from rag.ingest import ingest_saved_files, upload_dest
+
+
+class IngestJob:
+    def __init__(self, saved: List[Tuple[str, str]]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.indexed = 0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.files = OrderedDict(
+            (doc_id, {"name": os.path.basename(upload_dest(path)), "doc_id": doc_id, "status": "queued", "blocks": 0, "chunks": 0, "error": None})
+            for path, doc_id in saved
+        )
+        self._lock = threading.Lock()
+
+    def on_progress(self, doc_id: str, event: str, value: Any = None):
+        with self._lock:
+            f = self.files.get(doc_id)
+            if f is None:
+                return
+            if event == "parsing":
+                f["status"] = "parsing"
+            elif event == "parsed":
+                f["status"], f["blocks"] = "indexing", value
+            elif event == "indexed":
+                f["chunks"] += value
+            elif event == "skipped":
+                f["status"], f["error"] = "skipped", value
+            elif event == "failed":
+                f["status"], f["error"] = "failed", value
+
+    def _run(self, saved):
+        with self._lock:
+            self.status, self.started = "running", time.time()
+        try:
+            indexed = ingest_saved_files(saved, progress=self.on_progress)
+            with self._lock:
+                self.indexed = indexed
+                self.status = "done"
+                for f in self.files.values():
+                    if f["status"] in ("queued", "parsing", "indexing"):
+                        f["status"] = "done"
+        except Exception as e:
+            print(f"[WARNING] Ingest job {self.id} failed: {e}")
+            with self._lock:
+                self.status, self.error = "failed", str(e)
+                for f in self.files.values():
+                    if f["status"] not in ("skipped", "failed"):
+                        f["status"] = "failed"
+        finally:
+            with self._lock:
+                self.finished = time.time()
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "indexed": self.indexed,
+                "error": self.error,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "files": [dict(f) for f in self.files.values()],
+            }
+
+
+_jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=max(1, INGEST_JOB_WORKERS), thread_name_prefix="ingest-job")
+
+
+def submit_ingest_job(saved: List[Tuple[str, str]]) -> IngestJob:
+    """Queue saved `(path, doc_id)` uploads (see rag.ingest.save_upload) for ingestion; returns the job."""
+    job = IngestJob(saved)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        # Forget the oldest finished jobs beyond the history limit
+        for job_id in list(_jobs):
+            if len(_jobs) <= INGEST_JOB_HISTORY:
+                break
+            if _jobs[job_id].finished is not None:
+                del _jobs[job_id]
+    _pool.submit(job._run, saved)
+    return job
+
+
+def get_job(job_id: str) -> Optional[IngestJob]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
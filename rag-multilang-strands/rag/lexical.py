@@ -0,0 +1,211 @@
+
+# rag/lexical.py
+"""
+BM25 inverted index kept beside every FAISS segment.
+
+Dense retrieval handles part numbers, model names and capacities ("S25 Ultra
+512GB") poorly, so `write_segment` also writes `bm25.npz` for the same rows:
+the segment's vocabulary, one postings list (row, term frequency) per term and
+every row's length in terms. Segments are immutable, so the postings never
+change; tombstoned rows are masked at query time like in the vector search,
+and compaction rebuilds the file with the merged segment. Segments written
+before this file existed build their postings from the metadata store on the
+first lexical search (`Segment.lexical`).
+
+`search_lexical` scores all segments with corpus-wide statistics (document
+count, average length and document frequency summed over segments) and
+returns the best rows as (text, metadata, coverage), ordered by BM25; coverage
+is the IDF-weighted share of the query words the row contains (0..1), which is
+what the confidence gate compares. `fuse_rrf` merges the dense and lexical
+lists by reciprocal rank.
+
+Terms are case-folded words; words mixing letters and digits ("s25ultra",
+"512gb") are also indexed as their letter and digit runs, so "S25 Ultra"
+finds text extracted as "GalaxyS25Ultra".
+"""
+
+import heapq
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+LEXICAL_FILE = "bm25.npz"
+
+# Okapi BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"\w+")
+_PARTS = re.compile(r"[^\W\d_]+|\d+")
+
+
+def _has_digit(word: str) -> bool:
+    return any(ch.isdigit() for ch in word)
+
+
+def word_parts(word: str) -> List[str]:
+    """Letter and digit runs of a word mixing both ("s25ultra" -> s, 25, ultra), minus single letters."""
+    if not _has_digit(word) or word.isdigit():
+        return []
+    return [p for p in _PARTS.findall(word) if len(p) > 1 or p.isdigit()]
+
+
+def query_words(text: str) -> List[str]:
+    """Case-folded words of `text`, in order."""
+    return _WORD.findall(text.casefold())
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms of `text`: its words plus the letter / digit runs of mixed words."""
+    terms = []
+    for word in query_words(text):
+        terms.append(word)
+        terms.extend(word_parts(word))
+    return terms
+
+
+class LexicalIndex:
+    """Postings of one segment: term -> rows containing it and their term frequencies."""
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, rows: np.ndarray, tfs: np.ndarray, lengths: np.ndarray):
+        self.vocab: Dict[str, int] = {t: i for i, t in enumerate(terms.tolist())}
+        self.offsets = offsets  # int64, len(terms) + 1
+        self.rows = rows        # int32 postings, grouped by term
+        self.tfs = tfs          # float32, parallel to rows
+        self.lengths = lengths  # float32 terms per row
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+        terms = sorted(postings)
+        sizes = [len(postings[t]) for t in terms]
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        np.cumsum(sizes, out=offsets[1:])
+        flat = [p for t in terms for p in postings[t]]
+        rows = np.fromiter((r for r, _ in flat), dtype="int32", count=len(flat))
+        tfs = np.fromiter((tf for _, tf in flat), dtype="float32", count=len(flat))
+        return cls(np.asarray(terms, dtype=str), offsets, rows, tfs, np.asarray(lengths, dtype="float32"))
+
+    def write(self, path: str):
+        terms = np.asarray(sorted(self.vocab, key=self.vocab.__getitem__), dtype=str)
+        with open(os.path.join(path, LEXICAL_FILE), "wb") as f:
+            np.savez(f, terms=terms, offsets=self.offsets, rows=self.rows, tfs=self.tfs, lengths=self.lengths)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["LexicalIndex"]:
+        file = os.path.join(path, LEXICAL_FILE)
+        if not os.path.exists(file):
+            return None
+        with np.load(file) as data:
+            return cls(data["terms"], data["offsets"], data["rows"], data["tfs"], data["lengths"])
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        i = self.vocab.get(term)
+        if i is None:
+            return self.rows[:0], self.tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.rows[start:end], self.tfs[start:end]
+
+    def df(self, term: str) -> int:
+        i = self.vocab.get(term)
+        return 0 if i is None else int(self.offsets[i + 1] - self.offsets[i])
+
+
+def knows_word(indexes: List[LexicalIndex], word: str) -> bool:
+    """True if `word` (or every letter / digit run of it) occurs in some segment."""
+    if any(word in ix.vocab for ix in indexes):
+        return True
+    parts = word_parts(word)
+    return bool(parts) and all(any(p in ix.vocab for ix in indexes) for p in parts)
+
+
+def _idf(n_docs: int, df: int) -> float:
+    return math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+def search_lexical(
+    segments, query: str, top_k: int, tombstones: Optional[Dict[str, np.ndarray]] = None
+) -> List[Tuple[str, dict, float]]:
+    """BM25 top-k over all segments as (text, metadata, coverage), best first."""
+    words = list(dict.fromkeys(query_words(query)))
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not words or not segments:
+        return []
+    tombstones = tombstones or {}
+    indexes = [seg.lexical for seg in segments]
+    n_docs = sum(len(ix.lengths) for ix in indexes)
+    if not n_docs:
+        return []
+    avg_len = max(sum(float(ix.lengths.sum()) for ix in indexes) / n_docs, 1.0)
+    dfs = {t: sum(ix.df(t) for ix in indexes) for t in terms}
+    idf = {t: _idf(n_docs, df) for t, df in dfs.items() if df}
+    if not idf:
+        return []
+    # Coverage counts whole query words (a word found only as its letter / digit
+    # runs counts too); words missing from the corpus count with the highest IDF.
+    word_idf = {w: _idf(n_docs, dfs[w]) for w in words}
+    total = sum(word_idf.values())
+
+    hits = []
+    for seg, ix in zip(segments, indexes):
+        n = len(ix.lengths)
+        scores = np.zeros(n, dtype="float32")
+        norm = BM25_K1 * (1.0 - BM25_B + BM25_B * ix.lengths / avg_len)
+        for term, w in idf.items():
+            rows, tfs = ix.postings(term)
+            if len(rows):
+                scores[rows] += w * tfs * (BM25_K1 + 1.0) / (tfs + norm[rows])
+        dead = tombstones.get(seg.name)
+        if dead is not None:
+            m = min(len(dead), n)
+            scores[:m][dead[:m]] = 0.0
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            continue
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        covered = np.zeros(len(candidates), dtype="float32")
+        for word, w in word_idf.items():
+            found = np.isin(candidates, ix.postings(word)[0])
+            parts = word_parts(word)
+            if parts:
+                found |= np.logical_and.reduce([np.isin(candidates, ix.postings(p)[0]) for p in parts])
+            covered += w * found
+        hits.extend((float(scores[i]), float(c) / total, int(i), seg) for i, c in zip(candidates, covered))
+
+    results = []
+    for _, coverage, i, seg in heapq.nlargest(top_k, hits, key=lambda h: h[0]):
+        text, meta = seg.meta.get(i)
+        results.append((text, meta, coverage))
+    return results
+
+
+def fuse_rrf(result_lists: List[List[Tuple[str, dict, float]]], top_k: int, k: int = 60) -> List[Tuple[str, dict, float]]:
+    """
+    Reciprocal rank fusion: rank rows by the sum of 1 / (k + rank) over the
+    lists they appear in. Scores of different lists do not compare (cosine
+    similarity vs. BM25 term coverage), so a row carries its score from the
+    first list only, 0.0 if only later lists found it: fusing [dense, lexical]
+    keeps the dense similarity the confidence gate reads.
+    """
+    fused: Dict[str, list] = {}
+    for i, results in enumerate(result_lists):
+        for rank, (text, meta, score) in enumerate(results):
+            key = meta.get("chunk_id") or text
+            entry = fused.get(key)
+            if entry is None:
+                fused[key] = [1.0 / (k + rank + 1), text, meta, score if i == 0 else 0.0]
+            else:
+                entry[0] += 1.0 / (k + rank + 1)
+    best = heapq.nlargest(top_k, fused.values(), key=lambda e: e[0])
+    return [(text, meta, score) for _, text, meta, score in best]
@@ -0,0 +1,199 @@
+
+# rag/metastore.py
+"""
+Binary, memory-mapped chunk metadata for FaissStore (replaces meta.json).
+
+Layout inside the index directory:
+  meta_rows.bin   fixed-size records, one per FAISS id (ROW_DTYPE)
+  meta_texts.bin  UTF-8 chunk texts, back to back
+  meta_blobs.bin  UTF-8 JSON metadata blobs
+
+Each row holds offsets into the two blob files plus the chunk id. Metadata is
+split into the block part shared by every chunk of a parsed block (source,
+lang, table_html, table translations, ...), which is written once per append
+batch and referenced by all its chunks, and a small per-chunk part (text
+translations). Files are append-only: blobs are written before the rows that
+point at them, so a reader that mapped N rows always sees complete data, and
+`get(i)` decodes only the row asked for.
+
+`python -m rag.metastore migrate [persist_dir]` converts an existing meta.json.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+ROWS_FILE = "meta_rows.bin"
+TEXTS_FILE = "meta_texts.bin"
+BLOBS_FILE = "meta_blobs.bin"
+LEGACY_META_FILE = "meta.json"
+
+ROW_DTYPE = np.dtype([
+    ("text_off", "<u8"),
+    ("text_len", "<u4"),
+    ("block_off", "<u8"),
+    ("block_len", "<u4"),
+    ("extra_off", "<u8"),
+    ("extra_len", "<u4"),
+    ("chunk_id", "S16"),
+])
+
+
+def make_chunk_id(text: str, meta: dict) -> str:
+    """Stable id for a chunk: hash of its source and text (survives re-saves and reloads)."""
+    h = hashlib.sha1(f"{meta.get('source', '')}\x00{text}".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _split_meta(meta: dict) -> Tuple[str, dict, dict]:
+    """Split a chunk's metadata into (chunk_id, shared block part, per-chunk part)."""
+    block = {k: v for k, v in meta.items() if k not in ("chunk_id", "translations")}
+    extra = {}
+    for lang, fields in (meta.get("translations") or {}).items():
+        if "table" in fields:
+            block.setdefault("translations", {}).setdefault(lang, {})["table"] = fields["table"]
+        if "text" in fields:
+            extra.setdefault("translations", {}).setdefault(lang, {})["text"] = fields["text"]
+    return meta.get("chunk_id") or "", block, extra
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MetaStore:
+    def __init__(self, persist_dir: str):
+        self.persist_dir = persist_dir
+        self.rows_path = os.path.join(persist_dir, ROWS_FILE)
+        self.texts_path = os.path.join(persist_dir, TEXTS_FILE)
+        self.blobs_path = os.path.join(persist_dir, BLOBS_FILE)
+        self._open()
+
+    @staticmethod
+    def exists(persist_dir: str) -> bool:
+        return os.path.exists(os.path.join(persist_dir, ROWS_FILE))
+
+    def _open(self):
+        # Map the rows first: blob files only ever grow past what these rows reference.
+        rows = _map(self.rows_path)
+        self._rows_map = rows
+        if rows is None:
+            self._rows = np.zeros(0, dtype=ROW_DTYPE)
+        else:
+            n = len(rows) // ROW_DTYPE.itemsize
+            self._rows = np.frombuffer(rows, dtype=ROW_DTYPE, count=n)
+        self._texts = _map(self.texts_path)
+        self._blobs = _map(self.blobs_path)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, i: int) -> Tuple[str, dict]:
+        """Decode row `i` into (text, metadata)."""
+        row = self._rows[i]
+        text_off, text_len = int(row["text_off"]), int(row["text_len"])
+        text = self._texts[text_off:text_off + text_len].decode("utf-8") if text_len else ""
+        meta = self._read_blob(int(row["block_off"]), int(row["block_len"]))
+        extra = self._read_blob(int(row["extra_off"]), int(row["extra_len"]))
+        for lang, fields in (extra.get("translations") or {}).items():
+            meta.setdefault("translations", {}).setdefault(lang, {}).update(fields)
+        chunk_id = row["chunk_id"].decode("ascii")
+        if chunk_id:
+            meta["chunk_id"] = chunk_id
+        return text, meta
+
+    def _read_blob(self, off: int, length: int) -> dict:
+        if not length:
+            return {}
+        return json.loads(self._blobs[off:off + length].decode("utf-8"))
+
+    def append(self, texts: List[str], metadatas: List[dict]):
+        """Append rows for `texts`/`metadatas` (same length) and remap."""
+        if not texts:
+            return
+        rows = np.zeros(len(texts), dtype=ROW_DTYPE)
+        block_refs = {}
+        with open(self.texts_path, "ab") as tf, open(self.blobs_path, "ab") as bf:
+            text_pos, blob_pos = tf.tell(), bf.tell()
+            for r, (text, meta) in enumerate(zip(texts, metadatas)):
+                tb = text.encode("utf-8")
+                tf.write(tb)
+                rows[r]["text_off"], rows[r]["text_len"] = text_pos, len(tb)
+                text_pos += len(tb)
+
+                chunk_id, block, extra = _split_meta(meta)
+                rows[r]["chunk_id"] = chunk_id.encode("ascii")
+                bb = json.dumps(block, ensure_ascii=False, sort_keys=True).encode("utf-8")
+                # Chunks of one block share identical block metadata (often a whole
+                # table_html); store it once per batch.
+                ref = block_refs.get(bb)
+                if ref is None:
+                    bf.write(bb)
+                    ref = block_refs[bb] = (blob_pos, len(bb))
+                    blob_pos += len(bb)
+                rows[r]["block_off"], rows[r]["block_len"] = ref
+                if extra:
+                    eb = json.dumps(extra, ensure_ascii=False).encode("utf-8")
+                    bf.write(eb)
+                    rows[r]["extra_off"], rows[r]["extra_len"] = blob_pos, len(eb)
+                    blob_pos += len(eb)
+            tf.flush()
+            bf.flush()
+            os.fsync(tf.fileno())
+            os.fsync(bf.fileno())
+        with open(self.rows_path, "ab") as rf:
+            rf.write(rows.tobytes())
+            rf.flush()
+            os.fsync(rf.fileno())
+        self._open()
+
+    def truncate(self, n: int):
+        """
+        Drop rows from `n` on (e.g. left behind by an interrupted save). The rows
+        file is rewritten and swapped in, so readers that mapped the old file
+        keep a valid view.
+        """
+        if n >= len(self):
+            return
+        tmp_path = self.rows_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._rows[:n].tobytes())
+        os.replace(tmp_path, self.rows_path)
+        self._open()
+
+
+def migrate_meta_json(persist_dir: str) -> int:
+    """
+    Convert `persist_dir/meta.json` into the binary store, written next to it.
+    The JSON file is left in place (it may be tracked seed data); once the
+    rows file exists, `MetaStore.exists` is true and it is no longer read.
+    Returns the number of rows migrated.
+    """
+    json_path = os.path.join(persist_dir, LEGACY_META_FILE)
+    with open(json_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    texts = meta["texts"]
+    metadatas = [dict(m, chunk_id=m.get("chunk_id") or make_chunk_id(t, m)) for t, m in zip(texts, meta["metadatas"])]
+    # Rows are written after the blobs, so an interrupted run leaves no visible rows.
+    store = MetaStore(persist_dir)
+    if len(store):
+        raise RuntimeError(f"{persist_dir} already has a binary metadata store")
+    store.append(texts, metadatas)
+    print(f"[MetaStore] Migrated {len(texts)} rows from {json_path}")
+    return len(texts)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "migrate":
+        from config.settings import FAISS_DIR
+        migrate_meta_json(sys.argv[2] if len(sys.argv) > 2 else FAISS_DIR)
+    else:
+        print("usage: python -m rag.metastore migrate [persist_dir]")
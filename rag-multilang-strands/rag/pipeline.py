@@ -0,0 +1,172 @@
+
+# rag/pipeline.py
+"""
+Minimal staged pipeline: worker threads per stage, connected by bounded
+queues.
+
+Each stage function is called as `fn(item, emit)` and may emit any number of
+items downstream. A full queue blocks the upstream workers (backpressure), so
+at most `queue_size` items sit between two stages and every stage runs as soon
+as it has input. A stage can also pass `flush(emit)`, called once after its
+input is exhausted (used to emit a final partial batch).
+
+Per-stage counters (items in/out, busy and blocked time) are kept in
+`StageStats`; `Pipeline.run` returns them. The first exception raised by any
+stage stops the pipeline and is re-raised from `run`.
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+_DONE = object()
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_s = 0.0  # summed over workers
+        self.blocked_s = 0.0  # time spent waiting on a full downstream queue
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def as_dict(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started if self.started is not None else 0.0
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "busy_s": round(self.busy_s, 3),
+            "blocked_s": round(self.blocked_s, 3),
+            "elapsed_s": round(elapsed, 3),
+            "items_per_s": round(self.items_in / self.busy_s * self.workers, 1) if self.busy_s else None,
+        }
+
+
+class _Stage:
+    def __init__(self, name: str, fn: Callable, workers: int, flush: Optional[Callable]):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.flush = flush
+        self.stats = StageStats(name, self.workers)
+        self.inbox: "queue.Queue" = None
+        self.outbox: Optional["queue.Queue"] = None
+        self.next: Optional["_Stage"] = None
+        self._remaining = self.workers
+        self._lock = threading.Lock()
+
+
+class Pipeline:
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._stages: List[_Stage] = []
+        self._error: Optional[BaseException] = None
+        self._abort = threading.Event()
+
+    def stage(self, name: str, fn: Callable[[Any, Callable[[Any], None]], None], workers: int = 1,
+              flush: Optional[Callable[[Callable[[Any], None]], None]] = None) -> "Pipeline":
+        self._stages.append(_Stage(name, fn, workers, flush))
+        return self
+
+    def _put(self, q: "queue.Queue", item) -> float:
+        """Put with backpressure; returns the seconds spent blocked."""
+        t0 = time.perf_counter()
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        return time.perf_counter() - t0
+
+    def _get(self, q: "queue.Queue"):
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _worker(self, st: _Stage):
+        stats = st.stats
+        blocked = [0.0]
+
+        def emit(item):
+            if st.outbox is not None:
+                blocked[0] += self._put(st.outbox, item)
+            with stats._lock:
+                stats.items_out += 1
+
+        try:
+            while True:
+                item = self._get(st.inbox)
+                if item is _DONE:
+                    break
+                with stats._lock:
+                    stats.items_in += 1
+                    if stats.started is None:
+                        stats.started = time.perf_counter()
+                t0 = time.perf_counter()
+                blocked[0] = 0.0
+                st.fn(item, emit)
+                with stats._lock:
+                    stats.busy_s += time.perf_counter() - t0 - blocked[0]
+                    stats.blocked_s += blocked[0]
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._abort.set()
+        finally:
+            with st._lock:
+                st._remaining -= 1
+                last = st._remaining == 0
+            if last:
+                self._finish_stage(st, emit)
+
+    def _finish_stage(self, st: _Stage, emit):
+        try:
+            if st.flush is not None and not self._abort.is_set():
+                st.flush(emit)
+        except BaseException as e:
+            if self._error is None:
+                self._error = e
+            self._abort.set()
+        st.stats.finished = time.perf_counter()
+        if st.next is not None:
+            for _ in range(st.next.workers):
+                self._put(st.next.inbox, _DONE)
+
+    def run(self, items: Iterable) -> List[StageStats]:
+        """Feed `items` through every stage and block until all are done."""
+        if not self._stages:
+            return []
+        for st in self._stages:
+            st.inbox = queue.Queue(maxsize=self.queue_size)
+        for st, nxt in zip(self._stages, self._stages[1:]):
+            st.outbox = nxt.inbox
+            st.next = nxt
+        threads = [
+            threading.Thread(target=self._worker, args=(st,), name=f"pipeline-{st.name}-{i}", daemon=True)
+            for st in self._stages for i in range(st.workers)
+        ]
+        for t in threads:
+            t.start()
+        first = self._stages[0]
+        for item in items:
+            if self._abort.is_set():
+                break
+            self._put(first.inbox, item)
+        for _ in range(first.workers):
+            self._put(first.inbox, _DONE)
+        for t in threads:
+            t.join()
+        if self._error is not None:
+            raise self._error
+        return [st.stats for st in self._stages]
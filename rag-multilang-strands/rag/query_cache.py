@@ -0,0 +1,102 @@
+
+# rag/query_cache.py
+"""
+In-memory caches for the query path.
+
+`TTLCache` is a small thread-safe LRU with per-entry expiry and hit/miss
+counters. The query cache built on it maps a normalized user query to its
+detected language, English translation and float32 query vector, so repeated
+questions skip language detection, Translate and the embedding round-trip.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional
+
+import numpy as np
+
+from config.settings import QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                expires_at, value = entry
+                if expires_at >= time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+class QueryAnalysis(NamedTuple):
+    lang: str
+    english: str
+    vector: np.ndarray  # float32, shape (dim,)
+
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: NFKC, case-folded, whitespace collapsed."""
+    return _WS.sub(" ", unicodedata.normalize("NFKC", query)).strip().casefold()
+
+
+_query_cache = TTLCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+
+def get_query_cache() -> TTLCache:
+    return _query_cache
+
+
+def lookup_query(query: str) -> Optional[QueryAnalysis]:
+    return _query_cache.get(normalize_query(query))
+
+
+def store_query(query: str, analysis: QueryAnalysis):
+    _query_cache.set(normalize_query(query), analysis)
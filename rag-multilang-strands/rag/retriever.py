@@ -1,14 +1,19 @@
 
 # rag/retriever.py
-from typing import List, Tuple
-import re
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple
+import numpy as np
 from rag.embeddings import embed_texts
-from rag.vectorstore_faiss import FaissStore
+from rag.index_manager import get_index_manager
 from config.bedrock_client import translate_client
-from config.settings import FAISS_DIR, TOP_K
+# translate_text lives in rag.translation; kept importable from here for existing callers
+from rag.translation import snippet_id, translate_many, translate_many_async, translate_text
+from config.settings import HYBRID_FETCH_K, KEYWORD_MAX_WORDS, KEYWORD_MIN_COVERAGE, RRF_K, TOP_K
+from rag.lexical import fuse_rrf, query_words
 from nlp.language import detect_lang
+from rag.query_cache import QueryAnalysis, lookup_query, normalize_query, store_query
 
-def translate_query_to_english(query: str) -> str:
+def translate_query_to_english(query: str, query_lang: Optional[str] = None) -> str:
     """
     Translate a non-English query to English for consistent embedding space retrieval.
     
@@ -19,11 +24,13 @@ def translate_query_to_english(query: str) -> str:
     
     Args:
         query: The user's query (potentially non-English)
+        query_lang: Language of `query` if the caller already detected it
         
     Returns:
         Query translated to English (or original if already English)
     """
-    query_lang = detect_lang(query)
+    if query_lang is None:
+        query_lang = detect_lang(query)
     
     # If already English, return as-is
     if query_lang == "en":
@@ -44,35 +51,62 @@ def translate_query_to_english(query: str) -> str:
         print(f"[WARNING] Query translation failed ({query_lang}): {e}. Using original query.")
         return query
 
-def translate_text(text: str, source_lang: str, target_lang: str) -> str:
-    if source_lang == target_lang:
-        return text
-    # Preserve financial data: numbers, currencies
-    # Split text into translatable and non-translatable parts
-    parts = re.split(r'(\d+(?:\.\d+)?|\$\d+(?:\.\d+)?|\d+\$)', text)
-    translated_parts = []
-    client = translate_client()
-    try:
-        for part in parts:
-            if re.match(r'\d+(?:\.\d+)?|\$\d+(?:\.\d+)?|\d+\$', part):
-                # Keep as is
-                translated_parts.append(part)
-            else:
-                if part.strip():
-                    response = client.translate_text(
-                        Text=part,
-                        SourceLanguageCode=source_lang,
-                        TargetLanguageCode=target_lang
-                    )
-                    translated_parts.append(response["TranslatedText"])
-                else:
-                    translated_parts.append(part)
-        return ''.join(translated_parts)
-    except Exception as e:
-        print(f"Translation failed: {e}")
-        return text  # Fallback to original
+def analyze_query(query: str, lang: Optional[str] = None) -> QueryAnalysis:
+    """
+    Detect the query language (unless the caller passes `lang`), translate the
+    query to English and embed it.
+
+    Results are cached by normalized query text (rag.query_cache), so a repeated
+    question costs no language detection, Translate or embedding call.
+    """
+    cached = lookup_query(query)
+    if cached is not None:
+        return cached
+
+    if lang is None:
+        lang = detect_lang(query)
+    # Translate query to English if needed (CRITICAL for multilingual support)
+    english_query = translate_query_to_english(query, lang)
+    # Embed the English query (now in same space as documents)
+    vec = np.asarray(embed_texts([english_query])[0], dtype="float32")
+
+    analysis = QueryAnalysis(lang=lang, english=english_query, vector=vec)
+    # A failed translation falls back to the original text; don't pin that in the cache.
+    if lang == "en" or english_query != query:
+        store_query(query, analysis)
+    return analysis
 
-def retrieve_context(query: str) -> List[Tuple[str, dict, float]]:
+def analyze_queries(queries: List[str]) -> List[QueryAnalysis]:
+    """
+    `analyze_query` for a batch. Queries not in the query cache are handled
+    together: languages detected, the non-English ones translated to English
+    concurrently and all of them embedded in one `embed_texts` call. Repeats
+    of a query (after normalization) are analyzed once.
+    """
+    out: List[Optional[QueryAnalysis]] = [lookup_query(q) for q in queries]
+    todo = {}
+    for i, (query, cached) in enumerate(zip(queries, out)):
+        if cached is None:
+            todo.setdefault(normalize_query(query), []).append(i)
+    if not todo:
+        return out
+
+    firsts = [queries[rows[0]] for rows in todo.values()]
+    langs = [detect_lang(q) for q in firsts]
+    # None marks a failed translation: it falls back to the query and is not cached
+    english = translate_many([("query:" + snippet_id(q), q, lang) for q, lang in zip(firsts, langs)], "en",
+                             fallback_to_source=False)
+    english = [en if en is not None else q for q, en in zip(firsts, english)]
+    vectors = np.asarray(embed_texts(english), dtype="float32")
+    for query, lang, english_query, vec, rows in zip(firsts, langs, english, vectors, todo.values()):
+        analysis = QueryAnalysis(lang=lang, english=english_query, vector=vec)
+        if lang == "en" or english_query != query:
+            store_query(query, analysis)
+        for i in rows:
+            out[i] = analysis
+    return out
+
+def retrieve_context(query: str, analysis: Optional[QueryAnalysis] = None) -> List[Tuple[str, dict, float]]:
     """
     Retrieve relevant context chunks for the user's query.
     
@@ -82,41 +116,126 @@ def retrieve_context(query: str) -> List[Tuple[str, dict, float]]:
     
     Args:
         query: User's query (can be any language)
+        analysis: Result of `analyze_query(query)` if the caller already has it
         
     Returns:
         List of (text, metadata, similarity_score) tuples
     """
-    # Step 1: Translate query to English if needed (CRITICAL for multilingual support)
-    english_query = translate_query_to_english(query)
-    
-    # Step 2: Embed the English query (now in same space as documents)
-    vec = embed_texts([english_query])[0]
-    
-    # Step 3: Search FAISS index
-    store = FaissStore(dim=len(vec), persist_dir=FAISS_DIR)
-    return store.search(vec, TOP_K)
+    if analysis is None:
+        analysis = analyze_query(query)
+
+    # Search the process-wide FAISS index (loaded once, hot-reloaded on ingest)
+    if HYBRID_FETCH_K <= 0:
+        return get_index_manager().search(analysis.vector, TOP_K)
+    # Dense and BM25 (on the English query) from one snapshot, fused by rank;
+    # rows keep their dense similarity for the confidence gate
+    store = get_index_manager().store()
+    dense = store.search(analysis.vector, max(HYBRID_FETCH_K, TOP_K))
+    lexical = store.search_lexical(analysis.english, max(HYBRID_FETCH_K, TOP_K))
+    return fuse_rrf([dense, lexical], TOP_K, k=RRF_K)
+
+def retrieve_contexts(queries: List[str], analyses: Optional[List[QueryAnalysis]] = None) -> List[List[Tuple[str, dict, float]]]:
+    """
+    `retrieve_context` for a batch: the query vectors are stacked into one
+    (n, dim) matrix and searched with one FAISS call per segment; the BM25 side
+    and the fusion run per query. All queries see the same index snapshot.
+    """
+    if analyses is None:
+        analyses = analyze_queries(queries)
+    if not analyses:
+        return []
+    store = get_index_manager().store()
+    matrix = np.stack([a.vector for a in analyses])
+    if HYBRID_FETCH_K <= 0:
+        return store.search_many(matrix, TOP_K)
+    fetch_k = max(HYBRID_FETCH_K, TOP_K)
+    dense = store.search_many(matrix, fetch_k)
+    return [
+        fuse_rrf([hits, store.search_lexical(a.english, fetch_k)], TOP_K, k=RRF_K)
+        for hits, a in zip(dense, analyses)
+    ]
+
+def keyword_fast_path(query: str) -> Optional[List[Tuple[str, dict, float]]]:
+    """
+    BM25 results for a short keyword query ("S25 Ultra 512GB price"), or None.
+
+    Applies to queries of at most KEYWORD_MAX_WORDS words, at least one with a
+    digit (model names, capacities, part numbers) and all of them in the index
+    vocabulary, so no translation is needed. The results stand in for
+    `retrieve_context` (no embedding call) when the best row covers at least
+    KEYWORD_MIN_COVERAGE of the query terms; otherwise the caller takes the
+    normal dense + lexical path.
+    """
+    words = query_words(query)
+    if not words or len(words) > KEYWORD_MAX_WORDS or not any(ch.isdigit() for w in words for ch in w):
+        return None
+    store = get_index_manager().store()
+    if not store.knows_words(words):
+        return None
+    results = store.search_lexical(query, TOP_K)
+    if not results or results[0][2] < KEYWORD_MIN_COVERAGE:
+        return None
+    return results
+
+def _plan_context(results: List[Tuple[str, dict, float]], user_lang: str):
+    # Use translations stored at ingest (PRETRANSLATE_LANGS) when present; collect
+    # everything else so it can be translated in one concurrent round (cached per
+    # snippet id / language pair). Repeated rows (same text from another list or
+    # document) are dropped. A table row stands for its table, which goes into the
+    # prompt once as the original HTML, so table text is not translated.
+    jobs = []
+    layout = []
+    seen = set()
+    for txt, meta, score in results:
+        key = ("table", meta["table_html"]) if "table_html" in meta else ("text", normalize_query(txt))
+        if key[1] and key in seen:
+            continue
+        seen.add(key)
+        text_part = None
+        stored = (meta.get("translations") or {}).get(user_lang, {})
+        if key[0] == "text" and txt.strip():  # Only translate non-empty text
+            if "text" in stored:
+                text_part = stored["text"]
+            else:
+                text_part = len(jobs)
+                jobs.append((meta.get("chunk_id") or snippet_id(txt), txt, meta.get("lang", "en")))
+        layout.append((meta, score, text_part))
+    return jobs, layout
+
+
+def _assemble_context(layout, translated: List[str]) -> dict:
+    def _resolve(part):
+        return translated[part] if isinstance(part, int) else part
 
-def format_context_snippets(results: List[Tuple[str, dict, float]], user_lang: str) -> str:
     blocks = []
     tables = []
     images = []
-    for txt, meta, score in results:
-        source_lang = meta.get("lang", "en")
-        if txt.strip():  # Only translate non-empty text
-            translated_txt = translate_text(txt, source_lang, user_lang)
-            blocks.append(f"[source: {meta.get('source')}] {translated_txt}")
+    # Context in retrieval order, for prompt assembly (nlp.prompts.build_prompt)
+    items = []
+    for meta, score, text_part in layout:
+        source = meta.get("source")
+        if text_part is not None:
+            text = _resolve(text_part)
+            blocks.append(f"[source: {source}] {text}")
+            items.append({"kind": "text", "source": source, "text": text, "score": score})
         if "table_html" in meta:
-            # Translate text inside HTML
-            html = meta["table_html"]
-            # Simple: translate text between tags, but for now, translate the whole as text then put back? Complicated.
-            # For simplicity, translate the plain_text if available, but since table has plain_text, use that.
-            if "plain_text" in meta:
-                translated_flat = translate_text(meta["plain_text"], source_lang, user_lang)
-                # But to keep HTML, perhaps replace text in HTML.
-                # For now, include translated flat as context.
-                blocks.append(f"[table: {meta.get('source')}] {translated_flat}")
-            tables.append(meta["table_html"])  # Keep original HTML for now
+            tables.append(meta["table_html"])
+            items.append({"kind": "table", "source": source, "text": meta["table_html"], "score": score})
         if "image_path" in meta:
             images.append(meta["image_path"])
     context = "\n\n".join(blocks)
-    return {"ctx_text": context, "tables": tables, "images": images}
+    return {"ctx_text": context, "tables": tables, "images": images, "items": items}
+
+
+def format_context_snippets(results: List[Tuple[str, dict, float]], user_lang: str) -> dict:
+    jobs, layout = _plan_context(results, user_lang)
+    translated = translate_many(jobs, user_lang) if jobs else []
+    return _assemble_context(layout, translated)
+
+
+async def format_context_snippets_async(results: List[Tuple[str, dict, float]], user_lang: str,
+                                        executor: Optional[Executor] = None) -> dict:
+    """`format_context_snippets` with the snippet translations awaited concurrently (on `executor` if given)."""
+    jobs, layout = _plan_context(results, user_lang)
+    translated = await translate_many_async(jobs, user_lang, executor=executor) if jobs else []
+    return _assemble_context(layout, translated)
@@ -0,0 +1,536 @@
+
+# rag/segments.py
+"""
+Append-only, segmented persistence for the FAISS index.
+
+Every save writes its new vectors and metadata into a fresh, immutable segment
+directory (`seg-<id>/faiss.index` or `faiss.bindex`, `vectors.f32`, the
+rag.metastore files and the rag.lexical BM25 postings, index type per
+rag.index_factory) and then
+publishes it by rewriting the small `manifest.json`. Nothing already on disk
+is rewritten, so the cost of an upload scales with the upload.
+
+Searches fan out over all segments and merge the top-k. To keep the fan-out
+small, `compact()` merges the smallest segments into one once there are more
+than SEGMENT_MAX_COUNT; it runs in a background thread after saves (or via
+`python -m rag.segments compact`). Segments replaced by a compaction are
+retired and deleted after SEGMENT_RETIRE_GRACE seconds, so readers still
+holding the previous manifest can finish loading.
+
+Rows whose chunks carry a `doc_id` are registered per document in the
+manifest (`documents`: source file, chunk count and the [segment, start, count]
+row ranges holding it). Committing a segment replaces any other live document
+with the same source, and deleting a document only records its ranges in
+`tombstones`; searches skip tombstoned rows, and compaction drops them for
+good (also for a single segment once SEGMENT_TOMBSTONE_RATIO of it is dead).
+
+A pre-segment index directory (faiss.index + metadata at the top level) is
+read in place as the segment named ".".
+"""
+
+import contextlib
+import heapq
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from config.settings import SEGMENT_MAX_COUNT, SEGMENT_MERGE_FACTOR, SEGMENT_RETIRE_GRACE, SEGMENT_TOMBSTONE_RATIO
+from rag.binary_index import BINARY_INDEX_FILE, BinaryRerankIndex, load_binary_index, write_binary_index
+from rag.index_factory import apply_search_params, build_index, index_type_of
+from rag.lexical import LexicalIndex
+from rag.metastore import BLOBS_FILE, LEGACY_META_FILE, ROW_DTYPE, ROWS_FILE, TEXTS_FILE, MetaStore, migrate_meta_json
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+INDEX_FILE = "faiss.index"
+# Raw float32 vectors (n x dim) kept beside each segment's index: ANN/PQ
+# indexes cannot give exact vectors back, compaction retrains from these and
+# binary segments re-rank from them (memory-mapped).
+VECTORS_FILE = "vectors.f32"
+LEGACY_SEGMENT = "."
+
+# Name of the small file ingest bumps after every successful save. Long-lived
+# readers (see rag.index_manager) poll it instead of re-reading the index.
+GENERATION_FILE = "generation"
+
+
+def read_generation(persist_dir: str) -> int:
+    """Return the published index generation for `persist_dir` (0 if never published)."""
+    path = os.path.join(persist_dir, GENERATION_FILE)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def publish_generation(persist_dir: str) -> int:
+    """Increment and atomically write the generation counter; returns the new value."""
+    generation = read_generation(persist_dir) + 1
+    _atomic_write(os.path.join(persist_dir, GENERATION_FILE), str(generation))
+    return generation
+
+
+def _atomic_write(path: str, content: str):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+_thread_lock = threading.RLock()
+# Depth of manifest_lock held by the current thread: a nested acquire must not
+# flock again (a second descriptor of the lock file would wait on the first)
+_lock_depth = threading.local()
+
+
+@contextlib.contextmanager
+def manifest_lock(persist_dir: str):
+    """Serialize manifest updates across threads (and processes, where fcntl exists); re-entrant."""
+    with _thread_lock:
+        depth = getattr(_lock_depth, "n", 0)
+        if fcntl is None or depth:
+            _lock_depth.n = depth + 1
+            try:
+                yield
+            finally:
+                _lock_depth.n = depth
+            return
+        with open(os.path.join(persist_dir, LOCK_FILE), "a") as fh:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            _lock_depth.n = 1
+            try:
+                yield
+            finally:
+                _lock_depth.n = 0
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+def _legacy_count(persist_dir: str) -> int:
+    # Rows of the pre-segment index: from the metadata store if migrated, else the FAISS header
+    rows_path = os.path.join(persist_dir, ROWS_FILE)
+    if os.path.exists(rows_path):
+        return os.path.getsize(rows_path) // ROW_DTYPE.itemsize
+    path = os.path.join(persist_dir, INDEX_FILE)
+    try:
+        return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY).ntotal
+    except RuntimeError:  # index types without mmap support
+        return faiss.read_index(path).ntotal
+
+
+def read_manifest(persist_dir: str) -> dict:
+    path = os.path.join(persist_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for seg in manifest["segments"]:
+            if seg.get("count") is None and seg["name"] == LEGACY_SEGMENT:
+                # Written before the legacy count was always known
+                seg["count"] = _legacy_count(persist_dir)
+        return manifest
+    manifest = {"version": 1, "segments": [], "retired": [], "documents": {}, "tombstones": {}}
+    if os.path.exists(os.path.join(persist_dir, INDEX_FILE)):
+        manifest["segments"].append({"name": LEGACY_SEGMENT, "count": _legacy_count(persist_dir)})
+    return manifest
+
+
+def write_manifest(persist_dir: str, manifest: dict):
+    _atomic_write(os.path.join(persist_dir, MANIFEST_FILE), json.dumps(manifest, indent=1))
+
+
+def segment_path(persist_dir: str, name: str) -> str:
+    return persist_dir if name == LEGACY_SEGMENT else os.path.join(persist_dir, name)
+
+
+_lexical_lock = threading.Lock()
+
+
+class Segment:
+    """One immutable slice of the index: a FAISS index plus its metadata rows."""
+
+    def __init__(self, persist_dir: str, name: str):
+        self.name = name
+        self.path = segment_path(persist_dir, name)
+        if not MetaStore.exists(self.path) and os.path.exists(os.path.join(self.path, LEGACY_META_FILE)):
+            # One-time conversion of a pre-segment meta.json; another process may be doing it too
+            with manifest_lock(persist_dir):
+                if not MetaStore.exists(self.path):
+                    migrate_meta_json(self.path)
+        if os.path.exists(os.path.join(self.path, BINARY_INDEX_FILE)):
+            self.index = load_binary_index(self.path, VECTORS_FILE)
+        else:
+            self.index = faiss.read_index(os.path.join(self.path, INDEX_FILE))
+        apply_search_params(self.index)
+        self.meta = MetaStore(self.path)
+        self._lexical: Optional[LexicalIndex] = None
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def lexical(self) -> LexicalIndex:
+        """BM25 postings of this segment (see rag.lexical), loaded on first use."""
+        if self._lexical is None:
+            with _lexical_lock:
+                if self._lexical is None:
+                    # Segments written before bm25.npz existed build theirs from the metadata
+                    self._lexical = LexicalIndex.load(self.path) or LexicalIndex.build(
+                        self.meta.get(i)[0] for i in range(min(self.ntotal, len(self.meta)))
+                    )
+        return self._lexical
+
+    def search(self, q: np.ndarray, top_k: int, dead: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        return self.search_many(q.reshape(1, -1), top_k, dead)[0]
+
+    def search_many(self, q: np.ndarray, top_k: int, dead: Optional[np.ndarray] = None) -> List[List[Tuple[float, int]]]:
+        """One FAISS call for the (n, dim) query matrix `q`; (score, row) hits per query row."""
+        if self.index.ntotal == 0:
+            return [[] for _ in range(len(q))]
+        n_dead = int(dead.sum()) if dead is not None else 0
+        # Over-fetch by the number of tombstoned rows so they cannot crowd out live ones.
+        scores, idxs = self.index.search(q, min(top_k + n_dead, self.index.ntotal))
+        n_rows = len(self.meta)
+        out = []
+        for row_ids, row_scores in zip(idxs, scores):
+            hits = [(float(s), int(i)) for i, s in zip(row_ids, row_scores) if i != -1 and i < n_rows]
+            if n_dead:
+                hits = [(s, i) for s, i in hits if i >= len(dead) or not dead[i]]
+            out.append(hits[:top_k])
+        return out
+
+    def vectors(self) -> np.ndarray:
+        path = os.path.join(self.path, VECTORS_FILE)
+        if os.path.exists(path):
+            return np.fromfile(path, dtype="float32").reshape(-1, self.index.d)
+        # Segments written before VECTORS_FILE existed are always flat.
+        return self.index.reconstruct_n(0, self.index.ntotal)
+
+
+def load_segments(persist_dir: str, manifest: dict, reuse: Optional[Dict[str, Segment]] = None) -> List[Segment]:
+    """Open the manifest's segments, sharing already-open (immutable) ones from `reuse`."""
+    reuse = reuse or {}
+    return [reuse.get(s["name"]) or Segment(persist_dir, s["name"]) for s in manifest["segments"]]
+
+
+def tombstone_masks(manifest: dict) -> Dict[str, np.ndarray]:
+    """Per-segment boolean masks of tombstoned rows (segments without tombstones are omitted)."""
+    counts = {s["name"]: s.get("count") for s in manifest["segments"]}
+    masks = {}
+    for name, ranges in (manifest.get("tombstones") or {}).items():
+        if name not in counts:
+            continue
+        end = max(start + count for start, count in ranges) if ranges else 0
+        mask = np.zeros(max(counts[name] or 0, end), dtype=bool)
+        for start, count in ranges:
+            mask[start:start + count] = True
+        masks[name] = mask
+    return masks
+
+
+def search_segments(
+    segments: List[Segment], query_vec, top_k: int, tombstones: Optional[Dict[str, np.ndarray]] = None
+) -> List[Tuple[str, dict, float]]:
+    """Search every segment and merge into one top-k list of (text, metadata, score)."""
+    return search_segments_many(segments, np.asarray(query_vec, dtype="float32").reshape(1, -1), top_k, tombstones)[0]
+
+
+def search_segments_many(
+    segments: List[Segment], query_vecs, top_k: int, tombstones: Optional[Dict[str, np.ndarray]] = None
+) -> List[List[Tuple[str, dict, float]]]:
+    """`search_segments` for an (n, dim) matrix of queries: one FAISS search per segment, one result list per row."""
+    q = np.ascontiguousarray(query_vecs, dtype="float32")
+    tombstones = tombstones or {}
+    hits = [[] for _ in range(len(q))]
+    for seg in segments:
+        for row_hits, seg_hits in zip(hits, seg.search_many(q, top_k, tombstones.get(seg.name))):
+            row_hits.extend((score, i, seg) for score, i in seg_hits)
+    results = []
+    for row_hits in hits:
+        row = []
+        for score, i, seg in heapq.nlargest(top_k, row_hits, key=lambda h: h[0]):
+            text, meta = seg.meta.get(i)
+            row.append((text, meta, score))
+        results.append(row)
+    return results
+
+
+def write_segment(persist_dir: str, vectors: np.ndarray, texts: List[str], metadatas: List[dict]) -> dict:
+    """Write a new segment directory (not yet visible) and return its manifest entry."""
+    name = f"seg-{uuid.uuid4().hex[:12]}"
+    path = segment_path(persist_dir, name)
+    os.makedirs(path)
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    vectors.tofile(os.path.join(path, VECTORS_FILE))
+    index = build_index(vectors)
+    if isinstance(index, BinaryRerankIndex):
+        write_binary_index(index, path)
+    else:
+        faiss.write_index(index, os.path.join(path, INDEX_FILE))
+    MetaStore(path).append(texts, metadatas)
+    LexicalIndex.build(texts).write(path)
+    return {"name": name, "count": len(texts), "index": index_type_of(index), "created": time.time()}
+
+
+# Page / table suffix the parsers add to a block's source ("file.pdf#p3", "file.docx#t0")
+_BLOCK_SUFFIX = re.compile(r"#[pt]\d+$")
+
+
+def document_source(meta: dict) -> str:
+    """
+    File a chunk was parsed from: `file` as stamped by ingest, or for chunks
+    indexed before that field existed, the block source minus its suffix.
+    """
+    return meta.get("file") or _BLOCK_SUFFIX.sub("", meta.get("source", ""))
+
+
+def document_runs(name: str, metadatas: List[dict]) -> Dict[str, dict]:
+    """Registry entries for the documents in a segment's rows, keyed by `doc_id`."""
+    docs: Dict[str, dict] = {}
+    for row, meta in enumerate(metadatas):
+        doc_id = meta.get("doc_id")
+        if not doc_id:
+            continue
+        doc = docs.setdefault(doc_id, {"source": document_source(meta), "chunks": 0, "added": time.time(), "locations": []})
+        doc["chunks"] += 1
+        last = doc["locations"][-1] if doc["locations"] else None
+        if last is not None and last[1] + last[2] == row:
+            last[2] += 1
+        else:
+            doc["locations"].append([name, row, 1])
+    return docs
+
+
+def tombstone_document(manifest: dict, doc_id: str) -> Optional[dict]:
+    """Drop `doc_id` from the registry and tombstone its rows (manifest updated in place)."""
+    doc = manifest.setdefault("documents", {}).pop(doc_id, None)
+    if doc is not None:
+        tombstones = manifest.setdefault("tombstones", {})
+        for name, start, count in doc["locations"]:
+            tombstones.setdefault(name, []).append([start, count])
+    return doc
+
+
+def commit_segment(persist_dir: str, entry: dict, documents: Optional[Dict[str, dict]] = None) -> int:
+    """
+    Add a written segment to the manifest and publish a new generation.
+    `documents` (see `document_runs`) are registered in the same manifest
+    write; a live document with the same source as one of them is tombstoned,
+    so a re-uploaded file replaces its previous version atomically.
+    """
+    with manifest_lock(persist_dir):
+        manifest = read_manifest(persist_dir)
+        manifest["segments"].append(entry)
+        registry = manifest.setdefault("documents", {})
+        for doc_id, doc in (documents or {}).items():
+            for old_id, old in list(registry.items()):
+                if old_id == doc_id or (doc["source"] and old["source"] == doc["source"]):
+                    tombstone_document(manifest, old_id)
+                    print(f"[DEBUG] Replaced document {old_id} ({old['source']})")
+            registry[doc_id] = doc
+        write_manifest(persist_dir, manifest)
+        return publish_generation(persist_dir)
+
+
+def dead_fraction(manifest: dict, name: str) -> float:
+    seg = next((s for s in manifest["segments"] if s["name"] == name), None)
+    if not seg or not seg.get("count"):
+        return 0.0
+    dead = sum(count for _, count in (manifest.get("tombstones") or {}).get(name, []))
+    return dead / seg["count"]
+
+
+def _remove_segment_files(persist_dir: str, name: str):
+    path = segment_path(persist_dir, name)
+    try:
+        if name == LEGACY_SEGMENT:
+            for fname in (INDEX_FILE, VECTORS_FILE, ROWS_FILE, TEXTS_FILE, BLOBS_FILE, LEGACY_META_FILE):
+                if os.path.exists(os.path.join(path, fname)):
+                    os.remove(os.path.join(path, fname))
+        else:
+            shutil.rmtree(path)
+    except OSError as e:
+        # e.g. still mapped by a reader on Windows; try again on the next purge
+        print(f"[WARNING] Could not remove retired segment {name}: {e}")
+        return False
+    return True
+
+
+def purge_retired(persist_dir: str, grace: float = SEGMENT_RETIRE_GRACE):
+    """Delete retired segments older than `grace` and orphaned segment dirs left by crashed writers."""
+    now = time.time()
+    with manifest_lock(persist_dir):
+        manifest = read_manifest(persist_dir)
+        live = {s["name"] for s in manifest["segments"]}
+        keep = []
+        for r in manifest.get("retired", []):
+            if now - r["at"] < grace or not _remove_segment_files(persist_dir, r["name"]):
+                keep.append(r)
+        known = live | {r["name"] for r in keep}
+        for fname in os.listdir(persist_dir):
+            path = os.path.join(persist_dir, fname)
+            if fname.startswith("seg-") and fname not in known and now - os.path.getmtime(path) > grace:
+                _remove_segment_files(persist_dir, fname)
+        if keep != manifest.get("retired", []):
+            manifest["retired"] = keep
+            write_manifest(persist_dir, manifest)
+
+
+def compact(
+    persist_dir: str,
+    max_segments: int = SEGMENT_MAX_COUNT,
+    merge_factor: int = SEGMENT_MERGE_FACTOR,
+    force: bool = False,
+    tombstone_ratio: float = SEGMENT_TOMBSTONE_RATIO,
+) -> bool:
+    """
+    Merge the smallest segments into one when there are more than
+    `max_segments`, or rewrite segments with at least `tombstone_ratio` of
+    their rows tombstoned (with `force`, merge everything). Tombstoned rows are
+    dropped. The merged segment is built without holding the manifest lock;
+    saves and deletes that land in the meantime are kept. Returns True if a
+    merge was published.
+    """
+    purge_retired(persist_dir)
+    manifest = read_manifest(persist_dir)
+    segments = manifest["segments"]
+    if force:
+        victims = list(segments)
+    elif len(segments) > max_segments:
+        # Merging the smallest segments keeps total rewrite cost logarithmic per row.
+        victims = sorted(segments, key=lambda s: s["count"])[:max(2, merge_factor)]
+    else:
+        victims = [s for s in segments if dead_fraction(manifest, s["name"]) >= tombstone_ratio]
+        if not victims:
+            return False
+    if not victims or (len(victims) < 2 and not manifest.get("tombstones", {}).get(victims[0]["name"])):
+        return False
+
+    masks = tombstone_masks(manifest)
+    loaded = [Segment(persist_dir, s["name"]) for s in victims]
+    keep_rows, row_maps = [], {}
+    offset = 0
+    for seg in loaded:
+        # Sized from the loaded index: the mask may be shorter (or longer) than it
+        dead = masks.get(seg.name)
+        keep = np.ones(seg.ntotal, dtype=bool)
+        if dead is not None:
+            m = min(len(dead), seg.ntotal)
+            keep[:m] &= ~dead[:m]
+        row_map = np.full(seg.ntotal, -1, dtype="int64")
+        row_map[keep] = offset + np.arange(int(keep.sum()))
+        offset += int(keep.sum())
+        keep_rows.append(keep)
+        row_maps[seg.name] = row_map
+    texts, metadatas = [], []
+    for seg, keep in zip(loaded, keep_rows):
+        for i in np.flatnonzero(keep):
+            text, meta = seg.meta.get(int(i))
+            texts.append(text)
+            metadatas.append(meta)
+    entry = None
+    if texts:
+        vectors = np.concatenate([seg.vectors()[keep] for seg, keep in zip(loaded, keep_rows)])
+        entry = write_segment(persist_dir, vectors, texts, metadatas)
+
+    victim_names = [s["name"] for s in victims]
+    with manifest_lock(persist_dir):
+        manifest = read_manifest(persist_dir)
+        names = [s["name"] for s in manifest["segments"]]
+        if not all(n in names for n in victim_names):
+            # Someone else compacted these already; drop our copy.
+            if entry is not None:
+                _remove_segment_files(persist_dir, entry["name"])
+            return False
+        new_name = entry["name"] if entry is not None else None
+        _remap_rows(manifest, row_maps, new_name)
+        manifest["segments"] = [s for s in manifest["segments"] if s["name"] not in victim_names] + ([entry] if entry else [])
+        manifest.setdefault("retired", []).extend({"name": n, "at": time.time()} for n in victim_names)
+        write_manifest(persist_dir, manifest)
+        generation = publish_generation(persist_dir)
+    print(f"[DEBUG] Compacted {len(victim_names)} segments ({len(texts)} rows) into {new_name or 'nothing'} (generation {generation})")
+    return True
+
+
+def _ranges(rows: np.ndarray) -> List[List[int]]:
+    """Collapse sorted row numbers into [start, count] runs."""
+    runs: List[List[int]] = []
+    for r in rows.tolist():
+        if runs and runs[-1][0] + runs[-1][1] == r:
+            runs[-1][1] += 1
+        else:
+            runs.append([r, 1])
+    return runs
+
+
+def _remap_rows(manifest: dict, row_maps: Dict[str, np.ndarray], new_name: Optional[str]):
+    """
+    Point document locations and tombstones of compacted segments at the
+    merged segment. Rows tombstoned before the merge map to -1 and vanish;
+    tombstones added while the merge was running are carried over.
+    """
+    def _moved(name: str, start: int, count: int) -> np.ndarray:
+        rows = row_maps[name][start:start + count]
+        return rows[rows >= 0]
+
+    for doc in (manifest.get("documents") or {}).values():
+        locations = []
+        for name, start, count in doc["locations"]:
+            if name in row_maps:
+                locations.extend([new_name, s, c] for s, c in _ranges(_moved(name, start, count)))
+            else:
+                locations.append([name, start, count])
+        doc["locations"] = locations
+    tombstones = manifest.get("tombstones") or {}
+    carried = []
+    for name in list(tombstones):
+        if name in row_maps:
+            for start, count in tombstones.pop(name):
+                carried.extend(_moved(name, start, count).tolist())
+    if carried:
+        tombstones[new_name] = _ranges(np.unique(np.asarray(carried)))
+    manifest["tombstones"] = tombstones
+
+
+_compacting = threading.Lock()
+
+
+def compact_in_background(persist_dir: str):
+    """Run `compact()` on a daemon thread unless one is already running in this process."""
+    if not _compacting.acquire(blocking=False):
+        return
+
+    def _run():
+        try:
+            while compact(persist_dir):
+                pass
+        except Exception as e:
+            print(f"[WARNING] Segment compaction failed: {e}")
+        finally:
+            _compacting.release()
+
+    threading.Thread(target=_run, name="faiss-compaction", daemon=True).start()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "compact":
+        from config.settings import FAISS_DIR
+        compact(sys.argv[2] if len(sys.argv) > 2 else FAISS_DIR, force=True)
+    else:
+        print("usage: python -m rag.segments compact [persist_dir]")
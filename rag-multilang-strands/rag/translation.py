@@ -0,0 +1,224 @@
+
+# rag/translation.py
+"""
+Snippet translation for context formatting.
+
+Numbers, prices, percentages and measurements are swapped for opaque
+placeholders before the text goes to AWS Translate, so each snippet is sent in
+ONE request and the protected values come back byte-for-byte. If the service
+mangles a placeholder we fall back to translating the text between protected
+values piece by piece (the old behaviour) for that snippet only.
+
+`translate_many` runs a batch of snippets concurrently and caches results by
+(snippet id, source lang, target lang); `translate_many_async` is the same for
+callers on an event loop.
+"""
+
+import asyncio
+import hashlib
+import re
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Hashable, List, Optional, Tuple
+
+from config.bedrock_client import translate_client
+from config.settings import TRANSLATE_CONCURRENCY, TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL
+from rag.query_cache import TTLCache
+
+# Values that must survive translation untouched: currency amounts, numbers with
+# thousands separators / decimals, and numbers glued to a unit or percent sign.
+_UNITS = r"(?:%|(?:mAh|kWh|Wh|GB|TB|MB|KB|GHz|MHz|Hz|MP|fps|mm|cm|km|kg|g|ml|W|V|nits|dpi|ppi|inch(?:es)?)\b)"
+_NUMBER = r"\d+(?:[.,]\d+)*"
+PROTECTED_PATTERN = re.compile(
+    rf"(?:[$€£¥₹]\s?{_NUMBER}(?:\s?(?:[kKmMbB]n?)\b)?"
+    rf"|{_NUMBER}\s?[$€£¥₹]"
+    rf"|\b(?:USD|EUR|GBP|INR|JPY|CNY|KRW)\s?{_NUMBER}"
+    rf"|{_NUMBER}(?:\s?(?:USD|EUR|GBP|INR|JPY|CNY|KRW)\b)?(?:\s?{_UNITS})?)"
+)
+
+# Placeholders are letters only so no target locale rewrites their digits. The
+# index is written in base 16 with the letters A-P, which keeps it unambiguous
+# against the ZQX/XQZ fences even when placeholders end up back to back.
+_PLACEHOLDER = re.compile(r"ZQX([A-P]+)XQZ")
+
+# TranslateText accepts up to 10,000 bytes per request.
+MAX_TRANSLATE_BYTES = 9000
+
+_cache = TTLCache(TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL)
+_pool = ThreadPoolExecutor(max_workers=max(1, TRANSLATE_CONCURRENCY), thread_name_prefix="translate")
+
+
+def _alpha(i: int) -> str:
+    return "".join(chr(ord("A") + int(d, 16)) for d in format(i, "x"))
+
+
+def _alpha_index(s: str) -> int:
+    return int("".join(format(ord(ch) - ord("A"), "x") for ch in s), 16)
+
+
+def mask_protected(text: str) -> Tuple[str, List[str]]:
+    """Replace protected values with placeholders; returns (masked_text, values)."""
+    values: List[str] = []
+
+    def _sub(m: re.Match) -> str:
+        values.append(m.group(0))
+        return f"ZQX{_alpha(len(values) - 1)}XQZ"
+
+    return PROTECTED_PATTERN.sub(_sub, text), values
+
+
+def unmask_protected(text: str, values: List[str]) -> Optional[str]:
+    """Put protected values back; None if any placeholder was lost, duplicated or altered."""
+    seen = []
+
+    def _sub(m: re.Match) -> str:
+        idx = _alpha_index(m.group(1))
+        if idx >= len(values):
+            return m.group(0)
+        seen.append(idx)
+        return values[idx]
+
+    restored = _PLACEHOLDER.sub(_sub, text)
+    if sorted(seen) != list(range(len(values))):
+        return None
+    return restored
+
+
+def _split_for_request(text: str, limit: int = MAX_TRANSLATE_BYTES) -> List[str]:
+    """Split on line boundaries so every piece fits in one TranslateText request."""
+    if len(text.encode("utf-8")) <= limit:
+        return [text]
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        if current and len((current + line).encode("utf-8")) > limit:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _translate_fragments(client, text: str, source_lang: str, target_lang: str) -> str:
+    # Fallback: translate only the text between protected values, one call each.
+    parts = []
+    last = 0
+    for m in PROTECTED_PATTERN.finditer(text):
+        parts.append((text[last:m.start()], True))
+        parts.append((m.group(0), False))
+        last = m.end()
+    parts.append((text[last:], True))
+    out = []
+    for part, translatable in parts:
+        if translatable and part.strip():
+            resp = client.translate_text(Text=part, SourceLanguageCode=source_lang, TargetLanguageCode=target_lang)
+            out.append(resp["TranslatedText"])
+        else:
+            out.append(part)
+    return "".join(out)
+
+
+def _translate_once(client, text: str, source_lang: str, target_lang: str) -> str:
+    masked, values = mask_protected(text)
+    translated = []
+    for piece in _split_for_request(masked):
+        if piece.strip():
+            resp = client.translate_text(Text=piece, SourceLanguageCode=source_lang, TargetLanguageCode=target_lang)
+            translated.append(resp["TranslatedText"])
+        else:
+            translated.append(piece)
+    restored = unmask_protected("".join(translated), values)
+    if restored is None:
+        print(f"[WARNING] Translation altered protected values ({source_lang}->{target_lang}); retrying per fragment.")
+        return _translate_fragments(client, text, source_lang, target_lang)
+    return restored
+
+
+def translate_text(text: str, source_lang: str, target_lang: str, client=None) -> str:
+    """Translate one snippet in a single request, keeping numbers/prices/units intact."""
+    if source_lang == target_lang or not text.strip():
+        return text
+    try:
+        return _translate_once(client or translate_client(), text, source_lang, target_lang)
+    except Exception as e:
+        print(f"Translation failed: {e}")
+        return text  # Fallback to original
+
+
+def snippet_id(text: str) -> str:
+    """Content-derived id for snippets that carry no chunk id (e.g. table flat text)."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _lookup(items: List[Tuple[Hashable, str, str]], target_lang: str):
+    # Resolve what needs no call (same language, blank, cached); group the rest by cache key.
+    results: List[Optional[str]] = [None] * len(items)
+    pending = {}
+    for i, (sid, text, source_lang) in enumerate(items):
+        if source_lang == target_lang or not text.strip():
+            results[i] = text
+            continue
+        key = (sid, source_lang, target_lang)
+        cached = _cache.get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, []).append(i)
+    return results, pending
+
+
+def _translate_key(client, text: str, key) -> Optional[str]:
+    _, source_lang, target_lang = key
+    try:
+        out = _translate_once(client, text, source_lang, target_lang)
+    except Exception as e:
+        print(f"Translation failed: {e}")
+        return None
+    _cache.set(key, out)
+    return out
+
+
+def _fill(results, items, pending, outs, fallback_to_source: bool):
+    for key, out in zip(pending, outs):
+        for i in pending[key]:
+            results[i] = out if out is not None or not fallback_to_source else items[i][1]
+    return results
+
+
+def translate_many(items: List[Tuple[Hashable, str, str]], target_lang: str, fallback_to_source: bool = True) -> List[Optional[str]]:
+    """
+    Translate `(snippet_id, text, source_lang)` items into `target_lang`
+    concurrently, preserving order. Results are cached per
+    (snippet_id, source_lang, target_lang) and identical keys in one batch are
+    translated once. Failed translations are not cached; they come back as the
+    source text, or as None when `fallback_to_source` is False.
+    """
+    results, pending = _lookup(items, target_lang)
+    if not pending:
+        return results
+
+    client = translate_client()
+    outs = _pool.map(lambda key: _translate_key(client, items[pending[key][0]][1], key), list(pending))
+    return _fill(results, items, pending, outs, fallback_to_source)
+
+
+async def translate_many_async(items: List[Tuple[Hashable, str, str]], target_lang: str,
+                               fallback_to_source: bool = True, executor: Optional[Executor] = None) -> List[Optional[str]]:
+    """
+    `translate_many` for coroutines: the Translate calls run on `executor`
+    (default: the translate pool) and are awaited together.
+    """
+    results, pending = _lookup(items, target_lang)
+    if not pending:
+        return results
+
+    loop = asyncio.get_running_loop()
+    executor = executor or _pool
+    client = await loop.run_in_executor(executor, translate_client)
+    outs = await asyncio.gather(*(
+        loop.run_in_executor(executor, _translate_key, client, items[pending[key][0]][1], key) for key in pending
+    ))
+    return _fill(results, items, pending, outs, fallback_to_source)
+
+
+def get_translation_cache() -> TTLCache:
+    return _cache
@@ -1,6 +1,7 @@
 from typing import List
 
 def chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    # Fixed character windows; ingest uses the token-budgeted rag.chunking.iter_chunks
     chunks = []
     start = 0
     while start < len(text):
@@ -1,45 +1,106 @@
 import os
-import faiss
 import numpy as np
-import json
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+from rag.lexical import knows_word, search_lexical
+from rag.metastore import make_chunk_id
+from rag.segments import (
+    Segment,
+    commit_segment,
+    compact_in_background,
+    dead_fraction,
+    document_runs,
+    load_segments,
+    read_generation,
+    read_manifest,
+    search_segments,
+    search_segments_many,
+    tombstone_masks,
+    write_segment,
+)
+from config.settings import SEGMENT_MAX_COUNT, SEGMENT_TOMBSTONE_RATIO
+
 
 class FaissStore:
-    def __init__(self, dim: int, persist_dir: str):
+    """
+    Segmented FAISS store (see rag.segments). `add()` buffers vectors and
+    `save()` writes them as one new segment, so a save costs the size of what
+    was added, not the size of the corpus. Segments are only opened when
+    searching; pass the previous store as `reuse` to share the segments it
+    already has open.
+    """
+
+    def __init__(self, dim: int, persist_dir: str, reuse: Optional["FaissStore"] = None):
         self.dim = dim
         self.persist_dir = persist_dir
         os.makedirs(self.persist_dir, exist_ok=True)
-        self.index_path = os.path.join(self.persist_dir, "faiss.index")
-        self.meta_path = os.path.join(self.persist_dir, "meta.json")
-
-        if os.path.exists(self.index_path):
-            self.index = faiss.read_index(self.index_path)
-            with open(self.meta_path, "r", encoding="utf-8") as f:
-                meta = json.load(f)
-            self.texts = meta["texts"]
-            self.metadatas = meta["metadatas"]
-        else:
-            self.index = faiss.IndexFlatIP(self.dim)
-            self.texts = []
-            self.metadatas = []
+        # Read the generation before the manifest so a concurrent save is never
+        # mislabelled as already loaded (worst case we reload once more).
+        self.generation = read_generation(self.persist_dir)
+        self._reuse = reuse
+        self._segments: Optional[List[Segment]] = None
+        self._tombstones: dict = {}
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_texts: List[str] = []
+        self._pending_metas: List[dict] = []
+
+    @property
+    def segments(self) -> List[Segment]:
+        if self._segments is None:
+            reuse = {seg.name: seg for seg in self._reuse.segments} if self._reuse is not None else None
+            manifest = read_manifest(self.persist_dir)
+            self._segments = load_segments(self.persist_dir, manifest, reuse)
+            self._tombstones = tombstone_masks(manifest)
+            self._reuse = None
+        return self._segments
+
+    def load(self) -> "FaissStore":
+        """Open all segments now instead of on the first search."""
+        self.segments
+        return self
+
+    @property
+    def ntotal(self) -> int:
+        return sum(seg.ntotal for seg in self.segments)
 
     def add(self, vectors: List[List[float]], texts: List[str], metadatas: List[dict]):
-        arr = np.array(vectors, dtype="float32")
-        self.index.add(arr)
-        self.texts.extend(texts)
-        self.metadatas.extend(metadatas)
+        self._pending_vectors.append(np.array(vectors, dtype="float32"))
+        self._pending_texts.extend(texts)
+        # Chunks of one block share a metadata dict; copy so each row carries its own chunk_id.
+        self._pending_metas.extend(
+            dict(m, chunk_id=m.get("chunk_id") or make_chunk_id(t, m)) for t, m in zip(texts, metadatas)
+        )
 
     def save(self):
-        faiss.write_index(self.index, self.index_path)
-        with open(self.meta_path, "w", encoding="utf-8") as f:
-            json.dump({"texts": self.texts, "metadatas": self.metadatas}, f, ensure_ascii=False)
+        # Pending rows become one new immutable segment; the manifest update
+        # publishes it and bumps the generation for long-lived readers.
+        if not self._pending_texts:
+            return
+        vectors = np.concatenate(self._pending_vectors)
+        entry = write_segment(self.persist_dir, vectors, self._pending_texts, self._pending_metas)
+        self.generation = commit_segment(self.persist_dir, entry, document_runs(entry["name"], self._pending_metas))
+        self._pending_vectors, self._pending_texts, self._pending_metas = [], [], []
+        manifest = read_manifest(self.persist_dir)
+        if self._segments is not None:
+            # A save may replace documents, so refresh the tombstones too.
+            self._segments = self._segments + [Segment(self.persist_dir, entry["name"])]
+            self._tombstones = tombstone_masks(manifest)
+        if len(manifest["segments"]) > SEGMENT_MAX_COUNT or any(
+            dead_fraction(manifest, name) >= SEGMENT_TOMBSTONE_RATIO for name in manifest.get("tombstones", {})
+        ):
+            compact_in_background(self.persist_dir)
 
     def search(self, query_vec: List[float], top_k: int) -> List[Tuple[str, dict, float]]:
-        q = np.array([query_vec], dtype="float32")
-        scores, idxs = self.index.search(q, top_k)
-        results = []
-        for i, s in zip(idxs[0], scores[0]):
-            if i == -1:
-                continue
-            results.append((self.texts[i], self.metadatas[i], float(s)))
-        return results
+        return search_segments(self.segments, query_vec, top_k, self._tombstones)
+
+    def search_many(self, query_vecs, top_k: int) -> List[List[Tuple[str, dict, float]]]:
+        """Top-k for every row of an (n, dim) query matrix, one FAISS search per segment."""
+        return search_segments_many(self.segments, query_vecs, top_k, self._tombstones)
+
+    def search_lexical(self, query: str, top_k: int) -> List[Tuple[str, dict, float]]:
+        """BM25 top-k for `query` as (text, metadata, coverage), see rag.lexical."""
+        return search_lexical(self.segments, query, top_k, self._tombstones)
+
+    def knows_words(self, words: List[str]) -> bool:
+        """True if every word occurs in the lexical index of some segment."""
+        indexes = [seg.lexical for seg in self.segments]
+        return all(knows_word(indexes, w) for w in words)
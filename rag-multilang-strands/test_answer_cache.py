@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Semantic answer cache (rag.answer_cache): paraphrases above the threshold
+hit, entries are separated by language and index generation, expire after
+the TTL, the least recently used are evicted beyond the size limit, and an
+index reload through rag.index_manager drops the answers of older
+generations.
+
+    python test_answer_cache.py    (or: python -m pytest test_answer_cache.py)
+"""
+
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+from rag import answer_cache, segments
+from rag.answer_cache import SemanticAnswerCache
+from rag.index_manager import IndexManager
+
+DIM = 8
+
+
+def _vec(*values) -> np.ndarray:
+    v = np.zeros(DIM, dtype="float32")
+    v[:len(values)] = values
+    return v
+
+
+def test_paraphrase_above_threshold_hits():
+    cache = SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95)
+    cache.store(_vec(1, 0.1), "de", 1, "Antwort")
+    assert cache.lookup(_vec(1, 0.2) * 3, "de", 1) == "Antwort"  # scale does not matter
+    assert cache.lookup(_vec(1, 1), "de", 1) is None  # cosine ~0.77
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_language_and_generation_are_separate():
+    cache = SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95)
+    cache.store(_vec(1), "de", 1, "Antwort")
+    assert cache.lookup(_vec(1), "fr", 1) is None
+    assert cache.lookup(_vec(1), "de", 2) is None
+    assert cache.lookup(_vec(0), "de", 1) is None  # zero vector never matches
+
+
+def test_same_question_replaces_its_entry():
+    cache = SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95)
+    cache.store(_vec(1), "en", 1, "first")
+    cache.store(_vec(1), "en", 1, "second")
+    assert len(cache) == 1
+    assert cache.lookup(_vec(1), "en", 1) == "second"
+
+
+def test_expired_entry_falls_back_to_next_nearest():
+    now = [0.0]
+    with mock.patch.object(answer_cache.time, "monotonic", lambda: now[0]):
+        cache = SemanticAnswerCache(max_size=10, ttl=10, threshold=0.9)
+        cache.store(_vec(1, 0.3), "en", 1, "older")
+        now[0] = 5.0
+        cache.store(_vec(1), "en", 1, "newer")
+        now[0] = 12.0
+        # The nearest entry ("newer") has not expired yet
+        assert cache.lookup(_vec(1), "en", 1) == "newer"
+        assert cache.lookup(_vec(1, 0.3), "en", 1) == "newer"  # "older" expired and was dropped
+        assert len(cache) == 1
+        now[0] = 16.0
+        assert cache.lookup(_vec(1), "en", 1) is None
+        assert len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = SemanticAnswerCache(max_size=2, ttl=60, threshold=0.99)
+    cache.store(_vec(1), "en", 1, "a")
+    cache.store(_vec(0, 1), "en", 1, "b")
+    assert cache.lookup(_vec(1), "en", 1) == "a"
+    cache.store(_vec(0, 0, 1), "de", 1, "c")
+    assert len(cache) == 2
+    assert cache.lookup(_vec(0, 1), "en", 1) is None
+    assert cache.lookup(_vec(1), "en", 1) == "a" and cache.lookup(_vec(0, 0, 1), "de", 1) == "c"
+
+
+def test_group_rows_stay_aligned_after_removal():
+    cache = SemanticAnswerCache(max_size=3, ttl=60, threshold=0.99)
+    for i, answer in enumerate("abc"):
+        cache.store(_vec(*([0] * i + [1])), "en", 1, answer)
+    cache.store(_vec(0, 0, 0, 1), "en", 1, "d")  # evicts "a"; "c" moves into its row
+    assert [cache.lookup(_vec(*([0] * i + [1])), "en", 1) for i in range(4)] == [None, "b", "c", "d"]
+
+
+def test_invalidate_keeps_only_the_current_generation():
+    cache = SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95)
+    cache.store(_vec(1), "en", 1, "old")
+    cache.store(_vec(0, 1), "de", 1, "alt")
+    cache.store(_vec(1), "en", 2, "new")
+    cache.invalidate(keep_generation=2)
+    assert len(cache) == 1 and cache.stats()["invalidated"] == 2
+    assert cache.lookup(_vec(1), "en", 2) == "new"
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_index_reload_invalidates_older_answers():
+    cache = SemanticAnswerCache(max_size=10, ttl=60, threshold=0.95)
+    with tempfile.TemporaryDirectory() as d, mock.patch("rag.index_manager.get_answer_cache", lambda: cache):
+        vectors = np.eye(2, DIM, dtype="float32")
+        segments.commit_segment(d, segments.write_segment(d, vectors, ["a", "b"], [{}, {}]))
+        manager = IndexManager(d, dim=DIM, reload_interval=3600)
+        generation = manager.store().generation
+        cache.store(_vec(1), "en", generation, "answer")
+        assert not manager.reload()  # nothing new published
+        assert len(cache) == 1
+
+        segments.commit_segment(d, segments.write_segment(d, vectors, ["c", "d"], [{}, {}]))
+        assert manager.reload()
+        assert manager.generation == generation + 1
+        assert len(cache) == 0
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted chunking (rag.chunking, rag.ingest.chunk_block): chunks stay
+within the token budget and end at sentence ends, consecutive chunks overlap
+by whole sentences, a short tail is merged into the previous chunk, tables
+are split between rows with the header repeated, and chunking a file line by
+line gives the same chunks as chunking its text as one string.
+
+    python test_chunking.py    (or: python -m pytest test_chunking.py)
+"""
+
+import os
+import random
+import tempfile
+
+from rag import ingest
+from rag.chunking import count_tokens, iter_chunks, iter_sentences
+
+WORDS = ("battery", "screen", "warranty", "order", "delivery", "charger", "display", "refund", "S25", "Ultra", "512GB")
+
+
+def _document(n_sentences: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    sentences = []
+    for i in range(n_sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 30))]
+        sentences.append(f"S{i} " + " ".join(words) + rng.choice([".", "!", "?"]))
+        if rng.random() < 0.1:
+            sentences.append("\n\n")
+    return " ".join(sentences)
+
+
+def test_count_tokens():
+    assert count_tokens("") == 0
+    assert count_tokens("battery life") == 2
+    assert count_tokens("internationalization") == 3  # one per started 8 characters
+    assert count_tokens("S25, 512GB!") == 4
+    assert count_tokens("배터리 용량") == 5
+
+
+def test_iter_sentences_splits_at_sentence_ends_and_blank_lines():
+    text = "First one. Second one?\n\nNo end here\nstill going\n\n終わり。次"
+    assert list(iter_sentences(text)) == ["First one. ", "Second one?\n\n", "No end here\nstill going\n\n", "終わり。", "次"]
+
+
+def test_chunks_fit_the_budget_and_end_at_sentences():
+    text = _document(400)
+    chunks = list(iter_chunks(text, max_tokens=64, overlap_tokens=16, min_tokens=8))
+    assert len(chunks) > 10
+    assert all(count_tokens(c) <= 64 + 8 for c in chunks)
+    assert all(count_tokens(c) <= 64 for c in chunks[:-1])
+    sentences = [s.strip() for s in iter_sentences(text) if s.strip()]
+    # Every sentence arrives whole in at least one chunk
+    assert all(any(s in c for c in chunks) for s in sentences)
+    assert all(c.rstrip()[-1] in ".!?" for c in chunks)
+
+
+def test_consecutive_chunks_overlap_by_whole_sentences():
+    text = " ".join(f"S{i} has five words here." for i in range(40))
+    chunks = list(iter_chunks(text, max_tokens=30, overlap_tokens=10, min_tokens=0))
+    for prev, cur in zip(chunks, chunks[1:]):
+        first = cur.split(".")[0] + "."
+        assert prev.endswith(first)
+        assert count_tokens(first) <= 10
+    assert not any(c.startswith("has") for c in chunks)
+
+
+def test_no_overlap_when_disabled():
+    text = " ".join(f"S{i} has five words here." for i in range(40))
+    chunks = list(iter_chunks(text, max_tokens=30, overlap_tokens=0, min_tokens=0))
+    assert " ".join(chunks) == text
+
+
+def test_short_tail_is_merged_into_the_previous_chunk():
+    text = " ".join(f"S{i} has five words here." for i in range(10)) + " Bye."
+    merged = list(iter_chunks(text, max_tokens=30, overlap_tokens=0, min_tokens=4))
+    split = list(iter_chunks(text, max_tokens=30, overlap_tokens=0, min_tokens=0))
+    assert split[-1] == "Bye."
+    assert merged == split[:-2] + [split[-2] + " Bye."]
+
+
+def test_long_sentence_is_cut_between_words():
+    text = " ".join(["battery"] * 300) + "."
+    chunks = list(iter_chunks(text, max_tokens=50, overlap_tokens=0, min_tokens=0))
+    assert all(count_tokens(c) <= 50 for c in chunks)
+    assert all(set(c.rstrip(".").split()) == {"battery"} for c in chunks)
+    assert sum(len(c.split()) for c in chunks) == 300
+
+
+def test_tables_split_between_rows_with_header():
+    header = "Model | Battery | Price"
+    rows = [f"Galaxy S{i} | {3000 + i * 100} mAh | {500 + i} EUR" for i in range(60)]
+    text = "\n".join([header] + rows)
+    chunks = list(iter_chunks(text, max_tokens=80, table=True))
+    assert len(chunks) > 1
+    assert all(c.splitlines()[0] == header for c in chunks)
+    assert [r for c in chunks for r in c.splitlines()[1:]] == rows
+    assert all(count_tokens(c) <= 80 for c in chunks)
+    # A small table stays one chunk
+    assert list(iter_chunks("\n".join([header] + rows[:3]), table=True)) == ["\n".join([header] + rows[:3])]
+
+
+def test_chunk_block_uses_table_mode_for_table_blocks():
+    text = "A | B\n" + "\n".join(f"{i} | x. y" for i in range(200))
+    chunks = list(ingest.chunk_block(text, {"table_html": "<table></table>"}))
+    assert all(c.startswith("A | B\n") for c in chunks)
+
+
+def test_pieces_give_the_same_chunks_as_the_string():
+    text = _document(600, seed=3)
+    expected = list(iter_chunks(text, max_tokens=64, overlap_tokens=16, min_tokens=8))
+    rng = random.Random(1)
+    pieces, i = [], 0
+    while i < len(text):
+        step = rng.randint(1, 40)
+        pieces.append(text[i:i + step])
+        i += step
+    assert list(iter_chunks(iter(pieces), max_tokens=64, overlap_tokens=16, min_tokens=8)) == expected
+    assert list(iter_chunks(iter(text.splitlines(keepends=True)), max_tokens=64, overlap_tokens=16, min_tokens=8)) == expected
+
+
+def test_text_files_are_streamed_line_by_line():
+    text = _document(300, seed=5).replace(". ", ".\n")
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "notes.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        [(whole, meta)] = ingest._parse_file(path, "doc-1")
+        [(lines, stream_meta)] = ingest._parse_file(path, "doc-1", stream=True)
+        assert isinstance(whole, str) and not isinstance(lines, str)
+        assert stream_meta == dict(meta, lang="en")
+        assert list(ingest.chunk_block(lines, stream_meta)) == list(ingest.chunk_block(whole, meta))
+
+        with open(path, "wb") as f:
+            f.write(b"caf\xe9 not utf-8")
+        try:
+            ingest._parse_file(path, "doc-2", stream=True)
+        except UnicodeDecodeError:
+            pass
+        else:
+            raise AssertionError("a non-UTF-8 file should fail in the parse stage")
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+On-disk embedding cache (rag.embedding_cache) on a temporary SQLite file:
+keys depend on the embedding settings, vectors round trip as float32, the
+table is trimmed least recently used first, and embed_texts only sends
+cache misses (deduplicated) to Bedrock. Bedrock is the in-process stub from
+benchmarks.stubs.
+
+    python test_embedding_cache.py    (or: python -m pytest test_embedding_cache.py)
+"""
+
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+from benchmarks.stubs import StubBedrockRuntime
+from rag import embeddings
+from rag.embedding_cache import EmbeddingCache, cache_key
+from rag.embeddings import EmbeddingEngine
+
+
+def test_key_depends_on_text_and_settings():
+    key = cache_key("battery", "titan", 1024, True)
+    assert key == cache_key("battery", "titan", 1024, True)
+    assert len({key, cache_key("Battery", "titan", 1024, True), cache_key("battery", "titan", 512, True),
+                cache_key("battery", "titan", 1024, False), cache_key("battery", "cohere", 1024, True)}) == 5
+
+
+def test_vectors_round_trip_and_count_hits():
+    with tempfile.TemporaryDirectory() as d:
+        cache = EmbeddingCache(os.path.join(d, "embed.sqlite"))
+        cache.put_many({b"a": [0.5, -1.0], b"b": [2.0, 0.25]})
+        found = cache.get_many([b"a", b"c", b"a"])
+        assert found == {b"a": [0.5, -1.0]}
+        stats = cache.stats()
+        assert (stats["entries"], stats["hits"], stats["misses"]) == (2, 2, 1)
+        # The row count survives a reopen
+        assert EmbeddingCache(cache.path).stats()["entries"] == 2
+
+
+def test_least_recently_used_rows_are_evicted():
+    now = [1000.0]
+    with tempfile.TemporaryDirectory() as d, mock.patch("rag.embedding_cache.time.time", lambda: now[0]):
+        cache = EmbeddingCache(os.path.join(d, "embed.sqlite"), max_entries=3, touch_interval=0)
+        for i in range(3):
+            now[0] += 1
+            cache.put_many({bytes([i]): [float(i)]})
+        now[0] += 1
+        cache.get_many([bytes([0])])  # refreshes row 0
+        now[0] += 1
+        cache.put_many({bytes([3]): [3.0]})
+        assert cache.stats()["evictions"] == 1
+        assert set(cache.get_many([bytes([i]) for i in range(4)])) == {bytes([0]), bytes([2]), bytes([3])}
+
+
+def test_embed_texts_only_requests_misses():
+    with tempfile.TemporaryDirectory() as d:
+        stub = StubBedrockRuntime(latency=0)
+        cache = EmbeddingCache(os.path.join(d, "embed.sqlite"))
+        with mock.patch.object(embeddings, "get_embedding_engine", lambda: EmbeddingEngine(client=stub)), \
+                mock.patch.object(embeddings, "get_embedding_cache", lambda: cache):
+            first = embeddings.embed_texts(["battery", "screen", "battery"], dimensions=16)
+            assert stub.calls == 2
+            again = embeddings.embed_texts(["screen", "warranty", "battery"], dimensions=16)
+            assert stub.calls == 3
+        assert first[0] == first[2] == again[2] and first[1] == again[0]
+        assert np.allclose(np.linalg.norm(np.asarray(again), axis=1), 1.0, atol=1e-5)
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Language identification on short chat queries (nlp.language): short
+questions in German, French and Spanish keep their language, product names
+and short English questions stay English, and script-only text is decided
+by its script. Runs on the default LANG_* settings.
+
+    python test_language.py    (or: python -m pytest test_language.py)
+"""
+
+from nlp.language import detect_lang
+
+
+SHORT_QUERIES = {
+    "de": ["Wo ist mein Paket?", "Was kostet das S25 Ultra?", "Hallo, Preis?", "Preis S25", "Danke",
+           "Wo ist meine Bestellung?", "Passwort vergessen", "Rechnung", "Bildschirm kaputt"],
+    "fr": ["Où est ma commande?", "Bonjour, prix?", "Quel est le prix?", "Combien coûte le S25?",
+           "mot de passe oublié", "délai de livraison", "écran cassé"],
+    "es": ["¿Dónde está mi pedido?", "Hola, precio?", "Precio del S25?", "Cuánto cuesta?", "Gracias",
+           "cancelar pedido", "olvidé mi contraseña", "tiempo de entrega"],
+    "en": ["where is my order?", "how much is it", "thank you", "reset password", "battery life", "warranty"],
+}
+
+PRODUCT_NAMES = ["Galaxy S25 Ultra", "S25 Ultra 512GB", "price S25 Ultra", "iPhone 15 Pro Max", "Galaxy Buds 3",
+                 "S25 colors", "S25", "ok"]
+
+
+def test_short_queries_keep_their_language():
+    for lang, queries in SHORT_QUERIES.items():
+        for query in queries:
+            assert detect_lang(query) == lang, (query, detect_lang(query))
+
+
+def test_product_names_are_english():
+    for query in PRODUCT_NAMES:
+        assert detect_lang(query) == "en", (query, detect_lang(query))
+
+
+def test_long_text_is_not_limited_to_short_text_languages():
+    # Outside the short-text rules every profile language competes
+    assert detect_lang("Hoe lang duurt het voordat mijn bestelling wordt geleverd aan mijn adres?") == "nl"
+
+
+def test_script_decides_without_scoring():
+    assert detect_lang("배터리 용량") == "ko"
+    assert detect_lang("バッテリー") == "ja"
+    assert detect_lang("Μπαταρία") == "el"
+
+
+def test_text_without_letters_is_default():
+    assert detect_lang("") == "en"
+    assert detect_lang("12345 ?!") == "en"
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+BM25 keyword retrieval and rank fusion (rag.lexical, rag.retriever): model
+names and capacities are found as whole words and as their letter / digit
+runs, coverage weighs the query words by IDF, tombstoned rows are skipped,
+postings survive a write / load, RRF keeps the dense similarity for the
+confidence gate, and the keyword fast path only answers when its best row
+covers the query. Segments are written to temporary directories.
+
+    python test_lexical.py    (or: python -m pytest test_lexical.py)
+"""
+
+import os
+import tempfile
+from unittest import mock
+
+import numpy as np
+
+from rag import retriever, segments
+from rag.index_manager import IndexManager
+from rag.lexical import LexicalIndex, fuse_rrf, knows_word, search_lexical, tokenize, word_parts
+
+TEXTS = [
+    "The Galaxy S25 Ultra 512GB costs 1419 EUR.",
+    "The Galaxy S25 has a 4000 mAh battery.",
+    "GalaxyS25Ultra titanium frame, extracted without spaces.",
+    "Returns are accepted within 14 days of delivery.",
+    "Delivery takes two to three working days.",
+]
+
+
+def _segment(d: str, texts=TEXTS):
+    vectors = np.eye(len(texts), 8, dtype="float32")
+    metadatas = [{"source": f"doc.txt#p{i}", "chunk_id": f"c{i}"} for i in range(len(texts))]
+    entry = segments.write_segment(d, vectors, texts, metadatas)
+    segments.commit_segment(d, entry)
+    return segments.Segment(d, entry["name"])
+
+
+def test_tokenize_adds_letter_and_digit_runs():
+    assert word_parts("s25ultra") == ["25", "ultra"]  # single letters are dropped
+    assert word_parts("512gb") == ["512", "gb"]
+    assert word_parts("battery") == [] and word_parts("2025") == []
+    assert tokenize("Galaxy S25, 512GB") == ["galaxy", "s25", "25", "512gb", "512", "gb"]
+
+
+def test_search_ranks_by_bm25_and_reports_coverage():
+    with tempfile.TemporaryDirectory() as d:
+        seg = _segment(d)
+        results = search_lexical([seg], "S25 Ultra 512GB", 3)
+        assert [TEXTS.index(t) for t, _, _ in results] == [0, 1, 2]
+        coverage = [c for _, _, c in results]
+        assert abs(coverage[0] - 1.0) < 1e-6
+        # "GalaxyS25Ultra" covers "S25" and "Ultra" through its runs, row 1 only "S25"
+        assert coverage[1] < coverage[2] < 1.0
+        assert [TEXTS.index(t) for t, _, _ in search_lexical([seg], "delivery days", 5)] == [4, 3]
+        assert search_lexical([seg], "warranty", 3) == []
+
+
+def test_tombstoned_rows_are_skipped():
+    with tempfile.TemporaryDirectory() as d:
+        seg = _segment(d)
+        dead = np.zeros(len(TEXTS), dtype=bool)
+        dead[0] = True
+        results = search_lexical([seg], "S25 Ultra 512GB", 3, {seg.name: dead})
+        assert TEXTS[0] not in [t for t, _, _ in results]
+
+
+def test_postings_survive_write_and_load():
+    with tempfile.TemporaryDirectory() as d:
+        built = LexicalIndex.build(TEXTS)
+        built.write(d)
+        loaded = LexicalIndex.load(d)
+        assert loaded.vocab == built.vocab
+        assert loaded.df("galaxy") == 2 and loaded.postings("delivery")[0].tolist() == [3, 4]
+        assert knows_word([loaded], "s25ultra") and not knows_word([loaded], "s26")
+        assert LexicalIndex.load(os.path.join(d, "missing")) is None
+
+
+def test_fuse_rrf_keeps_the_dense_similarity():
+    a, b, c = ({"chunk_id": x} for x in "abc")
+    dense = [("A", a, 0.61), ("B", b, 0.42)]
+    lexical = [("B", b, 1.0), ("C", c, 0.9)]
+    fused = fuse_rrf([dense, lexical], top_k=3, k=60)
+    # B is in both lists and ranks first, with its cosine similarity, not its coverage
+    assert fused == [("B", b, 0.42), ("A", a, 0.61), ("C", c, 0.0)]
+    assert fuse_rrf([dense, lexical], top_k=1) == [("B", b, 0.42)]
+
+
+def test_keyword_fast_path():
+    with tempfile.TemporaryDirectory() as d:
+        _segment(d)
+        manager = IndexManager(d, dim=8)
+        with mock.patch.object(retriever, "get_index_manager", lambda: manager):
+            results = retriever.keyword_fast_path("S25 Ultra 512GB")
+            assert results is not None and results[0][0] == TEXTS[0]
+            assert retriever.keyword_fast_path("S25 Ultra 1TB") is None  # "1tb" not in the vocabulary
+            assert retriever.keyword_fast_path("delivery days") is None  # no model name or number
+            assert retriever.keyword_fast_path("S25 delivery 14") is None  # best row covers too little
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
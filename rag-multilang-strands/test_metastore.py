@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Binary chunk metadata (rag.metastore) on temporary directories: rows round
+trip with their translations, chunks of one block share a single metadata
+blob, truncate drops trailing rows, and a pre-segment meta.json is migrated
+once, read through rag.segments, and left in place.
+
+    python test_metastore.py    (or: python -m pytest test_metastore.py)
+"""
+
+import json
+import os
+import tempfile
+
+import faiss
+import numpy as np
+
+from rag import segments
+from rag.metastore import BLOBS_FILE, LEGACY_META_FILE, MetaStore, make_chunk_id, migrate_meta_json
+
+
+def test_rows_round_trip_with_translations():
+    with tempfile.TemporaryDirectory() as d:
+        store = MetaStore(d)
+        meta = {"source": "a.pdf#p1", "lang": "de", "chunk_id": "c1",
+                "translations": {"en": {"text": "hello", "table": "<table></table>"}}}
+        store.append(["hallo", ""], [meta, {"source": "a.pdf#p2"}])
+        assert len(MetaStore(d)) == 2
+        text, got = MetaStore(d).get(0)
+        assert text == "hallo" and got == meta
+        assert MetaStore(d).get(1) == ("", {"source": "a.pdf#p2"})
+
+
+def test_block_metadata_is_stored_once_per_batch():
+    with tempfile.TemporaryDirectory() as d:
+        block = {"source": "t.docx#t0", "table_html": "<table>" + "<tr><td>x</td></tr>" * 200 + "</table>"}
+        MetaStore(d).append([f"row {i}" for i in range(50)], [dict(block) for _ in range(50)])
+        assert os.path.getsize(os.path.join(d, BLOBS_FILE)) < 2 * len(json.dumps(block))
+        assert MetaStore(d).get(49) == ("row 49", block)
+
+
+def test_truncate_drops_trailing_rows():
+    with tempfile.TemporaryDirectory() as d:
+        store = MetaStore(d)
+        store.append(["a", "b", "c"], [{}, {}, {}])
+        store.truncate(1)
+        assert len(MetaStore(d)) == 1 and MetaStore(d).get(0)[0] == "a"
+
+
+def test_legacy_meta_json_is_migrated_and_kept():
+    with tempfile.TemporaryDirectory() as d:
+        vectors = np.eye(3, 8, dtype="float32")
+        index = faiss.IndexFlatIP(8)
+        index.add(vectors)
+        faiss.write_index(index, os.path.join(d, segments.INDEX_FILE))
+        legacy = {"texts": ["uno", "dos", "tres"], "metadatas": [{"source": "legacy.pdf#p1", "lang": "es"}] * 3}
+        with open(os.path.join(d, LEGACY_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(legacy, f)
+
+        manifest = segments.read_manifest(d)
+        assert manifest["segments"] == [{"name": segments.LEGACY_SEGMENT, "count": 3}]
+        seg = segments.Segment(d, segments.LEGACY_SEGMENT)
+        # The JSON file may be tracked seed data: it stays, the binary store is written beside it
+        with open(os.path.join(d, LEGACY_META_FILE), encoding="utf-8") as f:
+            assert json.load(f) == legacy
+        assert MetaStore.exists(d) and len(seg.meta) == 3
+        text, meta = seg.meta.get(1)
+        assert text == "dos" and meta["lang"] == "es"
+        assert meta["chunk_id"] == make_chunk_id("dos", legacy["metadatas"][1])
+        assert segments.search_segments([seg], vectors[2], 1)[0][0] == "tres"
+
+        # Reopening reads the binary store; migrating again would duplicate the rows
+        assert len(segments.Segment(d, segments.LEGACY_SEGMENT).meta) == 3
+        try:
+            migrate_meta_json(d)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("migrate_meta_json ran twice")
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Streaming upload receiver (api.multipart_stream) and staged uploads
+(rag.ingest.UploadWriter): the files of a multipart body, fed in arbitrary
+pieces, are written once to unique staging names under DATA_DIR/uploads with
+their content hash as doc_id, other form fields are ignored, a truncated or
+non-multipart body is rejected without leaving files behind, and staged
+uploads move to their final names only when published.
+
+    python test_multipart_stream.py    (or: python -m pytest test_multipart_stream.py)
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+from unittest import mock
+
+from fastapi import HTTPException
+
+from api import multipart_stream
+from rag import ingest
+from rag.documents import file_document_id
+
+BOUNDARY = "----test-boundary-7MA4YWxkTrZu0gW"
+
+
+class _Request:
+    """The parts of starlette's Request that receive_uploads reads."""
+
+    def __init__(self, body: bytes, piece: int = 7, content_type: str = f"multipart/form-data; boundary={BOUNDARY}"):
+        self.headers = {"content-type": content_type}
+        self._body = body
+        self._piece = piece
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._piece):
+            yield self._body[i:i + self._piece]
+
+
+def _body(parts, close: bool = True) -> bytes:
+    out = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+        out += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n".encode()
+        if filename:
+            out += b"Content-Type: application/octet-stream\r\n"
+        out += b"\r\n" + data + b"\r\n"
+    return out + (f"--{BOUNDARY}--\r\n".encode() if close else b"")
+
+
+def _receive(data_dir: str, request: _Request):
+    with mock.patch.object(ingest, "DATA_DIR", data_dir), mock.patch.object(multipart_stream, "UPLOAD_CHUNK_SIZE", 64):
+        return asyncio.run(multipart_stream.receive_uploads(request))
+
+
+def _uploads(data_dir: str):
+    folder = os.path.join(data_dir, "uploads")
+    return sorted(os.listdir(folder)) if os.path.isdir(folder) else []
+
+
+def test_files_are_staged_under_unique_names():
+    manual = b"Battery: 4000 mAh\r\n--not-a-boundary\r\n" * 50
+    with tempfile.TemporaryDirectory() as d:
+        body = _body([("note", None, b"ignored field"), ("files", "manual.txt", manual),
+                      ("files", "manual.txt", b"second version"), ("other", "skip.txt", b"not ours")])
+        saved = _receive(d, _Request(body))
+        assert len(saved) == 2
+        (first, first_id), (second, second_id) = saved
+        assert first != second and first_id != second_id
+        for path, doc_id in saved:
+            assert os.path.basename(path).startswith(ingest.UPLOAD_TMP_PREFIX)
+            assert ingest.upload_dest(path) == os.path.join(d, "uploads", "manual.txt")
+            assert file_document_id(path) == doc_id
+        with open(first, "rb") as f:
+            assert f.read() == manual
+        assert len(_uploads(d)) == 2
+
+
+def test_publish_moves_staged_files_into_place():
+    with tempfile.TemporaryDirectory() as d:
+        saved = _receive(d, _Request(_body([("files", "a.md", b"# A\n"), ("files", "b.md", b"# B\n")])))
+        ingest.publish_uploads(saved)
+        assert _uploads(d) == ["a.md", "b.md"]
+        assert ingest.upload_dest(os.path.join(d, "uploads", "a.md")) == os.path.join(d, "uploads", "a.md")
+        with open(os.path.join(d, "uploads", "b.md"), "rb") as f:
+            assert f.read() == b"# B\n"
+
+
+def test_truncated_body_is_rejected_and_cleaned_up():
+    with tempfile.TemporaryDirectory() as d:
+        body = _body([("files", "a.txt", b"complete"), ("files", "b.txt", b"cut off here " * 20)], close=False)
+        body = body[:-30]
+        try:
+            _receive(d, _Request(body))
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("a truncated upload was accepted")
+        # Neither the cut-off part nor the completed one before it is left staged
+        assert _uploads(d) == []
+
+
+def test_non_multipart_request_is_rejected():
+    with tempfile.TemporaryDirectory() as d:
+        try:
+            _receive(d, _Request(b"{}", content_type="application/json"))
+        except HTTPException as e:
+            assert e.status_code == 400
+        else:
+            raise AssertionError("a JSON body was accepted")
+        assert _uploads(d) == []
+
+
+def test_save_upload_copies_a_file_object():
+    with tempfile.TemporaryDirectory() as d, mock.patch.object(ingest, "DATA_DIR", d):
+        path, doc_id = ingest.save_upload(io.BytesIO(b"x" * 100000), "big.txt")
+        assert os.path.getsize(path) == 100000 and file_document_id(path) == doc_id
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Staged ingest pipeline (rag.pipeline, rag.ingest.run_ingest_pipeline): items
+flow through every stage with bounded queues in between, a final partial
+batch is flushed, the first error of any stage stops the run and is raised
+from it, and in ingest a file that fails to parse is reported as failed
+while the other files are still indexed. Embeddings are the in-process stub
+from benchmarks.stubs and the index is written to a temporary directory.
+
+    python test_pipeline.py    (or: python -m pytest test_pipeline.py)
+"""
+
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from benchmarks.stubs import fake_embedding
+from rag import ingest, segments
+from rag.documents import list_documents
+from rag.embeddings import DEFAULT_DIM
+from rag.index_manager import IndexManager
+from rag.pipeline import Pipeline
+
+
+def test_items_flow_through_every_stage_and_flush():
+    batch, out = [], []
+
+    def collect(item, emit):
+        batch.append(item)
+        if len(batch) == 4:
+            emit(list(batch))
+            batch.clear()
+
+    def flush(emit):
+        if batch:
+            emit(list(batch))
+
+    stats = (
+        Pipeline(queue_size=2)
+        .stage("double", lambda x, emit: (emit(x), emit(x)), workers=3)
+        .stage("batch", collect, flush=flush)
+        .stage("sink", lambda b, emit: out.append(b))
+        .run(range(5))
+    )
+    assert sorted(x for b in out for x in b) == sorted(list(range(5)) * 2)
+    assert [len(b) for b in out] == [4, 4, 2]
+    assert [(s.name, s.items_in, s.items_out) for s in stats] == [("double", 5, 10), ("batch", 10, 3), ("sink", 3, 0)]
+    assert all(s.as_dict()["elapsed_s"] >= 0 for s in stats)
+
+
+def test_full_queue_blocks_upstream():
+    in_flight, peak, lock = [0], [0], threading.Lock()
+
+    def produce(x, emit):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        emit(x)
+
+    def consume(x, emit):
+        time.sleep(0.005)
+        with lock:
+            in_flight[0] -= 1
+
+    stats = Pipeline(queue_size=3).stage("produce", produce).stage("consume", consume).run(range(40))
+    # At most the queue plus the item being consumed and the one being put
+    assert peak[0] <= 3 + 2
+    assert stats[0].blocked_s > 0
+
+
+def test_stage_error_stops_the_run_and_is_raised():
+    fed, done = [], []
+
+    def items():
+        for i in range(10000):
+            fed.append(i)
+            yield i
+
+    def fail(x, emit):
+        if x == 5:
+            raise ValueError("bad item 5")
+        emit(x)
+
+    pipeline = Pipeline(queue_size=2).stage("check", fail, workers=2).stage("sink", lambda x, emit: done.append(x))
+    try:
+        pipeline.run(items())
+    except ValueError as e:
+        assert str(e) == "bad item 5"
+    else:
+        raise AssertionError("the stage error was not raised")
+    assert len(fed) < 100  # the input stops being read
+    assert 5 not in done
+
+
+def test_flush_error_is_raised():
+    def flush(emit):
+        raise RuntimeError("flush failed")
+
+    try:
+        Pipeline().stage("a", lambda x, emit: None, flush=flush).stage("b", lambda x, emit: None).run([1, 2])
+    except RuntimeError as e:
+        assert str(e) == "flush failed"
+    else:
+        raise AssertionError("the flush error was not raised")
+
+
+def _embed(texts, progress=None):
+    return [fake_embedding(t, DEFAULT_DIM) for t in texts]
+
+
+def _ingest(persist_dir, files, embed=_embed):
+    events = []
+    with mock.patch.object(ingest, "FAISS_DIR", persist_dir), \
+            mock.patch.object(ingest, "embed_texts", embed), \
+            mock.patch.object(ingest, "PRETRANSLATE_LANGS", []), \
+            mock.patch.object(ingest, "get_index_manager", lambda: IndexManager(persist_dir)):
+        n = ingest.run_ingest_pipeline(files, lambda doc_id, event, value=None: events.append((doc_id, event)))
+    return n, events
+
+
+def test_ingest_reports_a_failed_file_and_indexes_the_rest():
+    with tempfile.TemporaryDirectory() as d:
+        good = os.path.join(d, "notes.txt")
+        with open(good, "w", encoding="utf-8") as f:
+            f.write("The Galaxy S25 has a 4000 mAh battery. It charges at 25 W.\n")
+        broken = os.path.join(d, "broken.pdf")
+        with open(broken, "wb") as f:
+            f.write(b"%PDF-1.4 not really a pdf")
+        index_dir = os.path.join(d, "index")
+        os.makedirs(index_dir)
+
+        n, events = _ingest(index_dir, [(good, "doc-good"), (broken, "doc-broken")])
+        assert n == 1
+        assert ("doc-broken", "failed") in events and ("doc-good", "indexed") in events
+        assert [doc["doc_id"] for doc in list_documents(index_dir)] == ["doc-good"]
+
+
+def test_ingest_error_in_a_later_stage_saves_nothing():
+    def embed(texts, progress=None):
+        raise RuntimeError("Bedrock unavailable")
+
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "notes.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Battery life is about two days.\n")
+        index_dir = os.path.join(d, "index")
+        os.makedirs(index_dir)
+        try:
+            _ingest(index_dir, [(path, "doc-1")], embed)
+        except RuntimeError as e:
+            assert str(e) == "Bedrock unavailable"
+        else:
+            raise AssertionError("the embed error was not raised")
+        assert segments.read_manifest(index_dir)["segments"] == []
+        assert segments.read_generation(index_dir) == 0
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Query-path cache (rag.query_cache): TTLCache expiry, LRU eviction and
+counters, query normalization, and rag.retriever.analyze_query serving a
+repeated question without Translate or an embedding call, while a failed
+translation is not cached. Translate and embeddings are replaced by local
+functions, so nothing leaves the machine.
+
+    python test_query_cache.py    (or: python -m pytest test_query_cache.py)
+"""
+
+import contextlib
+from unittest import mock
+
+from rag import query_cache, retriever
+from rag.query_cache import TTLCache, normalize_query
+
+
+def test_entries_expire_after_ttl():
+    now = [100.0]
+    with mock.patch.object(query_cache.time, "monotonic", lambda: now[0]):
+        cache = TTLCache(max_size=10, ttl=5)
+        cache.set("a", 1)
+        now[0] = 105.0
+        assert cache.get("a") == 1
+        now[0] = 105.1
+        assert cache.get("a", "gone") == "gone"
+        assert len(cache) == 0
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_is_evicted():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hit_rate"] == 0.75
+
+
+def test_zero_size_cache_stores_nothing():
+    cache = TTLCache(max_size=0, ttl=60)
+    cache.set("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
+
+
+def test_normalize_query():
+    assert normalize_query("  Wo ist\tmein  PAKET? ") == normalize_query("wo ist mein paket?")
+    assert normalize_query("Ｇａｌａｘｙ S25") == "galaxy s25"
+
+
+@contextlib.contextmanager
+def _offline(translate):
+    """Empty query cache; Translate replaced by `translate` and embeddings by a constant. Yields call counts."""
+    calls = {"translate": 0, "embed": 0}
+
+    def _translate(query, lang=None):
+        calls["translate"] += 1
+        return translate(query)
+
+    def _embed(texts):
+        calls["embed"] += 1
+        return [[1.0, 0.0, 0.0, 0.0] for _ in texts]
+
+    query_cache.get_query_cache().clear()
+    with mock.patch.object(retriever, "translate_query_to_english", _translate), \
+            mock.patch.object(retriever, "embed_texts", _embed):
+        yield calls
+    query_cache.get_query_cache().clear()
+
+
+def test_analyze_query_is_served_from_cache():
+    with _offline(lambda q: "where is my parcel?") as calls:
+        first = retriever.analyze_query("Wo ist mein Paket?")
+        again = retriever.analyze_query("wo ist  mein paket?")
+    assert first.lang == "de" and first.english == "where is my parcel?"
+    assert again is first
+    assert calls == {"translate": 1, "embed": 1}
+
+
+def test_failed_translation_is_not_cached():
+    # translate_query_to_english falls back to the original text on errors
+    with _offline(lambda q: q) as calls:
+        retriever.analyze_query("Wo ist mein Paket?")
+        retriever.analyze_query("Wo ist mein Paket?")
+    assert calls == {"translate": 2, "embed": 2}
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
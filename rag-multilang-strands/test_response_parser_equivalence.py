@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Equivalence tests: the single-pass incremental parser (api.response_parser)
+against the original multi-pass regex parser (api.response_parser_regex), on
+the cases from test_response_parsing.py, hand-picked edge cases and a seeded
+random corpus, each parsed whole and fed in chunks of every size.
+
+    python test_response_parser_equivalence.py    (or: python -m pytest test_response_parser_equivalence.py)
+"""
+
+import random
+
+from api import response_parser as new
+from api import response_parser_regex as old
+from test_response_parsing import test_response_1, test_response_2, test_response_3
+
+
+EDGE_CASES = [
+    "",
+    "   \n  ",
+    "[source: a.pdf]",
+    "Plain answer with no markup.",
+    "Text [source: a.pdf#p1] more [source: a.pdf#p1] and [source: b.pdf]",
+    "Upper [SOURCE: hidden.pdf] and [Source: x [source: nested.pdf] tail",
+    "Empty [source:] and [source: ] and [source:\n multi\n line]",
+    "Unclosed [source: never ends",
+    "a [b] [sourc [source [source:x]",
+    "<table></table>",
+    "--TABLE-START----TABLE-END--",
+    "--TABLE-START--   --TABLE-END-- only",
+    "Intro <TABLE border=1><TR><TD>x</TD></TR></TABLE> outro",
+    "<table class='t'><table><tr><td>nested</td></tr></table></table>",
+    "--table-start--<tr><td>lower</td></tr>--table-end--",
+    "--TABLE-START-- never closed <table><tr><td>1</td></tr></table>",
+    "<table no close ever <tr><td>1</td></tr>",
+    "<table><tr><td>a</td></tr> --TABLE-START-- <tr><td>b</td></tr></table> --TABLE-END--",
+    "<tables><tr><td>s</td></tr></table>",
+    "<ta[source: x.pdf]ble><tr><td>joined</td></tr></table>",
+    "--TABLE-START--<tr><td onclick='steal()'>1</td><script>alert(1)</script></tr>--TABLE-END--",
+    "<table><tr><th scope=\"col\" onmouseover=\"x()\">H</th></tr><tr><td>  a \n\n b </td></tr></table>",
+    "<table><tr><td><b>bold</b> <i>it</i> <a href='x'>link</a></td></tr></table>",
+    "<table><tr><td>5 < 6 and 7 > 3</td></tr></table>",
+    "<table><tr><td>Montana='Big Sky'</td></tr></table>",
+    "<table><tr><td><script src=x>unterminated</td></tr></table>",
+    "<table>\n<tr>\n<td> nbsp </td>\n</tr>\n</table>",
+    "One\n\n\n\nTwo\n \t \nThree\r\n\r\nFour",
+    "Überblick: 4000 mAh [source: spec.pdf#p2]\n\n<table><tr><td>€ 999</td></tr></table>\n\nEnde.",
+]
+
+FRAGMENTS = [
+    "The Galaxy S25 has a 4000 mAh battery. ",
+    "Here are the specifications:\n\n",
+    "\n\n",
+    "  ",
+    "[source: spec.pdf#p1] ",
+    "[source: data/docs/uploads/manual.pdf#p{n}]",
+    "[Source: other.pdf]",
+    "[source:",
+    "]",
+    "<table>",
+    "<table class=\"specs\">",
+    "</table>",
+    "<TABLE>",
+    "</TABLE>",
+    "--TABLE-START--",
+    "--TABLE-END--",
+    "<tr><th>Feature</th><th>Value</th></tr>",
+    "<tr><td>Display</td><td>6.9-inch*</td></tr>",
+    "<tr>\n  <td colspan=\"2\">Merged</td>\n</tr>",
+    "<td onclick=\"alert('x')\">bad</td>",
+    "<script>alert(1)</script>",
+    "<b>bold</b>",
+    "<br/>",
+    "5 < 6 ",
+    "*Note: measured diagonally.\n",
+    "Preis: 1.299,00 € (inkl. MwSt.)\n",
+    "「日本語のテキスト」\n",
+]
+
+
+def random_response(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(1, 30)):
+        parts.append(rng.choice(FRAGMENTS).replace("{n}", str(rng.randint(1, 9))))
+    return "".join(parts)
+
+
+def chunked(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def assert_equivalent(response: str, chunk_sizes=(1, 2, 3, 7, 16, 64)):
+    expected = old.parse_response_for_rendering(response)
+    assert new.parse_response_for_rendering(response) == expected, response
+    assert new.extract_response_blocks(response) == old.extract_response_blocks(response), response
+    assert new.extract_source_citations(response) == old.extract_source_citations(response), response
+    _, sources = old.extract_source_citations(response)
+    for size in chunk_sizes:
+        parser = new.ResponseParser()
+        streamed = []
+        for piece in chunked(response, size):
+            streamed.extend(parser.feed(piece))
+        streamed.extend(parser.close())
+        assert streamed == expected, (size, response)
+        assert parser.blocks == expected, (size, response)
+        if response.strip():
+            assert parser.sources == sources, (size, response)
+
+
+def test_repo_cases():
+    for response in (test_response_1, test_response_2, test_response_3):
+        assert_equivalent(response)
+
+
+def test_edge_cases():
+    for response in EDGE_CASES:
+        assert_equivalent(response)
+
+
+def test_random_corpus():
+    rng = random.Random(18)
+    for _ in range(2000):
+        response = random_response(rng)
+        assert_equivalent(response, chunk_sizes=(1, rng.randint(2, 40)))
+
+
+def test_sanitizer_matches_on_tables():
+    rng = random.Random(7)
+    for _ in range(2000):
+        html = "".join(rng.choice(FRAGMENTS[9:25]) for _ in range(rng.randint(1, 12)))
+        assert new.sanitize_html_table(html) == old.sanitize_html_table(html), html
+
+
+def test_blocks_arrive_before_close():
+    parser = new.ResponseParser()
+    assert parser.feed("Intro text. <table><tr><td>1</td></tr>") == []
+    assert parser.feed("</table> after") == [('text', 'Intro text.'), ('table', '<table><tr><td>1</td></tr></table>')]
+    assert parser.close() == [('text', 'after')]
+
+
+def test_handlers_without_quotes_are_dropped():
+    # The regex sanitizer only removed quoted handlers; unquoted ones no longer survive
+    html = "<table><tr><td onclick=alert(1)>x</td></tr></table>"
+    assert "onclick" in old.sanitize_html_table(html)
+    assert new.sanitize_html_table(html) == "<table><tr><td>x</td></tr></table>"
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
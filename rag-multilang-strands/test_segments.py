@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Segmented index persistence (rag.segments) on temporary directories:
+committing segments registers documents and replaces a re-uploaded file,
+deleted documents are tombstoned and skipped by searches, and compaction
+drops dead rows and remaps the registry. Runs on the default INDEX_TYPE
+(flat).
+
+    python test_segments.py    (or: python -m pytest test_segments.py)
+"""
+
+import os
+import tempfile
+
+import numpy as np
+
+from rag import segments
+
+DIM = 8
+
+
+def _vectors(n: int, seed: int) -> np.ndarray:
+    v = np.random.default_rng(seed).standard_normal((n, DIM)).astype("float32")
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def _save(persist_dir: str, doc_id: str, source: str, n: int, seed: int):
+    """Write and commit one segment holding `n` chunks of one document; returns its vectors and entry."""
+    vectors = _vectors(n, seed)
+    texts = [f"{doc_id} chunk {i}" for i in range(n)]
+    metadatas = [{"source": source, "file": source, "doc_id": doc_id} for _ in range(n)]
+    entry = segments.write_segment(persist_dir, vectors, texts, metadatas)
+    segments.commit_segment(persist_dir, entry, segments.document_runs(entry["name"], metadatas))
+    return vectors, entry
+
+
+def _search(persist_dir: str, vector: np.ndarray, top_k: int = 3):
+    manifest = segments.read_manifest(persist_dir)
+    loaded = segments.load_segments(persist_dir, manifest)
+    return segments.search_segments(loaded, vector, top_k, segments.tombstone_masks(manifest))
+
+
+def test_commit_registers_documents_and_generation():
+    with tempfile.TemporaryDirectory() as d:
+        vectors, entry = _save(d, "doc-a", "a.txt", 5, seed=1)
+        manifest = segments.read_manifest(d)
+        assert [s["name"] for s in manifest["segments"]] == [entry["name"]]
+        assert manifest["documents"]["doc-a"]["chunks"] == 5
+        assert manifest["documents"]["doc-a"]["locations"] == [[entry["name"], 0, 5]]
+        assert segments.read_generation(d) == 1
+        text, meta, score = _search(d, vectors[2], 1)[0]
+        assert text == "doc-a chunk 2" and meta["doc_id"] == "doc-a" and score > 0.99
+
+
+def test_reupload_tombstones_the_previous_version():
+    with tempfile.TemporaryDirectory() as d:
+        old_vectors, old = _save(d, "doc-v1", "a.txt", 4, seed=1)
+        _save(d, "doc-v2", "a.txt", 3, seed=2)
+        manifest = segments.read_manifest(d)
+        assert set(manifest["documents"]) == {"doc-v2"}
+        assert manifest["tombstones"] == {old["name"]: [[0, 4]]}
+        assert segments.dead_fraction(manifest, old["name"]) == 1.0
+        # The replaced rows are still on disk but no longer returned
+        hits = _search(d, old_vectors[0], 7)
+        assert hits and all(meta["doc_id"] == "doc-v2" for _, meta, _ in hits)
+
+
+def test_tombstone_mask_covers_ranges():
+    manifest = {"segments": [{"name": "seg-x", "count": 6}], "tombstones": {"seg-x": [[1, 2], [5, 1]], "gone": [[0, 1]]}}
+    masks = segments.tombstone_masks(manifest)
+    assert set(masks) == {"seg-x"}
+    assert masks["seg-x"].tolist() == [False, True, True, False, False, True]
+
+
+def test_compact_drops_tombstoned_rows_and_remaps_documents():
+    with tempfile.TemporaryDirectory() as d:
+        _save(d, "doc-a", "a.txt", 4, seed=1)
+        b_vectors, _ = _save(d, "doc-b", "b.txt", 3, seed=2)
+        _save(d, "doc-c", "c.txt", 2, seed=3)
+        with segments.manifest_lock(d):
+            manifest = segments.read_manifest(d)
+            segments.tombstone_document(manifest, "doc-a")
+            segments.write_manifest(d, manifest)
+
+        assert segments.compact(d, force=True)
+        manifest = segments.read_manifest(d)
+        assert len(manifest["segments"]) == 1
+        merged = manifest["segments"][0]
+        assert merged["count"] == 5
+        assert manifest["tombstones"] == {}
+        assert len(manifest["retired"]) == 3
+        assert manifest["documents"]["doc-b"]["locations"] == [[merged["name"], 0, 3]]
+        assert manifest["documents"]["doc-c"]["locations"] == [[merged["name"], 3, 2]]
+        text, meta, _ = _search(d, b_vectors[1], 1)[0]
+        assert text == "doc-b chunk 1" and meta["doc_id"] == "doc-b"
+
+        segments.purge_retired(d, grace=0)
+        assert segments.read_manifest(d)["retired"] == []
+        assert sorted(f for f in os.listdir(d) if f.startswith("seg-")) == [merged["name"]]
+
+
+def test_compact_rewrites_a_mostly_dead_segment():
+    with tempfile.TemporaryDirectory() as d:
+        _save(d, "doc-a", "a.txt", 4, seed=1)
+        assert not segments.compact(d)  # nothing dead yet, one segment
+        with segments.manifest_lock(d):
+            manifest = segments.read_manifest(d)
+            name = manifest["segments"][0]["name"]
+            manifest["tombstones"] = {name: [[0, 2]]}
+            segments.write_manifest(d, manifest)
+        assert segments.compact(d, tombstone_ratio=0.5)
+        manifest = segments.read_manifest(d)
+        assert manifest["segments"][0]["count"] == 2
+        assert manifest["documents"]["doc-a"]["chunks"] == 4  # the registry keeps the upload's count
+        assert manifest["documents"]["doc-a"]["locations"] == [[manifest["segments"][0]["name"], 0, 2]]
+
+
+def test_remap_rows_keeps_unmerged_segments_and_late_tombstones():
+    # seg-1 rows 0..3 with row 1 dead before the merge; seg-2 rows 0..1; seg-3 not merged
+    row_maps = {"seg-1": np.array([0, -1, 1, 2]), "seg-2": np.array([3, 4])}
+    manifest = {
+        "documents": {
+            "a": {"locations": [["seg-1", 0, 4]]},
+            "b": {"locations": [["seg-2", 0, 2], ["seg-3", 0, 1]]},
+        },
+        # [2, 1] of seg-1 was tombstoned while the merge ran; seg-3's stays as is
+        "tombstones": {"seg-1": [[1, 1], [2, 1]], "seg-3": [[0, 1]]},
+    }
+    segments._remap_rows(manifest, row_maps, "seg-new")
+    assert manifest["documents"]["a"]["locations"] == [["seg-new", 0, 3]]
+    assert manifest["documents"]["b"]["locations"] == [["seg-new", 3, 2], ["seg-3", 0, 1]]
+    assert manifest["tombstones"] == {"seg-3": [[0, 1]], "seg-new": [[1, 1]]}
+
+
+def test_remap_rows_joins_runs_across_dropped_rows():
+    row_maps = {"seg-1": np.array([0, 1, -1, -1, 2, 3])}
+    manifest = {"documents": {"a": {"locations": [["seg-1", 0, 6]]}}, "tombstones": {}}
+    segments._remap_rows(manifest, row_maps, "seg-new")
+    # Rows 0,1 and 4,5 land next to each other in the merged segment
+    assert manifest["documents"]["a"]["locations"] == [["seg-new", 0, 4]]
+    assert segments._ranges(np.array([0, 1, 3, 4, 5, 9])) == [[0, 2], [3, 3], [9, 1]]
+
+
+if __name__ == "__main__":
+    tests = [(name, fn) for name, fn in sorted(globals().items()) if name.startswith("test_") and callable(fn)]
+    for name, fn in tests:
+        fn()
+        print(f"ok  {name}")
+    print(f"{len(tests)} tests passed")
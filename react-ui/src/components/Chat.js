@@ -1,5 +1,4 @@
 import React, { useState } from 'react';
-import axios from 'axios';
 import ReactMarkdown from 'react-markdown';
 import remarkGfm from 'remark-gfm';
 import rehypeRaw from 'rehype-raw';
@@ -38,16 +37,46 @@ const Chat = ({ history, onNewMessage }) => {
     onNewMessage(newHistory);
     
     try {
-      const response = await axios.post('/api/chat', {
-        query
+      // Stream the answer (server-sent events) so text appears as it is generated
+      const response = await fetch('/api/chat/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ query })
         // userLang // Not sending to match Streamlit (no translation)
       });
-      console.log('LLM Response:', response.data.text); // Debug log
-      const assistantMessage = { role: 'assistant', content: response.data.text };
-      onNewMessage([...newHistory, assistantMessage]);
+      if (!response.ok || !response.body) {
+        throw new Error(`HTTP ${response.status}`);
+      }
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let streamed = '';
+      let finished = false;
+      while (!finished) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = (raw.match(/^event: (.*)$/m) || [])[1];
+          const data = JSON.parse((raw.match(/^data: (.*)$/m) || [])[1] || '{}');
+          if (event === 'delta') {
+            streamed += data.text;
+            onNewMessage([...newHistory, { role: 'assistant', content: streamed }]);
+          } else if (event === 'done') {
+            console.log('LLM Response:', data.text); // Debug log
+            const content = [data.text, ...(data.tables || []).map((t) => t.html)].filter(Boolean).join('\n\n');
+            onNewMessage([...newHistory, { role: 'assistant', content }]);
+            finished = true;
+          } else if (event === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
       setQuery('');
     } catch (error) {
-      const errorMessage = { role: 'assistant', content: 'Error: ' + (error.response?.data?.detail || error.message) };
+      const errorMessage = { role: 'assistant', content: 'Error: ' + error.message };
       onNewMessage([...newHistory, errorMessage]);
     }
     setLoading(false);
@@ -2,6 +2,19 @@ import React, { useRef } from 'react';
 import axios from 'axios';
 import { toast } from 'react-toastify';
 
+const POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Uploads are indexed in a background job; poll it until it finishes.
+const waitForJob = async (jobId) => {
+  for (;;) {
+    const { data } = await axios.get(`/api/upload/${jobId}`);
+    if (data.status === 'done' || data.status === 'failed') return data;
+    await sleep(POLL_INTERVAL_MS);
+  }
+};
+
 const FileUpload = ({ onUpload }) => {
   const fileInputRef = useRef(null);
 
@@ -14,7 +27,16 @@ const FileUpload = ({ onUpload }) => {
     
     try {
       const response = await axios.post('/api/upload', formData);
-      toast.success(`Uploaded ${response.data.indexed} chunks from ${files.length} file(s)!`);
+      toast.info(`Indexing ${files.length} file(s)…`);
+      const job = await waitForJob(response.data.job_id);
+      if (job.status === 'failed') {
+        toast.error('Indexing failed: ' + job.error);
+        return;
+      }
+      const skipped = job.files.filter(f => f.status === 'skipped').length;
+      const failed = job.files.filter(f => f.status === 'failed');
+      failed.forEach(f => toast.error(`${f.name}: ${f.error || 'failed'}`));
+      toast.success(`Uploaded ${job.indexed} chunks from ${files.length} file(s)!` + (skipped ? ` (${skipped} already indexed)` : ''));
       onUpload(files);
     } catch (error) {
       toast.error('Upload failed: ' + (error.response?.data?.detail || error.message));